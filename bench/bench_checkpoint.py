@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT checkpoint file
+
+Measures the inputs per second of a SEAT component on the local OpenRTM
+stand-in whose every input makes a state transition, without and with a
+checkpoint file (with the size of the file and the number of
+compactions), then the time a new component takes to restore the
+sessions from the file left by the first one.
+
+  $ python bench/bench_checkpoint.py
+'''
+
+import sys
+import os
+import time
+import random
+import shutil
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bench_seat import rtcstandin, seatmodule
+
+NSESSIONS = 100000
+NINPUTS = 200000
+
+SEATML = u'''<?xml version="1.0" encoding="UTF-8"?>
+<seatml>
+  <general name="bench">
+    <agent name="speechin" type="rtcin" datatype="TimedString"/>
+    <agent name="speechout" type="rtcout" datatype="TimedString"/>
+  </general>
+  <state name="start">
+    <rule><key>hello</key><command host="speechout">hi</command><statetransition>talking</statetransition></rule>
+  </state>
+  <state name="talking">
+    <rule><key>hello</key><command host="speechout">bye</command><statetransition>start</statetransition></rule>
+  </state>
+</seatml>
+'''
+
+def newseat(script, checkpoint):
+    comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+    comp.onInitialize()
+    comp._loop.stop() # the benchmark gives the inputs on its own thread
+    comp.setParameter('loglevel', 'WARN')
+    comp.setParameter('model_cache', 'none')
+    comp.setParameter('session_key', 'field')
+    comp.setParameter('checkpoint', checkpoint)
+    t = time.time()
+    comp.loadSEATML([script])
+    return comp, time.time() - t
+
+def measure(script, checkpoint, inputs):
+    comp, load = newseat(script, checkpoint)
+    t = time.time()
+    for s in inputs:
+        comp.processResult('speechin', s)
+    elapsed = time.time() - t
+    ckpt = comp._checkpoint
+    size = ckpt is not None and ckpt.size or 0
+    compactions = ckpt is not None and ckpt.compactions or 0
+    # left as if the process died: the file is not closed nor synced
+    return len(inputs) / elapsed, size, compactions
+
+def main():
+    rand = random.Random(0)
+    inputs = [u'@robot%i hello' % (rand.randrange(NSESSIONS),) for i in range(NINPUTS)]
+    tmpdir = tempfile.mkdtemp()
+    try:
+        script = os.path.join(tmpdir, 'bench.seatml')
+        fp = open(script, 'wb')
+        fp.write(SEATML.encode('utf-8'))
+        fp.close()
+        checkpoint = os.path.join(tmpdir, 'bench.checkpoint')
+        print "%12s %12s %12s %12s" % ("checkpoint", "inputs/s", "file KB", "compactions")
+        for name, path in (("no", "none"), ("yes", checkpoint)):
+            rate, size, compactions = measure(script, path, inputs)
+            print "%12s %12.0f %12i %12i" % (name, rate, size / 1024, compactions)
+        print
+        comp, load = newseat(script, checkpoint)
+        restore = comp.stats.histogram('restore').total
+        print "restored %i sessions in %.1f ms (load with restore %.1f ms)" % \
+            (len(comp.sessions), restore * 1000, load * 1000)
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
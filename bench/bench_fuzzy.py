@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT approximate matching against the number of keys
+
+Compares a linear scan computing the edit distance to every key with
+the FuzzyIndex for inputs with one or two recognition errors.
+
+  $ python bench/bench_fuzzy.py
+'''
+
+import sys
+import os
+import time
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.fuzzyindex import FuzzyIndex, editdistance
+
+WORDS = [u'go', u'to', u'the', u'kitchen', u'bring', u'me', u'a', u'cup', u'of',
+         u'tea', u'please', u'turn', u'left', u'right', u'stop', u'now', u'open',
+         u'door', u'hello', u'robot', u'what', u'time', u'is', u'it']
+
+def linear(keys, s, maxdist):
+    best = None
+    for i, k in enumerate(keys):
+        d = editdistance(s, k, maxdist)
+        if d <= maxdist and (best is None or d < best[0]):
+            best = (d, i)
+    return best
+
+def noisy(s, errors):
+    for e in range(errors):
+        i = random.randrange(len(s))
+        op = random.randrange(3)
+        c = random.choice(u'abcdefghijklmnopqrstuvwxyz')
+        if op == 0:
+            s = s[:i] + c + s[i+1:]
+        elif op == 1:
+            s = s[:i] + s[i+1:]
+        else:
+            s = s[:i] + c + s[i:]
+    return s
+
+def measure(func, queries):
+    t = time.time()
+    for s in queries:
+        func(s)
+    return (time.time() - t) / len(queries) * 1e6
+
+def main():
+    random.seed(0)
+    print "%8s %5s %12s %14s %14s" % ("keys", "dist", "build(ms)", "linear(us)", "index(us)")
+    for nkeys in (100, 1000, 10000):
+        keys = set()
+        while len(keys) < nkeys:
+            keys.add(u' '.join([random.choice(WORDS) for i in range(random.randint(2, 4))]))
+        keys = list(keys)
+        for maxdist in (1, 2):
+            t = time.time()
+            index = FuzzyIndex()
+            for i, k in enumerate(keys):
+                index.add(k, maxdist, i, i)
+            build = (time.time() - t) * 1e3
+            queries = [noisy(random.choice(keys), random.randint(1, maxdist)) for i in range(200)]
+            lin = measure(lambda s: linear(keys, s, maxdist), queries[:20])
+            idx = measure(index.match, queries)
+            print "%8i %5i %12.1f %14.1f %14.1f" % (nkeys, maxdist, build, lin, idx)
+
+if __name__ == '__main__':
+    main()
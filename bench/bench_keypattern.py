@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT key pattern matcher against key complexity
+
+Compares registering every expansion of a key into a dictionary (as the
+legacy decompString did) with inserting the key into a KeyAutomaton.
+
+  $ python bench/bench_keypattern.py
+'''
+
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.keypattern import parse, KeyAutomaton
+
+def decompString(strs):
+    ret = []
+    nstrs = strs
+    while nstrs.__len__() > 0:
+        nstrs2 = []
+        for str in nstrs:
+            if str.count('(') > 0 or str.count('[') > 0:
+                nstrs2.extend(decompStringSub(str))
+            else:
+                ret.extend([str])
+        nstrs = nstrs2
+    return ret
+
+def decompStringSub(str):
+    ret = []
+    bc = str.count('(')
+    kc = str.count('[')
+    if bc > 0:
+        i = str.index('(')
+        prestr = str[:i]
+        substrs = []
+        substr = ''
+        level = 0
+        i += 1
+        while i < str.__len__():
+            if str[i] == '(':
+                level += 1
+                substr += str[i]
+            elif str[i] == ')':
+                if level == 0:
+                    substrs.extend([substr])
+                    break
+                else:
+                    substr += str[i]
+                level -= 1
+            elif str[i] == '|':
+                if level == 0:
+                    substrs.extend([substr])
+                    substr = ''
+                else:
+                    substr += str[i]
+            else:
+                substr += str[i]
+            i += 1
+        poststr = str[i+1:]
+        for s in substrs:
+            ret.extend([prestr+s+poststr])
+    elif kc > 0:
+        i = str.index('[')
+        prestr = str[:i]
+        substr = ''
+        level = 0
+        i += 1
+        while i < str.__len__():
+            if str[i] == '[':
+                level += 1
+            elif str[i] == ']':
+                if level == 0:
+                    break
+                level -= 1
+            substr += str[i]
+            i += 1
+        poststr = str[i+1:]
+        ret.extend([prestr+poststr])
+        ret.extend([prestr+substr+poststr])
+    else:
+        ret.extend([str])
+    return ret
+
+
+def makekey(nopt):
+    return u'please ' + u''.join([u'[word%i ](go|move) ' % (i,) for i in range(nopt)]) + u'now'
+
+def main():
+    print "%5s %10s %12s %12s %14s %14s" % ("opts", "variants", "expand(ms)", "compile(ms)",
+                                            "dict(us)", "automaton(us)")
+    for nopt in (1, 2, 4, 6, 8):
+        key = makekey(nopt)
+        t = time.time()
+        table = {}
+        for w in decompString([key]):
+            table[w] = 1
+        expand = (time.time() - t) * 1e3
+        t = time.time()
+        automaton = KeyAutomaton()
+        automaton.add(parse(key), 1, 1)
+        compile = (time.time() - t) * 1e3
+        queries = table.keys()[:1000]
+        for q in queries:
+            assert automaton.match(q) is not None
+        t = time.time()
+        for q in queries:
+            table.get(q)
+        probe = (time.time() - t) / len(queries) * 1e6
+        t = time.time()
+        for q in queries:
+            automaton.match(q)
+        match = (time.time() - t) / len(queries) * 1e6
+        print "%5i %10i %12.2f %12.2f %14.3f %14.3f" % (nopt, len(table), expand, compile, probe, match)
+
+if __name__ == '__main__':
+    main()
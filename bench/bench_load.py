@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT start with and without the compiled model cache
+
+Loads a synthetic SEATML script (see bench_seat.py) into a SEAT
+component on the local OpenRTM stand-in: from the XML, from the XML
+while storing the compiled model into an empty cache, from the cache
+(warm start) and from a model compiled by seatmlc -o. Then measures
+the time from the start of a new process (without DISPLAY) until the
+component is ready, from the XML and from the cache.
+
+  $ python bench/bench_load.py --states 50 --rules 100
+'''
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import optparse
+import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bench_seat import makeseatml, rtcstandin, seatmodule
+from seatsat.seatml import dumpmodel
+
+def load(files, cache):
+    comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+    comp.onInitialize()
+    comp.setParameter('loglevel', 'WARN')
+    comp.setParameter('model_cache', cache)
+    t = time.time()
+    comp.loadSEATML(files)
+    elapsed = time.time() - t
+    comp.onFinalize()
+    return comp, elapsed
+
+STARTUP = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from seatsat import rtcstandin
+rtcstandin.install()
+from seatsat import SEAT
+comp = SEAT.SEAT(rtcstandin.Manager.instance())
+comp.onInitialize()
+comp.setParameter('loglevel', 'WARN')
+comp.setParameter('model_cache', sys.argv[2])
+comp.loadSEATML([sys.argv[3]])
+print comp.stats.snapshot()['gauges']['startup_seconds'], 'Tkinter' in sys.modules
+comp.onFinalize()
+'''
+
+def startup(path, cache):
+    '''return the start to ready time of a new process and whether it loaded Tk'''
+    env = dict(os.environ)
+    env.pop('DISPLAY', None)
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    out = subprocess.Popen([sys.executable, '-c', STARTUP, root, cache, path],
+                           stdout=subprocess.PIPE, env=env).communicate()[0].split()
+    return float(out[0]), out[1] == 'True'
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option('--states', dest='states', type='int', default=50,
+                      help='number of states [default: %default]')
+    parser.add_option('--rules', dest='rules', type='int', default=100,
+                      help='number of rules per state [default: %default]')
+    parser.add_option('--alternations', dest='alternations', type='int', default=3,
+                      help='number of alternatives in the alternation keys [default: %default]')
+    parser.add_option('--regkeys', dest='regkeys', type='int', default=10,
+                      help='number of regkeys per state [default: %default]')
+    (opts, args) = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'bench.seatml')
+        f = open(path, 'wb')
+        f.write(makeseatml(opts.states, opts.rules, opts.alternations, opts.regkeys).encode('utf-8'))
+        f.close()
+        cache = os.path.join(tmpdir, 'cache')
+        print "%-12s %10s" % ("load", "seconds")
+        print "%-12s %10.3f" % ("xml", load([path], 'none')[1])
+        comp, elapsed = load([path], cache)
+        print "%-12s %10.3f" % ("cold", elapsed)
+        print "%-12s %10.3f" % ("warm", load([path], cache)[1])
+        compiled = os.path.join(tmpdir, 'bench.seatmlc')
+        f = open(compiled, 'wb')
+        dumpmodel(comp.script, f)
+        f.close()
+        print "%-12s %10.3f" % ("seatmlc", load([compiled], 'none')[1])
+        for name, cache in (("process xml", 'none'), ("process warm", cache)):
+            elapsed, gui = startup(path, cache)
+            print "%-12s %10.3f%s" % (name, elapsed, gui and " (Tk loaded)" or "")
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT key lookup against the number of keys
+
+Compares the legacy lookup (string concatenated keys probed with the
+state:source, state:default, all:source, all:default fallback) with the
+compiled RuleIndex.
+
+  $ python bench/bench_lookup.py
+'''
+
+import sys
+import os
+import time
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.ruleindex import RuleIndex
+
+NSTATES = 20
+SOURCES = ['speechin', 'gui', 'default']
+
+def legacylookup(keys, state, host, s):
+    for st, h in ((state, host), (state, 'default'), ('all', host), ('all', 'default')):
+        try:
+            return keys[st+":"+h+":"+s]
+        except KeyError:
+            pass
+    return None
+
+def build(nkeys):
+    keys = {}
+    index = RuleIndex()
+    words = []
+    states = ['state%i' % (i,) for i in range(NSTATES)] + ['all']
+    for i in range(nkeys):
+        state = states[i % len(states)]
+        source = SOURCES[i % len(SOURCES)]
+        word = u'word%i' % (i,)
+        commands = [['c', 'speechout', word]]
+        keys[state+":"+source+":"+word] = commands
+        index.register(state, source, word, commands)
+        words.append(word)
+    index.compile()
+    return keys, index, states, words
+
+def measure(func, queries):
+    t = time.time()
+    for state, host, s in queries:
+        func(state, host, s)
+    return (time.time() - t) / len(queries) * 1e6
+
+def main():
+    random.seed(0)
+    print "%8s %14s %14s" % ("keys", "legacy(us)", "compiled(us)")
+    for nkeys in (100, 1000, 10000, 100000):
+        keys, index, states, words = build(nkeys)
+        queries = []
+        for i in range(100000):
+            # mix of hits at every fallback level and misses
+            s = random.choice(words) if i % 4 else u'unknown%i' % (i,)
+            queries.append((random.choice(states[:-1]), 'speechin', s))
+        legacy = measure(lambda st, h, s: legacylookup(keys, st, h, s), queries)
+        compiled = measure(index.lookup, queries)
+        print "%8i %14.3f %14.3f" % (nkeys, legacy, compiled)
+
+if __name__ == '__main__':
+    main()
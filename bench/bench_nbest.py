@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT N-best result parser against the list length
+
+Compares building a BeautifulSoup tree of the whole result (as the
+legacy processResult did) with the lxml pull parser of seatsat.nbest,
+when the first hypothesis is accepted and when the scores drop below
+the limit after the first few hypotheses.
+
+  $ python bench/bench_nbest.py
+'''
+
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.nbest import iternbest
+try:
+    from BeautifulSoup import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+def makeresult(n):
+    ret = [u'<?xml version="1.0" encoding="UTF-8" ?>\n<results>\n']
+    for i in range(n):
+        words = [u'word%i' % (j,) for j in range(i % 5 + 3)]
+        ret.append(u'  <data rank="%i" score="%f" text="%s">\n' % (i + 1, -1000.0 - i * 10, u' '.join(words)))
+        for w in words:
+            ret.append(u'    <word text="%s" score="%f"/>\n' % (w, 0.9))
+        ret.append(u'  </data>\n')
+    ret.append(u'</results>\n')
+    return u''.join(ret)
+
+def legacy(s, minscore):
+    doc = BeautifulSoup(s)
+    for d in doc.findAll('data'):
+        rank = int(d['rank'])
+        score = float(d['score'])
+        text = d['text']
+        if score < minscore:
+            break
+    return text
+
+def pull(s, minscore):
+    for rank, score, text in iternbest(s, minscore):
+        pass
+    return text
+
+def measure(func, s, minscore, n):
+    t = time.time()
+    for i in range(n):
+        func(s, minscore)
+    return (time.time() - t) / n * 1e6
+
+def main():
+    print "%6s %10s %16s %16s" % ("nbest", "stop", "legacy(us)", "lxml(us)")
+    for n in (1, 5, 10, 50, 100):
+        s = makeresult(n)
+        for label, minscore in (("first", -1000.0), ("3rd", -1025.0), ("none", -1e9)):
+            if BeautifulSoup is not None:
+                leg = measure(legacy, s, minscore, 200)
+            else:
+                leg = float('nan')
+            print "%6i %10s %16.1f %16.1f" % (n, label, leg, measure(pull, s, minscore, 200))
+
+if __name__ == '__main__':
+    main()
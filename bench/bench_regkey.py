@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT regkey matching against the number of patterns
+
+Compares matching the patterns one by one (as the legacy lookupcommand
+did) with the combined RegexMatcher.
+
+  $ python bench/bench_regkey.py
+'''
+
+import sys
+import os
+import re
+import time
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.ruleindex import RegexMatcher
+
+def sequential(patterns, s):
+    for p, v in patterns:
+        if p.match(s):
+            return v
+    return None
+
+def measure(func, queries):
+    t = time.time()
+    for s in queries:
+        func(s)
+    return (time.time() - t) / len(queries) * 1e6
+
+def main():
+    random.seed(0)
+    print "%8s %16s %16s" % ("patterns", "sequential(us)", "combined(us)")
+    for npatterns in (10, 100, 300, 1000):
+        patterns = []
+        for i in range(npatterns):
+            patterns.append((re.compile(u'(go|move) to room %i( now)?$' % (i,)), i))
+        matcher = RegexMatcher(patterns)
+        queries = []
+        for i in range(20000):
+            if i % 4:
+                queries.append(u'go to room %i' % (random.randrange(npatterns),))
+            else:
+                queries.append(u'unknown phrase %i' % (i,))
+        for s in queries[:1000]:
+            assert sequential(patterns, s) == matcher.match(s)
+        print "%8i %16.3f %16.3f" % (npatterns,
+                                     measure(lambda s: sequential(patterns, s), queries),
+                                     measure(matcher.match, queries))
+
+if __name__ == '__main__':
+    main()
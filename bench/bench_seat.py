@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT component matching and dispatch pipeline
+
+Generates a synthetic SEATML script (states, rules with literal and
+alternation keys, regkeys), loads it into a SEAT component running on
+the local OpenRTM stand-in (seatsat.rtcstandin) and feeds it inputs
+through processResult and processNonString as the ports would. Reports
+the load time and the throughput and latency percentiles of each
+scenario as json (or as a table with --text).
+
+  $ python bench/bench_seat.py --states 50 --rules 100 --alternations 4 --regkeys 10
+'''
+
+import sys
+import os
+import time
+import json
+import random
+import tempfile
+import optparse
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat import rtcstandin
+rtcstandin.install()
+from seatsat import SEAT as seatmodule
+
+timer = time.time
+
+def makeseatml(nstates, nrules, nalts, nregkeys):
+    '''return a SEATML script with the given number of states and rules'''
+    alts = u'|'.join([u'alt%i' % (k,) for k in range(nalts)])
+    ret = [u'<?xml version="1.0" encoding="UTF-8"?>\n<seatml>\n',
+           u'  <general name="bench">\n',
+           u'    <agent name="speechin" type="rtcin" datatype="TimedString"/>\n',
+           u'    <agent name="speechout" type="rtcout" datatype="TimedString"/>\n',
+           u'    <agent name="sensor" type="rtcin" datatype="TimedLong"/>\n',
+           u'  </general>\n']
+    for i in range(nstates):
+        ret.append(u'  <state name="s%i">\n' % (i,))
+        ret.append(u'    <onentry><command host="speechout">entered s%i</command></onentry>\n' % (i,))
+        for j in range(nrules):
+            ret.append(u'    <rule>\n')
+            ret.append(u'      <key>s%i r%i</key>\n' % (i, j))
+            if nalts:
+                ret.append(u'      <key>s%i r%i (%s)[ please]</key>\n' % (i, j, alts))
+            ret.append(u'      <command host="speechout">reply %i %i</command>\n' % (i, j))
+            ret.append(u'    </rule>\n')
+        for j in range(nregkeys):
+            ret.append(u'    <rule>\n')
+            ret.append(u'      <regkey>^s%i g%i [0-9]+$</regkey>\n' % (i, j))
+            ret.append(u'      <command host="speechout">number %i %i</command>\n' % (i, j))
+            ret.append(u'    </rule>\n')
+        ret.append(u'    <rule>\n')
+        ret.append(u'      <key>sensor</key>\n')
+        ret.append(u'      <command host="speechout">sensor %i</command>\n' % (i,))
+        ret.append(u'    </rule>\n')
+        ret.append(u'    <rule>\n')
+        ret.append(u'      <key>goto s%i</key>\n' % ((i + 1) % nstates,))
+        ret.append(u'      <statetransition>s%i</statetransition>\n' % ((i + 1) % nstates,))
+        ret.append(u'    </rule>\n')
+        ret.append(u'  </state>\n')
+    ret.append(u'</seatml>\n')
+    return u''.join(ret)
+
+def makenbest(texts):
+    ret = [u'<?xml version="1.0" encoding="UTF-8" ?>\n<results>\n']
+    for i, t in enumerate(texts):
+        ret.append(u'  <data rank="%i" score="%f" text="%s"/>\n' % (i + 1, 0.9 - i * 0.01, t))
+    ret.append(u'</results>\n')
+    return u''.join(ret)
+
+def makecomponent(path, loglevel):
+    comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+    comp.onInitialize()
+    comp.setParameter('loglevel', loglevel)
+    comp.setParameter('model_cache', 'none')
+    t = timer()
+    comp.loadSEATML([path])
+    return comp, timer() - t
+
+def summary(name, samples, total):
+    samples = sorted(samples)
+    n = len(samples)
+    def percentile(p):
+        return samples[min(n - 1, int(p / 100.0 * n))] * 1e6
+    return {'name': name,
+            'ops': n,
+            'seconds': total,
+            'throughput': n / total if total > 0 else 0.0,
+            'mean_us': sum(samples) / n * 1e6,
+            'p50_us': percentile(50),
+            'p99_us': percentile(99),
+            'max_us': samples[-1] * 1e6}
+
+def run(comp, name, func, inputs):
+    '''feed the inputs to func(input), starting from the first state'''
+    comp.currentstate = 's0'
+    samples = []
+    start = timer()
+    for i in inputs:
+        t = timer()
+        func(i)
+        samples.append(timer() - t)
+    return summary(name, samples, timer() - start)
+
+def scenarios(opts):
+    rand = random.Random(0)
+    n = opts.iterations
+    rules = [rand.randrange(opts.rules) for i in range(n)]
+    ret = [('literal', 'speechin', [u's0 r%i' % (j,) for j in rules]),
+           ('miss', 'speechin', [u'unknown %i' % (j,) for j in rules]),
+           ('transition', 'speechin', [u'goto s%i' % ((i + 1) % opts.states,) for i in range(n)])]
+    if opts.alternations:
+        ret.append(('alternation', 'speechin',
+                    [u's0 r%i alt%i%s' % (j, rand.randrange(opts.alternations), (u'', u' please')[j % 2])
+                     for j in rules]))
+    if opts.regkeys:
+        ret.append(('regkey', 'speechin',
+                    [u's0 g%i %i' % (rand.randrange(opts.regkeys), j) for j in rules]))
+    ret.append(('nbest%i' % (opts.nbest,), 'speechin',
+                [makenbest([u'unknown %i' % (k,) for k in range(opts.nbest - 1)] + [u's0 r%i' % (j,)])
+                 for j in rules]))
+    return ret
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option('--states', dest='states', type='int', default=10,
+                      help='number of states [default: %default]')
+    parser.add_option('--rules', dest='rules', type='int', default=100,
+                      help='number of rules per state [default: %default]')
+    parser.add_option('--alternations', dest='alternations', type='int', default=3,
+                      help='number of alternatives in the pattern key of each rule [default: %default]')
+    parser.add_option('--regkeys', dest='regkeys', type='int', default=10,
+                      help='number of regkey rules per state [default: %default]')
+    parser.add_option('--nbest', dest='nbest', type='int', default=5,
+                      help='number of hypotheses in the N-best scenario [default: %default]')
+    parser.add_option('-n', '--iterations', dest='iterations', type='int', default=10000,
+                      help='number of inputs per scenario [default: %default]')
+    parser.add_option('--loglevel', dest='loglevel', default='INFO',
+                      help='log level of the component [default: %default]')
+    parser.add_option('--text', dest='text', action='store_true', default=False,
+                      help='print a table instead of json')
+    (opts, args) = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.seatml')
+    try:
+        os.write(fd, makeseatml(opts.states, opts.rules, opts.alternations, opts.regkeys).encode('utf-8'))
+        os.close(fd)
+        comp, loadtime = makecomponent(path, opts.loglevel)
+    finally:
+        os.remove(path)
+
+    results = []
+    for name, host, inputs in scenarios(opts):
+        results.append(run(comp, name, lambda s: comp.processResult(host, s), inputs))
+    results.append(run(comp, 'nonstring', lambda v: comp.processNonString('sensor', v),
+                       range(opts.iterations)))
+    comp.onFinalize()
+
+    report = {'params': {'states': opts.states, 'rules': opts.rules,
+                         'alternations': opts.alternations, 'regkeys': opts.regkeys,
+                         'nbest': opts.nbest, 'iterations': opts.iterations,
+                         'loglevel': opts.loglevel},
+              'load_seconds': loadtime,
+              'scenarios': results}
+    if opts.text:
+        print "load: %.3f s" % (loadtime,)
+        print "%-12s %12s %10s %10s %10s" % ("scenario", "ops/s", "mean(us)", "p50(us)", "p99(us)")
+        for r in results:
+            print "%-12s %12.0f %10.1f %10.1f %10.1f" % (r['name'], r['throughput'], r['mean_us'],
+                                                        r['p50_us'], r['p99_us'])
+    else:
+        print json.dumps(report, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of sequence inputs and outputs of SEAT scripts
+
+Gives 10000 element TimedFloatSeq and TimedOctetSeq data (as lists and
+strings, the way the ORB gives them) to a SEAT component on the local
+OpenRTM stand-in, with the sequences given to the scripts as lists,
+arrays or numpy arrays (if numpy is installed). The script sends the
+sequence, or every 10th element of it, to a sequence output port.
+Prints the time per input and the share of one CPU needed at 50 Hz
+(decimating a float sequence is faster as a list, as making the array
+costs more than slicing it saves).
+
+  $ python bench/bench_seq.py
+'''
+
+import sys
+import os
+import time
+import random
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bench_seat import rtcstandin, seatmodule
+import RTC
+from seatsat import seqdata
+
+NELEMENTS = 10000
+RATE = 50
+ITERATIONS = 200
+
+SCRIPTS = [('echo', u'rtc_result = rtc_in_data'),
+           ('decimate', u'rtc_result = rtc_in_data[::10]')]
+
+def kinds():
+    ret = [seqdata.LIST, seqdata.ARRAY]
+    if seqdata.numpy is not None:
+        ret.append(seqdata.NUMPY)
+    return ret
+
+def makeseatml():
+    ret = [u'<?xml version="1.0" encoding="UTF-8"?>\n<seatml>\n  <general name="bench">\n']
+    for kind in kinds():
+        for t in ('Float', 'Octet'):
+            for name, script in SCRIPTS:
+                ret.append(u'    <agent name="%s_%s_%s" type="rtcin" datatype="Timed%sSeq" sequence="%s"/>\n'
+                           % (t, kind, name, t, kind))
+    ret.append(u'    <agent name="Float_out" type="rtcout" datatype="TimedFloatSeq"/>\n')
+    ret.append(u'    <agent name="Octet_out" type="rtcout" datatype="TimedOctetSeq"/>\n')
+    ret.append(u'  </general>\n  <state name="start">\n')
+    for kind in kinds():
+        for t in ('Float', 'Octet'):
+            for name, script in SCRIPTS:
+                ret.append(u'    <rule><key>%s_%s_%s</key><script host="%s_out">%s</script></rule>\n'
+                           % (t, kind, name, t, script))
+    ret.append(u'  </state>\n</seatml>\n')
+    return u''.join(ret)
+
+def measure(comp, name, datatype, payload):
+    data = [datatype(RTC.Time(0, 0), payload) for i in range(ITERATIONS)]
+    t = time.time()
+    for d in data:
+        comp.processData(name, d)
+    return (time.time() - t) / ITERATIONS
+
+def main():
+    rand = random.Random(0)
+    floats = [rand.random() for i in range(NELEMENTS)]
+    octets = ''.join(chr(rand.randrange(256)) for i in range(NELEMENTS))
+    fd, path = tempfile.mkstemp(suffix='.seatml')
+    try:
+        os.write(fd, makeseatml().encode('utf-8'))
+        os.close(fd)
+        comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+        comp.onInitialize()
+        comp.setParameter('loglevel', 'WARN')
+        comp.setParameter('model_cache', 'none')
+        comp.loadSEATML([path])
+        print "%-6s %-8s %-9s %12s %12s" % ("type", "sequence", "script", "ms/input", "cpu@%iHz" % (RATE,))
+        for t, datatype, payload in (('Float', RTC.TimedFloatSeq, floats),
+                                     ('Octet', RTC.TimedOctetSeq, octets)):
+            for kind in kinds():
+                for name, script in SCRIPTS:
+                    sec = measure(comp, '%s_%s_%s' % (t, kind, name), datatype, payload)
+                    print "%-6s %-8s %-9s %12.3f %11.1f%%" % (t, kind, name, sec * 1000, sec * RATE * 100)
+        comp.onFinalize()
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of a SEAT server agent against the number of clients
+
+Starts a SEAT component on the local OpenRTM stand-in with a server
+agent, connects many clients to it (one session each), makes every
+client send inputs and wait for the replies, and measures the time to
+accept the clients and the inputs per second. The clients are run by
+one polling loop, like the server.
+
+  $ python bench/bench_server.py
+'''
+
+import sys
+import os
+import time
+import socket
+import threading
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bench_seat import rtcstandin, seatmodule
+from seatsat.sockethub import Poller
+
+PORT = 23480
+NTURNS = 5
+
+SEATML = u'''<?xml version="1.0" encoding="UTF-8"?>
+<seatml>
+  <general name="bench">
+    <agent name="kiosk" type="server" host="127.0.0.1" port="%i"/>
+  </general>
+  <state name="start">
+    <rule><key>hello</key><command host="kiosk">hi</command><statetransition>talk</statetransition></rule>
+  </state>
+  <state name="talk">
+    <rule><key>hello</key><command host="kiosk">hi again</command></rule>
+  </state>
+</seatml>
+''' % (PORT,)
+
+def measure(path, nclients):
+    comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+    comp.onInitialize()
+    comp.setParameter('loglevel', 'WARN')
+    comp.setParameter('model_cache', 'none')
+    comp.setParameter('session_key', 'source')
+    comp.loadSEATML([path])
+    time.sleep(0.2)
+    t = time.time()
+    clients = []
+    for i in range(nclients):
+        s = socket.create_connection(('127.0.0.1', PORT))
+        s.setblocking(0)
+        clients.append(s)
+    while comp.stats.snapshot()['gauges'].get('socket.kiosk.clients', 0) < nclients and time.time() - t < 60:
+        time.sleep(0.001)
+    accept = time.time() - t
+    poller = Poller()
+    byfd = {}
+    for s in clients:
+        poller.register(s.fileno())
+        byfd[s.fileno()] = s
+    t = time.time()
+    turns = dict((s.fileno(), 0) for s in clients)
+    for s in clients:
+        s.send('hello\n')
+    waiting = nclients
+    while waiting > 0 and time.time() - t < 120:
+        for fd, readable, writable in poller.poll(1.0):
+            s = byfd[fd]
+            data = s.recv(4096)
+            turns[fd] += data.count('\n')
+            if turns[fd] >= NTURNS:
+                waiting -= 1
+            else:
+                s.send('hello\n')
+    elapsed = time.time() - t
+    threads = threading.activeCount()
+    for s in clients:
+        s.close()
+    poller.close()
+    comp.onFinalize()
+    return accept, nclients * NTURNS / elapsed, threads
+
+def main():
+    fd, path = tempfile.mkstemp(suffix='.seatml')
+    try:
+        os.write(fd, SEATML.encode('utf-8'))
+        os.close(fd)
+        print "%8s %10s %12s %8s" % ("clients", "accept s", "inputs/s", "threads")
+        for nclients in (10, 100, 1000, 5000):
+            print "%8i %10.3f %12.0f %8i" % ((nclients,) + measure(path, nclients))
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT timers against the number of pending timers
+
+Measures the cost of adding and cancelling a timer of the timer wheel
+with 1000 to 100000 timers pending, and of expiring the timers every
+0.1 s for an hour (as many as come due), then the inputs per
+second of a SEAT component on the local OpenRTM stand-in whose states
+have timeouts (re-armed by every input) against the same script without
+them, with 10000 sessions.
+
+  $ python bench/bench_timers.py
+'''
+
+import sys
+import os
+import time
+import random
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bench_seat import rtcstandin, seatmodule
+from seatsat.timerwheel import TimerWheel
+
+NSESSIONS = 10000
+NINPUTS = 50000
+
+SEATML = u'''<?xml version="1.0" encoding="UTF-8"?>
+<seatml>
+  <general name="bench">
+    <agent name="speechin" type="rtcin" datatype="TimedString"/>
+    <agent name="speechout" type="rtcout" datatype="TimedString"/>
+  </general>
+  <state name="start">
+    %s
+    <rule><key>hello</key><command host="speechout">hi</command></rule>
+  </state>
+</seatml>
+'''
+
+TIMEOUTS = u'''<timeout seconds="30"><command host="speechout">are you there?</command></timeout>
+    <timeout seconds="60"><command host="speechout">bye</command></timeout>'''
+
+def measurewheel(npending, rand):
+    wheel = TimerWheel()
+    now = 0.0
+    timers = [wheel.add(now + rand.uniform(1, 3600), None) for i in range(npending)]
+    n = 10000
+    delays = [rand.uniform(1, 3600) for i in range(n)]
+    t = time.time()
+    added = [wheel.add(now + d, None) for d in delays]
+    add = (time.time() - t) / n
+    t = time.time()
+    for timer in added:
+        wheel.cancel(timer)
+    cancel = (time.time() - t) / n
+    t = time.time()
+    n = 0
+    while now < 3600:
+        now += 0.1
+        wheel.expire(now)
+        n += 1
+    expire = (time.time() - t) / n
+    return add, cancel, expire
+
+def measureseat(path, inputs):
+    comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+    comp.onInitialize()
+    comp.setParameter('loglevel', 'WARN')
+    comp.setParameter('model_cache', 'none')
+    comp.setParameter('session_key', 'field')
+    comp.loadSEATML([path])
+    t = time.time()
+    for s in inputs:
+        comp.processResult('speechin', s)
+    elapsed = time.time() - t
+    pending = len(comp._loop.timers)
+    comp.onFinalize()
+    return len(inputs) / elapsed, pending
+
+def main():
+    rand = random.Random(0)
+    print "%10s %10s %10s %10s" % ("pending", "add us", "cancel us", "expire us")
+    for npending in (1000, 10000, 100000):
+        add, cancel, expire = measurewheel(npending, rand)
+        print "%10i %10.2f %10.2f %10.2f" % (npending, add * 1e6, cancel * 1e6, expire * 1e6)
+    print
+    inputs = [u'@robot%i hello' % (rand.randrange(NSESSIONS),) for i in range(NINPUTS)]
+    print "%10s %12s %10s" % ("timeouts", "inputs/s", "pending")
+    for name, timeouts in (("no", u''), ("yes", TIMEOUTS)):
+        fd, path = tempfile.mkstemp(suffix='.seatml')
+        try:
+            os.write(fd, (SEATML % (timeouts,)).encode('utf-8'))
+            os.close(fd)
+            print "%10s %12.0f %10i" % ((name,) + measureseat(path, inputs))
+        finally:
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
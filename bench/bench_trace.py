@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT tracer
+
+Measures the inputs per second of a SEAT component on the local OpenRTM
+stand-in with the tracer disabled and enabled, the cost of recording a
+span, and the time to write the trace file with full ring buffers.
+
+  $ python bench/bench_trace.py
+'''
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bench_seat import rtcstandin, seatmodule
+from seatsat.tracer import Tracer, RINGSIZE
+
+NINPUTS = 100000
+
+SEATML = u'''<?xml version="1.0" encoding="UTF-8"?>
+<seatml>
+  <general name="bench">
+    <agent name="speechin" type="rtcin" datatype="TimedString"/>
+    <agent name="speechout" type="rtcout" datatype="TimedString"/>
+  </general>
+  <state name="start">
+    <rule><key>hello</key><command host="speechout">hi</command><statetransition>talking</statetransition></rule>
+  </state>
+  <state name="talking">
+    <rule><key>hello</key><command host="speechout">bye</command><statetransition>start</statetransition></rule>
+  </state>
+</seatml>
+'''
+
+def measure(script, trace, inputs):
+    comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+    comp.onInitialize()
+    comp._loop.stop() # the benchmark gives the inputs on its own thread
+    comp.setParameter('loglevel', 'WARN')
+    comp.setParameter('model_cache', 'none')
+    comp.setParameter('trace', trace)
+    comp.loadSEATML([script])
+    t = time.time()
+    for s in inputs:
+        comp.processResult('speechin', s)
+    return len(inputs) / (time.time() - t)
+
+def main():
+    inputs = [u'hello'] * NINPUTS
+    tmpdir = tempfile.mkdtemp()
+    try:
+        script = os.path.join(tmpdir, 'bench.seatml')
+        fp = open(script, 'wb')
+        fp.write(SEATML.encode('utf-8'))
+        fp.close()
+        trace = os.path.join(tmpdir, 'trace.json')
+        print "%10s %12s" % ("tracer", "inputs/s")
+        for name, path in (("disabled", "none"), ("enabled", trace)):
+            print "%10s %12.0f" % (name, measure(script, path, inputs))
+        print
+        tracer = Tracer()
+        n = RINGSIZE * 4
+        t = time.time()
+        for i in xrange(n):
+            tracer.span('lookup', t)
+        print "%.2f us per span" % ((time.time() - t) / n * 1e6,)
+        t = time.time()
+        tracer.dump(trace)
+        print "%i spans written in %.0f ms (%i KB)" % \
+            (RINGSIZE, (time.time() - t) * 1000, os.path.getsize(trace) / 1024)
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
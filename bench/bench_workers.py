@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''benchmark of the SEAT worker processes against the number of workers
+
+Loads a synthetic SEATML script (see bench_seat.py) into a SEAT
+component on the local OpenRTM stand-in, gives it inputs of many
+sessions as "@id input" the way its input port would, and measures the
+rate at which the component took the inputs (the front end) and the
+time until the outputs of all the inputs came back from the workers.
+
+The front end only finds the session of an input and passes its bytes
+to the worker, so with enough CPU cores the end to end rate grows with
+the workers up to the rate of the front end. On a single core the
+workers share it with the front end and the end to end rate is lower
+than without workers. The CPU time per input of the component and of
+the workers tells the rate for more cores: about the smaller of
+1/front and (cores - 1)/worker.
+
+  $ python bench/bench_workers.py
+'''
+
+import sys
+import os
+import time
+import random
+import tempfile
+import multiprocessing
+import resource
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bench_seat import makeseatml, rtcstandin, seatmodule
+import RTC
+
+NSESSIONS = 1000
+NINPUTS = 20000
+
+def measure(path, nworkers, inputs):
+    comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+    comp.onInitialize()
+    comp.setParameter('loglevel', 'WARN')
+    comp.setParameter('session_key', 'field')
+    comp.loadSEATML([path])
+    port = comp._port['speechout']
+    if nworkers > 0:
+        comp.startWorkers(nworkers)
+    written = port.written
+    data = [RTC.TimedString(RTC.Time(0, 0), s.encode('utf-8')) for s in inputs]
+    def cpu(who):
+        usage = resource.getrusage(who)
+        return usage.ru_utime + usage.ru_stime
+    front = cpu(resource.RUSAGE_SELF)
+    t = time.time()
+    for d in data:
+        comp.onData('speechin', d)
+    frontend = time.time() - t
+    # every input has one output
+    expected = written + len(inputs)
+    while port.written < expected and time.time() - t < 60:
+        time.sleep(0.001)
+    elapsed = time.time() - t
+    front = cpu(resource.RUSAGE_SELF) - front
+    # (the workers count once they have been waited for)
+    workers = cpu(resource.RUSAGE_CHILDREN)
+    comp.onFinalize()
+    workers = cpu(resource.RUSAGE_CHILDREN) - workers
+    n = float(len(inputs))
+    return n / frontend, n / elapsed, front / n * 1e6, workers / n * 1e6
+
+def main():
+    rand = random.Random(0)
+    inputs = [u'@robot%i s0 r%i' % (i % NSESSIONS, rand.randrange(100)) for i in range(NINPUTS)]
+    fd, path = tempfile.mkstemp(suffix='.seatml')
+    try:
+        os.write(fd, makeseatml(2, 100, 3, 0).encode('utf-8'))
+        os.close(fd)
+        print "%d CPU cores" % (multiprocessing.cpu_count(),)
+        print "%8s %14s %14s %12s %12s" % ("workers", "front end/s", "inputs/s", "front us", "worker us")
+        for nworkers in (0, 1, 2, 4, 8):
+            print "%8i %14.0f %14.0f %12.1f %12.1f" % ((nworkers,) + measure(path, nworkers, inputs))
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -31,3 +31,9 @@ LANG=ja_JP.UTF-8 seatmltosrgs --help > seatmltosrgs-ja.rst
 LANG=C seatmltographviz --help > seatmltographviz.rst
 LANG=ja_JP.UTF-8 seatmltographviz --help > seatmltographviz-ja.rst
 
+LANG=C seatreplay --help > seatreplay.rst
+LANG=ja_JP.UTF-8 seatreplay --help > seatreplay-ja.rst
+
+LANG=C seatmlc --help > seatmlc.rst
+LANG=ja_JP.UTF-8 seatmlc --help > seatmlc-ja.rst
+
@@ -15,25 +15,38 @@ http://www.opensource.org/licenses/eclipse-1.0.txt
 
 import sys
 import os
-import getopt
 import codecs
 import locale
 import time
-import signal
 import re
 import traceback
-import socket
 import optparse
 import threading
+import json
+import marshal
+import types
+import gc
 import OpenRTM_aist
 import RTC
-from lxml import etree
-from BeautifulSoup import BeautifulSoup
-
 
 from seatsat.__init__ import __version__
 from seatsat import utils
-from seatsat.mtTkinter import *
+from seatsat.ruleindex import RuleIndex
+from seatsat.seatstats import Stats
+from seatsat.dialogloop import DialogLoop, DROP_OLDEST
+from seatsat.sessions import Session, SessionTable
+from seatsat.seatml import ScriptReader, ModelCache, globalnames
+from seatsat.nbest import iternbest
+from seatsat.shellexec import ShellExecutor
+from seatsat.seatlog import CategoryLogger, StreamLogBuf
+from seatsat.workers import WorkerPool, closeinherited
+from seatsat.checkpoint import Checkpoint
+from seatsat.tracer import Tracer
+from seatsat import seqdata
+from seatsat.sockethub import SocketHub, Connection, Listener, LINE, QUEUELENGTH, agentof
+
+# when the module was loaded, for the time to be ready reported by loadSEATML
+_started = time.time()
 
 try:
     import gettext
@@ -51,68 +64,62 @@ SEAT has following features:
  3. Adapter functions (supports OpenRTM , BSD socket, etc...).
 ''')
 
-class SocketAdaptor(threading.Thread):
-    def __init__(self, seat, name, host, port):
-        threading.Thread.__init__(self)
-        self.seat = seat
-        self.name = name
-        self.host = host
-        self.port = port
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.connected = False
-        self.mainloop = True
-        self.start()
-
-    def run(self):
-        while self.mainloop:
-            if self.connected == False:
-                try:
-                    self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    self.socket.connect((self.host, self.port))
-                    self.socket.settimeout(1)
-                    self.connected = True
-                except socket.error:
-                    print "reconnect error in ", self.name
-                    time.sleep(1)
-                except:
-                    print traceback.format_exc()
-            if self.connected == True:
-                try:
-                    data = self.socket.recv(1024)
-                    if len(data) != 0:
-                        self.seat.processResult(self.name, data)
-                except socket.timeout:
-                    pass
-                except socket.error:
-                    self.socket.close()
-                    self.connected = False
-                    print traceback.format_exc()
-                except:
-                    print traceback.format_exc()
-
-    def terminate(self):
-        self.mainloop = False
-        if self.connected == True:
-            self.socket.close()
-            self.connected = False
-        
-    def send(self, name, msg):
-        if self.connected == False:
-            try:
-                self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.socket.connect((self.host, self.port))
-                self.connected = True
-                print "connect socket"
-            except socket.error:
-                print "cannot connect"
-        if self.connected == True:
-            try:
-                self.socket.sendall(msg+"\n")
-            except socket.error:
-                #print traceback.format_exc()
-                self.socket.close()
-                self.connected = False
-                print traceback.format_exc()
+rtc_in_data = None
+
+# session id given in the input ("@id input")
+_sessionfield = re.compile(r'@(\S+)\s+', re.UNICODE)
+
+SESSIONKEYS = ('none', 'source', 'field')
+
+# names of the action types in the statistics
+ACTIONS = {'c': 'command', 't': 'transition', 'l': 'log', 'x': 'shell', 's': 'script', 'd': 'delay'}
+
+# kinds of the timers of a session
+TIMEOUT = 'timeout'
+DELAY = 'delay'
+
+# length of the buffer of an output port (if the agent has no queue attribute)
+OUTPORTBUFFER = 8
+
+# buffer policies of OpenRTM for the queue policies of the agents
+FULLPOLICIES = {'drop-oldest': 'overwrite', 'drop-newest': 'do_nothing'}
+
+def _encode(data):
+    if isinstance(data, unicode):
+        return data.encode('utf-8')
+    return str(data)
+
+def converter(dtype, seq, code=None):
+    '''return a function converting commands to the data of a port
+
+    Sequences are given as comma separated text, or by a script as a
+    list, an array or a buffer (of elements of the typecode).'''
+    if dtype is str:
+        conv = _encode
+    else:
+        conv = dtype
+    if not seq:
+        return conv
+    def convertseq(data):
+        if isinstance(data, basestring):
+            data = data.split(',')
+        else:
+            ret = seqdata.tolist(data, code)
+            if ret is not None:
+                return ret
+        return [conv(d) for d in data]
+    return convertseq
+
+# Tk (through mtTkinter) is only imported for the test mode GUI
+tk = None
+
+def loadgui():
+    '''import the GUI toolkit (needs a display)'''
+    global tk
+    if tk is None:
+        from seatsat import mtTkinter
+        tk = mtTkinter
+    return tk
 
 seat_spec = ["implementation_id", "SEAT",
              "type_name",         "SEAT",
@@ -125,10 +132,40 @@ seat_spec = ["implementation_id", "SEAT",
              "language",          "Python",
              "lang_type",         "script",
              "conf.default.scriptfile", "none",
-             "conf.__description__.scriptfile", _("Script file to load (unimplemented).").encode('UTF-8'),
+             "conf.__description__.scriptfile", _("Script files to load (comma separated). Setting it again reloads the scripts without interrupting the dialogs.").encode('UTF-8'),
+             "conf.default.model_cache", "none",
+             "conf.__description__.model_cache", _("Directory to keep the compiled scripts in, so that unchanged scripts start without reading XML (auto for the user cache directory, none to disable, the default).").encode('UTF-8'),
              "conf.default.scorelimit", "0.0",
              "conf.__widget__.scorelimit", "slider",
              "conf.__description__.scorelimit", _("Lower limit of speech recognition score to consider.").encode('UTF-8'),
+             "conf.default.stats_interval", "0.0",
+             "conf.__description__.stats_interval", _("Interval in seconds to write latency histograms and counters to the stats port as json (0 to disable).").encode('UTF-8'),
+             "conf.default.queue_length", "64",
+             "conf.__description__.queue_length", _("Maximum number of inputs waiting to be processed (0 for unlimited).").encode('UTF-8'),
+             "conf.default.queue_policy", "block",
+             "conf.__widget__.queue_policy", "radio",
+             "conf.__constraints__.queue_policy", "(block,drop-oldest,drop-newest)",
+             "conf.__description__.queue_policy", _("What to do with an input when the input queue is full: block the sender, drop the oldest input or drop the new input.").encode('UTF-8'),
+             "conf.default.session_key", "none",
+             "conf.__widget__.session_key", "radio",
+             "conf.__constraints__.session_key", "(none,source,field)",
+             "conf.__description__.session_key", _("Where the session of an input comes from: none (one dialog), source (the port or socket of the input) or field (inputs given as \"@id input\", outputs sent as \"@id output\").").encode('UTF-8'),
+             "conf.default.session_timeout", "0.0",
+             "conf.__description__.session_timeout", _("Seconds after which idle sessions are forgotten (0 to keep them).").encode('UTF-8'),
+             "conf.default.checkpoint", "none",
+             "conf.__description__.checkpoint", _("File to keep the states of the dialogs and the variables of the scripts in, restored when SEAT starts again (none to disable).").encode('UTF-8'),
+             "conf.default.trace", "none",
+             "conf.__description__.trace", _("File to write a trace of the dialog turns to (Chrome trace events, for chrome://tracing or Perfetto), none to disable tracing.").encode('UTF-8'),
+             "conf.default.trace_interval", "0.0",
+             "conf.__description__.trace_interval", _("Interval in seconds to write the trace file (0 to write it only when SEAT exits). The file has the latest spans of each thread.").encode('UTF-8'),
+             "conf.default.loglevel", "INFO",
+             "conf.__description__.loglevel", _("Log level, optionally per category (e.g. INFO,load=WARN,lookup=DEBUG). Categories are load, lookup, dispatch and socket.").encode('UTF-8'),
+             "conf.default.log_thread", "0",
+             "conf.__description__.log_thread", _("Write log messages from a background thread (1) or from the caller (0).").encode('UTF-8'),
+             "conf.default.shell_workers", "4",
+             "conf.__description__.shell_workers", _("Maximum number of shell commands running at the same time.").encode('UTF-8'),
+             "conf.default.shell_timeout", "30.0",
+             "conf.__description__.shell_timeout", _("Default timeout of shell commands in seconds (0 to disable).").encode('UTF-8'),
              "exec_cxt.periodic.rate", "100.0",
              ""]
 
@@ -150,207 +187,764 @@ class SEAT(OpenRTM_aist.DataFlowComponentBase):
             self._basedir = os.path.dirname(unicode(sys.executable, sys.getfilesystemencoding()))
         else:
             self._basedir = os.path.dirname(__file__)
-        xmlschema_doc = etree.parse(os.path.join(self._basedir, 'seatml.xsd'))
-        self._xmlschema = etree.XMLSchema(xmlschema_doc)
         self.states = []
         self.currentstate = "start"
-        self.keys = {}
-        self.regkeys = {}
+        self.rules = RuleIndex()
         self.adaptors = {}
         self.adaptortype = {}
+        self._outputs = {} # name -> (converter, data, port, batch) of the output ports
+        self._views = {} # name -> function making the sequences of an input into arrays
+        self._batched = {}
+        self._batchlock = threading.Lock()
         self.statestack = []
         self._data = {}
         self._port = {}
         self._scriptfile = ["none"]
         self._scorelimit = [0.0]
+        self._shellworkers = [4]
+        self._shelltimeout = [30.0]
+        self._shell = None
+        self._loglevel = ["INFO"]
+        self._statsinterval = [0.0]
+        self._statslast = 0
+        self._tracefile = ["none"]
+        self._traceinterval = [0.0]
+        self._tracelast = 0
+        self.stats = Stats()
+        self._queuelength = [64]
+        self._queuepolicy = ["block"]
+        self._loop = DialogLoop(stats=self.stats)
+        self._sessionkey = ["none"]
+        self._sessiontimeout = [0.0]
+        self._sessionslast = 0
+        self.sessions = SessionTable(expired=self.forgetSession)
+        self.session = self._defaultsession = Session(None)
+        self.source = None # source of the input being processed
+        self._checkpointfile = ["none"]
+        self._checkpoint = None
+        self._restored = False
+        self._saved = None # (sessions, variables) to restore once a script is loaded
+        self._savedvars = {} # name -> marshalled value of the variables in the checkpoint
+        self._globalnames = {} # code of the scripts -> the global names it uses (see globalnames())
+        self._delayed = [] # (delay, action, input) of the delayed actions of the turn
+        self._transferred = False
+        self.startstate = None
+        self.script = None
+        self.agents = {}
+        self._listeners = set() # names of the server agents
+        self._modelcache = ["none"]
+        self._reader = ScriptReader(os.path.join(self._basedir, 'seatml.xsd'), None)
+        self._workers = None
+        self._worker = None
+        self._hub = None
+        self._outputlock = threading.Lock()
+        self._logthread = ["0"]
         self.max_score = 0
         self.gui_flag = False
         self.init_state = None
         self.gui_buttons = {}
         self.frames = {}
-        self.root = Tk()
+        self.root = None
+        self._scriptns = self.newScriptNamespace()
+        self._scriptglobals = frozenset(self._scriptns) | frozenset(['rtc_result'])
+        self._scriptlock = threading.RLock()
+
+    def newScriptNamespace(self):
+        '''return a namespace for the scripts
+
+        Scripts share one namespace through the lifetime of the component
+        (starting with the module globals they used to see).'''
+        ns = dict(globals())
+        ns['seat'] = self
+        ns['self'] = self
+        return ns
 
     def onInitialize(self):
         OpenRTM_aist.DataFlowComponentBase.onInitialize(self)
-        self._logger = OpenRTM_aist.Manager.instance().getLogbuf(self._properties.getProperty("instance_name"))
+        self._logger = CategoryLogger(OpenRTM_aist.Manager.instance().getLogbuf(self._properties.getProperty("instance_name")))
         self._logger.RTC_INFO("SEAT (Speech Event Action Transfer) version " + __version__)
         self._logger.RTC_INFO("Copyright (C) 2009-2010 Yosuke Matsusaka and Isao Hara")
+        self.bindParameter("model_cache", self._modelcache, "none", self.modelcacheTrans)
         self.bindParameter("scriptfile", self._scriptfile, "none", self.scriptfileTrans)
         self.bindParameter("scorelimit", self._scorelimit, "0.0")
+        self.bindParameter("shell_workers", self._shellworkers, "4")
+        self.bindParameter("shell_timeout", self._shelltimeout, "30.0")
+        self.bindParameter("loglevel", self._loglevel, "INFO", self.loglevelTrans)
+        self.bindParameter("stats_interval", self._statsinterval, "0.0")
+        self.bindParameter("trace", self._tracefile, "none", self.traceTrans)
+        self.bindParameter("trace_interval", self._traceinterval, "0.0")
+        self.bindParameter("log_thread", self._logthread, "0", self.logthreadTrans)
+        self.bindParameter("queue_length", self._queuelength, "64", self.queuelengthTrans)
+        self.bindParameter("queue_policy", self._queuepolicy, "block", self.queuepolicyTrans)
+        self.bindParameter("session_key", self._sessionkey, "none", self.sessionkeyTrans)
+        self.bindParameter("session_timeout", self._sessiontimeout, "0.0", self.sessiontimeoutTrans)
+        self.bindParameter("checkpoint", self._checkpointfile, "none", self.checkpointTrans)
+        self._reader.logger = self._logger
+        self._loop.logger = self._logger
+        self._loop.start()
         return RTC.RTC_OK
 
     def onFinalize(self):
         OpenRTM_aist.DataFlowComponentBase.onFinalize(self)
-        try:
-            for a in self.adaptors.itervalues():
-                if isinstance(a, SocketAdaptor):
-                    a.terminate()
-                    a.join()
-        except:
-            self._logger.RTC_ERROR(traceback.format_exc())
+        if self._hub is not None:
+            self._hub.stop()
+            self._hub = None
+        self._loop.stop()
+        if self._checkpoint is not None:
+            self._checkpoint.flush()
+            self._checkpoint.close()
+            self._checkpoint = None
+        if self._workers is not None:
+            self._workers.terminate()
+            self._workers = None
+        self.writeTrace()
+        if self._shell is not None:
+            self._shell.terminate()
+            self._shell = None
+        self._logger.stopthread()
         if self.gui_flag:
             self.root.quit()
 
         return RTC.RTC_OK
 
+    def loglevelTrans(self, _type, _str):
+        try:
+            self._logger.setlevels(_str)
+        except ValueError:
+            self._logger.RTC_ERROR("invalid log level: " + _str)
+        return OpenRTM_aist.stringTo(_type, _str)
+
+    def logthreadTrans(self, _type, _str):
+        if _str.strip() in ("1", "true", "on"):
+            self._logger.startthread()
+        else:
+            self._logger.stopthread()
+        return OpenRTM_aist.stringTo(_type, _str)
+
+    def queuelengthTrans(self, _type, _str):
+        try:
+            self._loop.maxlen = int(_str)
+        except ValueError:
+            self._logger.RTC_ERROR("invalid queue length: " + _str)
+        return OpenRTM_aist.stringTo(_type, _str)
+
+    def queuepolicyTrans(self, _type, _str):
+        try:
+            self._loop.setpolicy(_str.strip())
+        except ValueError:
+            self._logger.RTC_ERROR("invalid queue policy: " + _str)
+        return OpenRTM_aist.stringTo(_type, _str)
+
+    def sessionkeyTrans(self, _type, _str):
+        if _str.strip() not in SESSIONKEYS:
+            self._logger.RTC_ERROR("invalid session key: " + _str)
+            return self._sessionkey[0]
+        return OpenRTM_aist.stringTo(_type, _str.strip())
+
+    def sessiontimeoutTrans(self, _type, _str):
+        try:
+            self.sessions.timeout = float(_str)
+        except ValueError:
+            self._logger.RTC_ERROR("invalid session timeout: " + _str)
+        return OpenRTM_aist.stringTo(_type, _str)
+
+    def traceTrans(self, _type, _str):
+        if _str.strip() == "none":
+            self.stats.tracer = None
+        elif self.stats.tracer is None:
+            self.stats.tracer = Tracer()
+        return OpenRTM_aist.stringTo(_type, _str.strip())
+
+    def checkpointTrans(self, _type, _str):
+        self._loop.control(self.openCheckpoint, _str.strip())
+        return OpenRTM_aist.stringTo(_type, _str)
+
+    def modelcacheTrans(self, _type, _str):
+        if _str.strip() == "none":
+            self._reader.cache = None
+        elif _str.strip() == "auto":
+            self._reader.cache = ModelCache()
+        else:
+            self._reader.cache = ModelCache(_str.strip())
+        return OpenRTM_aist.stringTo(_type, _str)
+
     def scriptfileTrans(self, _type, _str): 
         # self._logger.RTC_INFO("scriptfile = " + _str)
         if _str != "none":
             try:
-                self.loadSEATML(_str.split(','))
+                if self.script is None:
+                    self.loadSEATML(_str.split(','))
+                else:
+                    self.reloadSEATML(_str.split(','))
             except:
                 self._logger.RTC_ERROR(traceback.format_exc())
         return OpenRTM_aist.stringTo(_type, _str)
 
     def createInPort(self, name, type=RTC.TimedString):
-        self._logger.RTC_INFO("create inport: " + name)
+        self._logger.info('load', "create inport: %s", name)
         self._data[name] = type(RTC.Time(0,0), None)
         self._port[name] = OpenRTM_aist.InPort(name, self._data[name])
         self._port[name].addConnectorDataListener(OpenRTM_aist.ConnectorDataListenerType.ON_BUFFER_WRITE,
                                                   DataListener(name, type, self))
         self.registerInPort(name, self._port[name])
 
-    def createOutPort(self, name, type=RTC.TimedString):
-        self._logger.RTC_INFO("create outport: " + name)
+    def createOutPort(self, name, type=RTC.TimedString, length=None, policy=None):
+        '''create an output port whose buffer keeps length data
+
+        When the buffer is full, the oldest data is overwritten
+        (drop-oldest) or the new data is dropped (drop-newest). The length
+        and the policy not given are left to the configuration of the port
+        (port.outport.<name>.buffer.* of rtc.conf).'''
+        self._logger.info('load', "create outport: %s (buffer %s, %s)", name,
+                          length or 'default', policy or 'default')
         self._data[name] = type(RTC.Time(0,0), None)
-        self._port[name] = OpenRTM_aist.OutPort(name, self._data[name], OpenRTM_aist.RingBuffer(8))
+        self._port[name] = OpenRTM_aist.OutPort(name, self._data[name],
+                                                OpenRTM_aist.RingBuffer(length or OUTPORTBUFFER))
         self.registerOutPort(name, self._port[name])
+        # the buffers of the connectors (merged into the configuration of the port)
+        prop = OpenRTM_aist.Properties()
+        if length is not None:
+            prop.setProperty("buffer.length", str(length))
+        if policy is not None:
+            prop.setProperty("buffer.write.full_policy", FULLPOLICIES[policy])
+        if length is not None or policy is not None:
+            self._port[name].init(prop)
+
+    def sockethub(self):
+        '''return the thread running the socket agents (started on first use)'''
+        if self._hub is None:
+            self._hub = SocketHub(self._logger, self.stats)
+            self._hub.start()
+        return self._hub
+
+    def createSocketAdaptor(self, name, host, port, **options):
+        '''return the connection of a socket agent (see SocketHub.connect)'''
+        return self.sockethub().connect(name, host, port, receive=self.receive, **options)
+
+    def createSocketServer(self, name, host, port, **options):
+        '''return the listener of a server agent (see SocketHub.listen)'''
+        return self.sockethub().listen(name, host, port, receive=self.receive,
+                                       closed=self.clientClosed, **options)
+
+    def receive(self, name, data):
+        if not self.route('r', name, data):
+            self.post(self.processResult, name, data)
+
+    def clientClosed(self, name):
+        if self._workers is not None:
+            self.dropSession(name)
+        else:
+            self.post(self.dropSession, name)
+
+    def dropSession(self, sid):
+        '''forget the session of a client which went away'''
+        if self._sessionkey[0] != 'source':
+            return
+        if self._workers is not None:
+            self._workers.submit(sid, 'd', sid, None)
+            return
+        session = self.sessions.remove(sid)
+        if session is not None:
+            self.forgetSession(session)
+            self._logger.info('dispatch', "session %s closed", sid)
+            self.stats.gauge('sessions', len(self.sessions))
+
+    def forgetSession(self, session):
+        '''cancel the timers of a session removed from the table and drop its
+        record from the checkpoint (the sessions expire through here too)'''
+        for timer in session.timers or ():
+            self.stopTimer(timer)
+        session.timers = None
+        if self._checkpoint is not None:
+            self._checkpoint.drop(session.id)
 
     def onData(self, name, data):
+        if not self.route(isinstance(data, RTC.TimedString) and 's' or 'v', name, data.data):
+            self.post(self.processData, name, data)
+
+    def route(self, kind, host, data):
+        '''send an input to the worker of its session, on the thread it came on
+
+        Return False if there are no workers. The component only finds the
+        session of the input, the worker decodes and logs it (see
+        WorkerPool.submit() for the kinds).'''
+        workers = self._workers
+        if workers is None:
+            return False
+        workers.submit(self.sessionOf(host, data)[0], kind, host, data)
+        return True
+
+    def post(self, func, *args):
+        '''run func(*args) on the dialog thread (see DialogLoop)'''
+        return self._loop.post(func, *args)
+
+    def processData(self, name, data):
         try:
             if isinstance(data, RTC.TimedString):
-                data.data = data.data.decode('utf-8')
-                self.processResult(name, data.data)
+                self.processString(name, data.data)
             else:
-                self.processNonString(name, data.data)
+                self.processSequence(name, data.data)
         except:
             self._logger.RTC_ERROR(traceback.format_exc())
 
+    def processString(self, name, data):
+        '''process the UTF-8 bytes of a string input'''
+        t = time.time()
+        data = data.decode('utf-8')
+        self.stats.record('decode', time.time() - t)
+        return self.processResult(name, data)
+
+    def processSequence(self, name, data):
+        '''process the data of another input, made into arrays as the agent says'''
+        view = self._views.get(name)
+        if view is not None:
+            t = time.time()
+            data = view(data)
+            self.stats.record('decode', time.time() - t)
+        return self.processNonString(name, data)
+
     def onExecute(self, ec_id):
         OpenRTM_aist.DataFlowComponentBase.onExecute(self, ec_id)
+        interval = float(self._statsinterval[0])
+        if interval > 0 and time.time() - self._statslast >= interval:
+            self._statslast = time.time()
+            self.writeStats()
+        interval = float(self._traceinterval[0])
+        if interval > 0 and time.time() - self._tracelast >= interval:
+            self._tracelast = time.time()
+            self.writeTrace()
+        if self.sessions.timeout > 0 and time.time() - self._sessionslast >= 1.0:
+            self._sessionslast = time.time()
+            self.post(self.evictSessions)
         return RTC.RTC_OK
 
+    def evictSessions(self):
+        evicted = self.sessions.evict()
+        if evicted:
+            self._logger.info('dispatch', "evicted %i idle sessions", len(evicted))
+            self.stats.count('sessions_evicted', len(evicted))
+        self.stats.gauge('sessions', len(self.sessions))
+
+    def sessionOf(self, host, s):
+        '''return the session id of the input and the input without it'''
+        key = self._sessionkey[0]
+        if key == 'source':
+            return host, s
+        elif key == 'field' and isinstance(s, basestring):
+            m = _sessionfield.match(s)
+            if m:
+                return m.group(1), s[m.end():]
+        return None, s
+
+    def switchSession(self, host, s):
+        '''make the session of the input the current session
+
+        The session is the source of the input or is given in the input as
+        "@id input", as the session_key parameter says (all the inputs go
+        to the default session otherwise). Returns the input without the
+        session id. New sessions start in the start state (without running
+        the actions of a transition).'''
+        sid, s = self.sessionOf(host, s)
+        if sid is None:
+            session = self._defaultsession
+        else:
+            session = self.sessions.get(sid)
+        if session is None:
+            session = self.sessions.add(sid, self.startstate or "start")
+            self._logger.info('dispatch', "new session %s", sid)
+            self.stats.gauge('sessions', len(self.sessions))
+            if self._checkpoint is not None:
+                self._checkpoint.session(sid, session.state, None)
+        self.useSession(session)
+        return s
+
+    def useSession(self, session):
+        '''make the session the current session'''
+        if session is self.session:
+            return
+        self.session.state = self.currentstate
+        self.session.stack = self.statestack or None
+        self.session = session
+        self.currentstate = session.state
+        self.statestack = session.stack or []
+
+    def startTimer(self, delay, func, *args):
+        return self._loop.later(delay, func, *args)
+
+    def stopTimer(self, timer):
+        self._loop.cancel(timer)
+
+    def addTimer(self, delay, kind, actions, data=None):
+        '''run the actions in the current session after delay seconds'''
+        session = self.session
+        timer = self.startTimer(delay, self.fireTimer, session, self.source, kind, actions, data)
+        if session.timers is None:
+            session.timers = set()
+        session.timers.add(timer)
+
+    def cancelTimers(self, kind=None):
+        '''cancel the timers (of the kind) of the current session'''
+        timers = self.session.timers
+        if not timers:
+            return
+        for timer in [t for t in timers if kind is None or t.args[2] == kind]:
+            self.stopTimer(timer)
+            timers.discard(timer)
+
+    def armTimers(self, timeouts=True):
+        '''start the timeouts of the current state and the delayed actions
+
+        Called at the end of a turn: the timeouts of a state count from
+        entering the state or from the last input, and the delayed actions
+        of a rule go on unless the dialog leaves the state the rule led to.'''
+        if self._workers is not None:
+            return
+        if timeouts:
+            self.cancelTimers(TIMEOUT)
+            for seconds, actions in self.rules.timeouts(self.currentstate):
+                self.addTimer(seconds, TIMEOUT, actions)
+        if self._delayed:
+            delayed = self._delayed
+            self._delayed = []
+            for delay, action, data in delayed:
+                self.addTimer(delay, DELAY, [action], data)
+
+    def fireTimer(self, session, source, kind, actions, data):
+        '''run the actions of a timer in its session (on the dialog thread)'''
+        # (peek, as a timer does not keep its session alive)
+        if session is not self._defaultsession and self.sessions.peek(session.id) is not session:
+            return # the session expired
+        self.useSession(session)
+        if session.timers:
+            session.timers.difference_update([t for t in session.timers if not t.pending()])
+        self.source = source
+        self._transferred = False
+        self._logger.info('dispatch', "%s in state %s", kind, self.currentstate)
+        self.stats.count(kind == TIMEOUT and 'timeouts' or 'delayed')
+        for c in actions:
+            t = time.time()
+            if kind == TIMEOUT:
+                self.activateCommand(c)
+            else:
+                self.activateCommandEx(c, data)
+            self.stats.record(ACTIONS[c[0]], time.time() - t)
+        self.armTimers(self._transferred)
+
+    def output(self, sid, host, data):
+        '''send data to the agent host (tagged with the session if needed)'''
+        self.deliver(self.replyTo(host), self.tagOutput(sid, host, data))
+
+    def replyTo(self, host):
+        '''return the client the input came from if host is its server agent
+
+        Outputs to a server agent go to the client of the current input,
+        or to all its clients if the input came from elsewhere.'''
+        source = self.source
+        if source is not None and source != host and agentof(source, self._listeners) == host:
+            return source
+        return host
+
+    def deliver(self, host, data):
+        try:
+            ad = self.adaptors[agentof(host, self._listeners)]
+        except KeyError:
+            self._logger.RTC_ERROR("no such adaptor:" + str(host))
+            return
+        ad.send(host, data)
+
+    def deliverFromWorker(self, host, data):
+        self._outputlock.acquire()
+        try:
+            self.deliver(host, data)
+        finally:
+            self._outputlock.release()
+
+    def startWorkers(self, n):
+        '''fork n worker processes running the dialogs with the loaded scripts
+
+        Sessions are routed to the workers by consistent hashing of their
+        id. The workers keep the configuration they had when forked.
+
+        The workers are forked on the dialog thread between two inputs,
+        with the log writer thread stopped and the locks of the other
+        threads held (see forkLocks()). The workers only pay off with more
+        than one CPU core, on one core the routing is an extra cost.'''
+        if self._sessionkey[0] == 'none':
+            self._logger.RTC_WARN("session_key is none, all the inputs go to one worker")
+        done = threading.Event()
+        self._loop.control(self.forkWorkers, n, done)
+        done.wait()
+        if self._workers is not None:
+            self._logger.info('dispatch', "started %i worker processes", n)
+
+    def forkWorkers(self, n, done):
+        threaded = self._logger.threaded()
+        try:
+            # the timers run in the workers from now on
+            for session in [self._defaultsession] + list(self.sessions):
+                for timer in session.timers or ():
+                    self.stopTimer(timer)
+                session.timers = None
+            self._logger.stopthread()
+            self._workers = WorkerPool(self, n, self.deliverFromWorker, self._logger,
+                                       self.forkLocks())
+        finally:
+            # (only the component gets here, the workers never return)
+            if threaded:
+                self._logger.startthread()
+            done.set()
+
+    def forkLocks(self):
+        '''the locks taken by the threads of the component, in the order they nest'''
+        locks = [self._scriptlock, self._batchlock, self._outputlock, self._loop._lock]
+        if self._hub is not None:
+            locks.append(self._hub._lock)
+        if self._shell is not None:
+            locks.append(self._shell._queue.mutex)
+        if self.stats.tracer is not None:
+            locks.append(self.stats.tracer._lock)
+        return locks
+
+    def becomeWorker(self, index, deliver, owns=None, keep=()):
+        '''turn the forked copy of the component into worker #index
+
+        Nothing of OpenRTM is used by the worker: logs go to stderr and
+        outputs are given to deliver(host, data). The sockets of the
+        socket agents and of the ORB are closed in the worker but the
+        descriptors to keep. The worker keeps the sessions for which
+        owns(id) is true and its own checkpoint and trace files (the files
+        of the component with ".<index>" appended).'''
+        self._workers = None
+        self._worker = index
+        if owns is not None:
+            for session in list(self.sessions):
+                if not owns(session.id):
+                    self.sessions.remove(session.id)
+        if self._hub is not None:
+            self._hub.abandon()
+            self._hub = None
+        self._shell = None
+        checkpoint = self._checkpoint
+        if checkpoint is not None:
+            checkpoint.close()
+        closeinherited(keep)
+        self._logger = CategoryLogger(StreamLogBuf(sys.stderr, "seat worker%i" % (index,)))
+        try:
+            self._logger.setlevels(self._loglevel[0])
+        except ValueError:
+            pass
+        self._reader.logger = self._logger
+        self._loop = DialogLoop(stats=self.stats, logger=self._logger)
+        self._loop.start()
+        self.gui_flag = False
+        self.deliver = deliver
+        if self.stats.tracer is not None:
+            # (written by the worker when it stops)
+            self.stats.tracer = Tracer(self.stats.tracer.size)
+            self._tracefile = ["%s.%i" % (self._tracefile[0], index)]
+        if checkpoint is not None:
+            self._checkpoint = Checkpoint("%s.%i" % (checkpoint.path, index))
+            self.saveDialogs(owns is None or owns(None))
+
+    def tagOutput(self, sid, host, data):
+        '''prefix string outputs with "@id " if the session was given in the input'''
+        if sid is None or self._sessionkey[0] != 'field' or not isinstance(data, basestring):
+            return data
+        t = self.adaptortype.get(host)
+        if t is not None and t[1] in (int, float):
+            return data
+        return u"@%s %s" % (sid, data)
+
+    def writeStats(self):
+        '''write the latency histograms and counters to the stats port as json'''
+        if "stats" not in self._port:
+            self.createOutPort("stats")
+        self._data["stats"].data = json.dumps(self.stats.snapshot(), sort_keys=True)
+        self._port["stats"].write()
+
+    def writeTrace(self):
+        '''write the spans kept by the tracer to the trace file'''
+        tracer = self.stats.tracer
+        if tracer is None:
+            return
+        try:
+            tracer.dump(self._tracefile[0])
+        except EnvironmentError, e:
+            self._logger.RTC_ERROR("unable to write trace file %s: %s" % (self._tracefile[0], e))
+
+    def writePort(self, name, port):
+        '''write the data of the output port (traced as I/O)'''
+        tracer = self.stats.tracer
+        if tracer is None:
+            return port.write()
+        t = time.time()
+        try:
+            return port.write()
+        finally:
+            tracer.span('port write', t, cat='io', args={'port': name})
+
     def send(self, name, data):
         if isinstance(data, str) :
-            self._logger.RTC_INFO("sending command %s (to %s)" % (data, name))
+            self._logger.info('dispatch', "sending command %s (to %s)", data, name)
         else:
-            self._logger.RTC_INFO("sending command to %s" % (name,))
-
-        dtype = self.adaptortype[name][1]
-        if dtype == str:
-            ndata = dtype(data.encode('utf-8'))
-        elif self.adaptortype[name][2]:
-            ndata = []
-            for d in data.split(","):
-                ndata.append(dtype(d))
-        else:
-            ndata = dtype(data)
-        self._data[name].data = ndata
-        self._port[name].write()
+            self._logger.info('dispatch', "sending command to %s", name)
+
+        try:
+            convert, value, port, batch = self._outputs[name]
+        except KeyError:
+            self._logger.RTC_ERROR("no output port for " + str(name))
+            return
+        if batch:
+            self.batchOutput(name, convert(data))
+            return
+        value.data = convert(data)
+        self.writePort(name, port)
+
+    def batchOutput(self, name, data):
+        '''keep the sequence to write it with the next ones at once
+
+        The sequences sent to the agent until the dialog thread gets to
+        flushOutputs() (the inputs already queued are processed first)
+        are joined into one write.'''
+        self._batchlock.acquire()
+        try:
+            flush = not self._batched
+            self._batched.setdefault(name, []).extend(data)
+        finally:
+            self._batchlock.release()
+        # (a loop which is not running flushes at once, without the lock)
+        if flush:
+            self._loop.control(self.flushOutputs)
+
+    def flushOutputs(self):
+        self._batchlock.acquire()
+        try:
+            batched = self._batched
+            self._batched = {}
+        finally:
+            self._batchlock.release()
+        for name, data in batched.iteritems():
+            output = self._outputs.get(name)
+            if output is not None:
+                output[1].data = data
+                self.writePort(name, output[2])
 
     def processResult(self, host, s):
         global rtc_in_data
+        start = time.time()
         try:
             s = unicode(s)
         except UnicodeDecodeError:
             s = str(s).encode('string_escape')
             s = unicode(s)
-        self._logger.RTC_INFO("got input %s (%s)" % (s, host))
+        self._logger.info('lookup', "got input %s (%s)", s, host)
+        if self._workers is not None:
+            return self._workers.submit(self.sessionOf(host, s)[0], 'r', host, s)
+        self.source = host
+        s = self.switchSession(host, s)
+        host = agentof(host, self._listeners)
 
         cmds = None
+        state = self.currentstate
         if s.count('<?xml') > 0:
-            doc = BeautifulSoup(s)
-            for s in doc.findAll('data'):
-                rank = int(s['rank'])
-                score = float(s['score'])
-                text = s['text']
-                if score < self.max_score:
-                    break
-                self._logger.RTC_INFO("#%i: %s (%f)" % (rank, text, score))
+            approx = None
+            text = None
+            lookuptime = self.stats.histogram('lookup').total
+            for rank, score, text in iternbest(s, self.max_score):
+                self._logger.info('lookup', "#%i: %s (%f)", rank, text, score)
                 if score < self._scorelimit[0]:
-                    self._logger.RTC_INFO("[rejected] score under limit")
-                    continue
-                cmds = self.lookupwithdefault(self.currentstate, host, text)
-                if not cmds:
-                    cmds = self.lookupwithdefault(self.currentstate, host, text)
-                if cmds:
+                    # hypotheses are sorted by score
+                    self._logger.info('lookup', "[rejected] score under limit")
                     break
+                cmds, distance = self.lookupwithdefault(self.currentstate, host, text)
+                if cmds and distance == 0:
+                    break
+                elif cmds:
+                    # prefer exact matches of lower ranked hypotheses
+                    self._logger.info('lookup', "[candidate] approximate match (distance %i)", distance)
+                    if approx is None or distance < approx[1]:
+                        approx = (cmds, distance, text)
+                    cmds = None
                 else:
-                    self._logger.RTC_INFO("[rejected] no matching phrases")
+                    self._logger.info('lookup', "[rejected] no matching phrases")
+            if not cmds and approx is not None:
+                cmds, distance, text = approx
+            lookuptime = self.stats.histogram('lookup').total - lookuptime
+            self.stats.record('nbest', time.time() - start - lookuptime)
+            if self.stats.tracer is not None:
+                self.stats.tracer.span('nbest', start)
             rtc_in_data = text
         else:
-            cmds = self.lookupwithdefault(self.currentstate, host, s)
+            cmds, distance = self.lookupwithdefault(self.currentstate, host, s)
             rtc_in_data = s
 
         if not cmds:
-            self._logger.RTC_INFO("no command found")
+            self._logger.info('lookup', "no command found")
+            self.stats.miss(state)
+            self.armTimers()
             return False
 
+        self.stats.hit(state, getattr(cmds, 'name', None))
         for c in cmds:
+            t = time.time()
             self.activateCommand(c)
+            self.stats.record(ACTIONS[c[0]], time.time() - t)
+        self.armTimers()
+        self.stats.record('turn', time.time() - start)
         return True
 
     def processNonString(self, host, s):
-        self._logger.RTC_INFO("got input from %s" %  (host,))
-        cmds = self.lookupwithdefault(self.currentstate, host, host)
+        if self._workers is not None:
+            return self._workers.submit(self.sessionOf(host, s)[0], 'n', host, s)
+        start = time.time()
+        self.source = host
+        self.switchSession(host, s)
+        state = self.currentstate
+        self._logger.info('lookup', "got input from %s", host)
+        cmds, distance = self.lookupwithdefault(state, host, host)
         if not cmds:
-            self._logger.RTC_INFO("no command found")
+            self._logger.info('lookup', "no command found")
+            self.stats.miss(state)
+            self.armTimers()
             return False
+        self.stats.hit(state, getattr(cmds, 'name', None))
         for c in cmds:
+            t = time.time()
             self.activateCommandEx(c, s)
+            self.stats.record(ACTIONS[c[0]], time.time() - t)
+        self.armTimers()
+        self.stats.record('turn', time.time() - start)
         return True
 
     def lookupwithdefault(self, state, host, s):
-        self._logger.RTC_INFO('looking up...%s: %s' % (host,s,))
-        cmds = self.lookupcommand(state, host, s)
-        if not cmds:
-            cmds = self.lookupcommand(state, 'default', s)
-        if not cmds:
-            cmds = self.lookupcommand('all', host, s)
-        if not cmds:
-            cmds = self.lookupcommand('all', 'default', s)
-        return cmds
-
-    def lookupcommand(self, state, host, s):
-        cmds = []
-        regkeys = []
-        try:
-            cmds = self.keys[state+":"+host+":"+s]
-        except KeyError:
-            try:
-                regkeys = self.regkeys[state+":"+host]
-            except KeyError:
-                return None
-            for r in regkeys:
-                if r[0].match(s):
-                    cmds = r[1]
-                    break
-            return None
-        return cmds
-        
+        self._logger.info('lookup', 'looking up...%s: %s', host, s)
+        t = time.time()
+        cmds, distance = self.rules.match(state, host, s)
+        self.stats.record('lookup', time.time() - t)
+        if cmds and distance > 0:
+            self._logger.info('lookup', 'approximate match (distance %i)', distance)
+        return cmds, distance
 
     def stateTransfer(self, newstate):
-        try:
-            for c in self.keys[self.currentstate+":::exit"]:
-                self.activateCommand(c)
-        except KeyError:
-            pass
+        t = time.time()
+        self.cancelTimers()
+        self._transferred = True
+        for c in self.rules.exit(self.currentstate) or []:
+            self.activateCommand(c)
+        t2 = time.time()
+        self.stats.record('exit', t2 - t, t2)
         self.currentstate = newstate
-        try:
-            for c in self.keys[self.currentstate+":::entry"]:
-                self.activateCommand(c)
-        except KeyError:
-            pass
+        if self._checkpoint is not None:
+            self._checkpoint.session(self.session.id, newstate, self.statestack)
+        for c in self.rules.entry(self.currentstate) or []:
+            self.activateCommand(c)
+        self.stats.record('entry', time.time() - t2)
 
     def activateCommand(self, c):
         if c[0] == 'c':
             host = c[1]
             data = c[2]
-            try:
-                ad = self.adaptors[host]
-                ad.send(host, data)
-            except KeyError:
-                self._logger.RTC_ERROR("no such adaptor:" + host)
+            self.output(self.session.id, host, data)
         elif c[0] == 't':
             func = c[1]
             data = c[2]
@@ -363,7 +957,7 @@ class SEAT(OpenRTM_aist.DataFlowComponentBase):
                     return
                 self.stateTransfer(self.statestack.pop())
             else:
-                self._logger.RTC_INFO("state transition from "+self.currentstate+" to "+data)
+                self._logger.info('dispatch', "state transition from %s to %s", self.currentstate, data)
                 if self.gui_flag:
                     self.hide_frame(self.currentstate)
                     self.show_frame(data)
@@ -373,38 +967,19 @@ class SEAT(OpenRTM_aist.DataFlowComponentBase):
             self._logger.RTC_INFO(data)
 
         elif c[0] == 'x':
-            host = c[1]
-            data = c[2]
-            res = os.system(data)
-            try:
-                ad = self.adaptors[host]
-                ad.send(host, res)
-            except KeyError:
-                self._logger.RTC_ERROR("no such adaptor:")
+            self.runShell(c)
 
         elif c[0] == 's':
-            rtc_result = None
-            host = c[1]
-            data = c[2]
-            exec(data)
-            if rtc_result == None :
-              pass
-            else:
-                try:
-                    ad = self.adaptors[host]
-                    ad.send(host, rtc_result)
-                except KeyError:
-                    self._logger.RTC_ERROR("no such adaptor:")
+            self.runScript(c[1], c[2], rtc_in_data)
+
+        elif c[0] == 'd':
+            self._delayed.append((c[1], c[2], rtc_in_data))
 
     def activateCommandEx(self, c, s):
         if c[0] == 'c':
             host = c[1]
             data = c[2]
-            try:
-                ad = self.adaptors[host]
-                ad.send(host, data)
-            except KeyError:
-                self._logger.RTC_ERROR("no such adaptor:" + host)
+            self.output(self.session.id, host, data)
 
         elif c[0] == 't':
             func = c[1]
@@ -418,7 +993,7 @@ class SEAT(OpenRTM_aist.DataFlowComponentBase):
                     return
                 self.stateTransfer(self.statestack.pop())
             else:
-                self._logger.RTC_INFO("state transition from "+self.currentstate+" to "+data)
+                self._logger.info('dispatch', "state transition from %s to %s", self.currentstate, data)
                 self.stateTransfer(data)
 
         elif c[0] == 'l':
@@ -426,34 +1001,57 @@ class SEAT(OpenRTM_aist.DataFlowComponentBase):
             self._logger.RTC_INFO(data)
 
         elif c[0] == 'x':
-            host = c[1]
-            data = c[2]
-            res = os.system(data)
-            try:
-                ad = self.adaptors[host]
-                ad.send(host, res)
-            except KeyError:
-                self._logger.RTC_ERROR("no such adaptor:" + host)
+            self.runShell(c)
 
         elif c[0] == 's':
-            rtc_result = None
-            host = c[1]
-            data = c[2]
-
-            rtc_in_data = s
-            exec(data)
-            if rtc_result == None :
-              pass
+            self.runScript(c[1], c[2], s)
+
+        elif c[0] == 'd':
+            self._delayed.append((c[1], c[2], s))
+
+    def runShell(self, c):
+        '''queue a shell command, its result is sent to the host when it exits'''
+        host, data, timeout, result = c[1:5]
+        sid = self.session.id
+        if host is not None:
+            host = self.replyTo(host)
+        if self._shell is None:
+            self._shell = ShellExecutor(int(self._shellworkers[0]), timeout=float(self._shelltimeout[0]),
+                                        logger=self._logger, stats=self.stats)
+        def callback(status, output):
+            self._logger.info('dispatch', "shell command exited with status %i: %s", status, data)
+            if host is None:
+                return
+            if result == 'stdout':
+                res = output.decode('utf-8', 'replace').rstrip('\n')
             else:
-                try:
-                    ad = self.adaptors[host]
-                    ad.send(host, rtc_result)
-                except KeyError:
-                    self._logger.RTC_ERROR("no such adaptor:" + host)
+                res = unicode(status)
+            self.post(self.output, sid, host, res)
+        if not self._shell.submit(data, callback, timeout):
+            self._logger.RTC_ERROR("too many pending shell commands, dropped: " + data)
+
+    def runScript(self, host, code, data):
+        '''run a compiled script in the persistent namespace of the component
+
+        The script gets the input as rtc_in_data and the component as
+        seat, and sends rtc_result (if set) to the host.'''
+        self._scriptlock.acquire()
+        try:
+            ns = self._scriptns
+            ns['rtc_in_data'] = data
+            ns['rtc_result'] = None
+            exec code in ns
+            rtc_result = ns['rtc_result']
+            if self._checkpoint is not None:
+                self.saveVariables(self.variablesOf(code))
+        finally:
+            self._scriptlock.release()
+        if rtc_result is not None:
+            self.output(self.session.id, host, rtc_result)
 
     def getDataType(self, s):
         if len(s) == 0:
-            return (RTC.TimedString, 0)
+            return (RTC.TimedString, str, False)
         seq = False
         if s[-3:] == "Seq":
             seq = True
@@ -476,204 +1074,374 @@ class SEAT(OpenRTM_aist.DataFlowComponentBase):
             dtype = int
         return (eval("RTC.%s" % s), dtype, seq)
 
-    def parsecommands(self, r):
-        commands = []
-        for c in r.findall('command'): # get commands
-            host = c.get('host')
-            data = c.text
-            commands.append(['c', host, data])
-        for c in r.findall('statetransition'): # get statetransition (as command)
-            func = c.get('func')
-            data = c.text
-            commands.append(['t', func, data])
-        for c in r.findall('log'): # get statetransition (as command)
-            data = c.text
-            commands.append(['l', data])
-        for c in r.findall('shell'): # get shell (as command)
-            func = c.get('host')
-            data = c.text
-            commands.append(['x', func, data])
-        for c in r.findall('script'): # get shell (as command)
-            func = c.get('host')
-            data = c.text
-            commands.append(['s', func, data])
-        return commands
-
-    def loadSEATML(self, files):
-        for f in files:
-            f = f.replace("\\", "\\\\")
-            self._logger.RTC_INFO(u"load script file: " + f)
-            try:
-                doc = etree.parse(f)
-            except etree.XMLSyntaxError, e:
-                self._logger.RTC_ERROR(u"invalid xml syntax: " + unicode(e))
-                continue
-            except IOError, e:
-                self._logger.RTC_ERROR(u"unable to open file " + f + ": " + unicode(e))
-                continue
+    def createAgent(self, name, agent):
+        type = agent.get('type')
+        if type == 'rtcout':
+            rtctype, dtype, seq = self.adaptortype[name] = self.getDataType(agent.get('datatype', ''))
+            queue = agent.get('queue')
+            self.createOutPort(name, rtctype, queue and int(queue) or None, agent.get('queuepolicy'))
+            batch = agent.get('batch', 'false') in ('true', '1')
+            if batch and not seq:
+                self._logger.RTC_WARN("%s is not a sequence, commands can not be batched" % (name,))
+                batch = False
+            self._outputs[name] = (converter(dtype, seq, seqdata.typecode(agent.get('datatype', ''))),
+                                   self._data[name], self._port[name], batch)
+            self.adaptors[name] = self
+        elif type == 'rtcin':
+            self.adaptortype[name] = self.getDataType(agent.get('datatype', ''))
+            self.createInPort(name, self.adaptortype[name][0])
+            self.createView(name, agent)
+            self.adaptors[name] = self
+        elif type == 'server':
+            self._listeners.add(name)
+            self.adaptors[name] = self.createSocketServer(name, agent.get('host', ''), int(agent.get('port')),
+                                                          framing=agent.get('framing', LINE),
+                                                          queuelength=int(agent.get('queue', QUEUELENGTH)),
+                                                          policy=agent.get('queuepolicy', DROP_OLDEST))
+        else:
+            self.adaptors[name] = self.createSocketAdaptor(name, agent.get('host'), int(agent.get('port')),
+                                                           framing=agent.get('framing', LINE),
+                                                           queuelength=int(agent.get('queue', QUEUELENGTH)),
+                                                           policy=agent.get('queuepolicy', DROP_OLDEST))
+        self.agents[name] = agent
+
+    def createView(self, name, agent):
+        '''give the sequences of the input to scripts as the sequence attribute says'''
+        kind = agent.get('sequence', seqdata.LIST)
+        code = seqdata.typecode(agent.get('datatype', ''))
+        if kind == seqdata.NUMPY and seqdata.numpy is None:
+            self._logger.RTC_WARN("numpy is not available, sequences of %s are arrays" % (name,))
+            kind = seqdata.ARRAY
+        view = seqdata.viewer(code, kind)
+        if view is not None:
+            self._views[name] = view
+
+    def removeAgent(self, name):
+        self._logger.info('load', "remove agent: %s", name)
+        a = self.adaptors.pop(name, None)
+        if isinstance(a, (Connection, Listener)):
+            a.terminate()
+        port = self._port.pop(name, None)
+        if port is not None:
             try:
-                self._xmlschema.assert_(doc)
-            except AssertionError, b:
-                self._logger.RTC_ERROR(u"invalid script file: " + f + ": " + unicode(b))
-                continue
+                if isinstance(port, OpenRTM_aist.InPort):
+                    self.removeInPort(port)
+                else:
+                    self.removeOutPort(port)
+            except:
+                self._logger.RTC_ERROR(traceback.format_exc())
+        self._data.pop(name, None)
+        self._outputs.pop(name, None)
+        self._views.pop(name, None)
+        self.adaptortype.pop(name, None)
+        self._listeners.discard(name)
+        del self.agents[name]
 
-            self.buttons = {}
-
-            for g in doc.findall('general'):
-                for a in g.findall('agent'):
-                    name = str(a.get('name'))
-                    type = a.get('type')
-                    if type == 'rtcout':
-                        self.adaptortype[name] = self.getDataType(a.get('datatype'))
-                        self.createOutPort(name, self.adaptortype[name][0])
-                        self.adaptors[name] = self
-                    elif type == 'rtcin':
-                        self.adaptortype[name] = self.getDataType(a.get('datatype'))
-                        self.createInPort(name, self.adaptortype[name][0])
-                        self.adaptors[name] = self
-                    else:
-                        host = a.get('host')
-                        port = int(a.get('port'))
-                        self.adaptors[name] = SocketAdaptor(self, name, host, port)
-
-            for s in doc.findall('state'):
-                name = s.get('name')
-                self.frames[name] = Frame(self.root)
-                self.buttons[name]=[]
-                if self.init_state == None:
-                    self.init_state = name
-
-                for e in s.findall('onentry'):
-                    commands = self.parsecommands(e)
-                    self._logger.RTC_INFO("register "+name+":::entry")
-                    self.keys[name+":::entry"] = commands # register commands to key table
-                for e in s.findall('onexit'):
-                    commands = self.parsecommands(e)
-                    self._logger.RTC_INFO("register "+name+":::exit")
-                    self.keys[name+":::exit"] = commands # register commands to key table
-                for r in s.findall('rule'):
-                    words = []
-                    commands = self.parsecommands(r)
-                    for k in r.findall('key'): # get keys
-                        source = k.get('source')
-                        word = self.decompString([k.text])
-                        if source is None:
-                            words.extend(word)
-                        else:
-                            for w in word:
-                                self._logger.RTC_INFO("register "+name+":"+source+":"+w)
-                                self.keys[name+":"+source+":"+w] = commands # register commands to key table
-                                self.buttons[name].append(w)
-
-                    for k in r.findall('regkey'): # get keys
-                        try:
-                            regkeys = self.regkeys[name+":default"]
-                        except KeyError:
-                            regkeys = []
-                        regkeys.append([re.compile(k.text), commands])
-                        self.regkeys[name+":default"] = regkeys
-
-                    for w in words:
-                        self._logger.RTC_INFO("register " + name + ":default:" + w)
-                        self.keys[name+":default:"+w] = commands # register commands to key table
-                        self.buttons[name].append(w)
-
-                self.states.extend([name])
-
-        if len(self.states) == 0:
+    def loadSEATML(self, files):
+        script = self._reader.read(files)
+        if len(script.states) == 0:
             self._logger.RTC_ERROR("no available state")
             return 1
-        self.startstate = None
-        if self.states.count("start") > 0:
-            self.startstate = "start"
-        else:
-            self.startstate = self.states[0]
+        ready = self.script is None
+        self.installScript(script)
         self.stateTransfer(self.startstate)
-        self._logger.RTC_INFO("current state " + self.currentstate)
-        self._logger.RTC_INFO("loaded successfully")
+        if self._saved is not None:
+            self.restoreSessions()
+        self.armTimers()
+        self._logger.info('load', "current state %s", self.currentstate)
+        self._logger.info('load', "loaded successfully")
+        if ready:
+            self.stats.gauge('startup_seconds', time.time() - _started)
+            self._logger.info('load', "ready %.3f s after start", time.time() - _started)
         return 0
 
-    def decompString(self, strs):
-        ret = []
-        nstrs = strs
-        while nstrs.__len__() > 0:
-            nstrs2 = []
-            for str in nstrs:
-                if str.count('(') > 0 or str.count('[') > 0:
-                    nstrs2.extend(self.decompStringSub(str))
-                else:
-                    ret.extend([str])
-            nstrs = nstrs2
-        return ret
-
-    def decompStringSub(self, str):
-        ret = []
-        bc = str.count('(')
-        kc = str.count('[')
-        if bc > 0:
-            i = str.index('(')
-            prestr = str[:i]
-            substrs = []
-            substr = ''
-            level = 0
-            i += 1
-            while i < str.__len__():
-                if str[i] == '(':
-                    level += 1
-                    substr += str[i]
-                elif str[i] == ')':
-                    if level == 0:
-                        substrs.extend([substr])
-                        break
-                    else:
-                        substr += str[i]
-                    level -= 1
-                elif str[i] == '|':
-                    if level == 0:
-                        substrs.extend([substr])
-                        substr = ''
-                    else:
-                        substr += str[i]
+    def reloadSEATML(self, files):
+        '''read the scripts again and replace the live script with them
+
+        The new script is built by the caller while the dialogs go on with
+        the live script, and swapped in by the dialog thread between two
+        inputs. A script without any state leaves the live script as is.'''
+        t = time.time()
+        script = self._reader.read(files, self.script)
+        if len(script.states) == 0:
+            self._logger.RTC_ERROR("no available state, keeping the current script")
+            return 1
+        self._logger.info('load', "read in %.1f ms, %i of %i states unchanged",
+                          (time.time() - t) * 1000, script.reused, len(script.states))
+        self._loop.control(self.installScript, script)
+        if self._workers is not None:
+            self._workers.broadcast('l', files)
+        return 0
+
+    def installScript(self, script):
+        '''make the script the live script (on the dialog thread)
+
+        Agents whose definition did not change keep their ports and
+        sockets, and sessions stay in their state if it still exists. The
+        ports and sockets are left to the component in a worker.'''
+        t = time.time()
+        if self._worker is None:
+            self.installAgents(script)
+        else:
+            self.describeAgents(script)
+        if self.gui_flag:
+            for name in script.states:
+                if name not in self.frames:
+                    self.frames[name] = tk.Frame(self.root)
+        if self.init_state is None:
+            self.init_state = script.states[0]
+
+        previous = self.script
+        self.script = script
+        self._globalnames = {}
+        self.rules = script.rules
+        self.states = script.states
+        self.buttons = script.buttons
+        self.startstate = script.startstate
+        if previous is not None:
+            self.keepSessions()
+            if self._checkpoint is not None:
+                self.saveDialogs()
+            self.stats.record('reload', time.time() - t)
+            self._logger.info('load', "script replaced in %.1f ms", (time.time() - t) * 1000)
+
+    def installAgents(self, script):
+        '''create and remove the ports and sockets of the changed agents'''
+        for name in script.agentorder:
+            agent = script.agents[name]
+            if self.agents.get(name) == agent:
+                continue
+            if name in self.agents:
+                self.removeAgent(name)
+            self.createAgent(name, agent)
+        for name in [n for n in self.agents if n not in script.agents]:
+            self.removeAgent(name)
+
+    def describeAgents(self, script):
+        '''take over what the dialogs of a worker need to know of the agents'''
+        self.agents = dict(script.agents)
+        self.adaptortype = {}
+        self._listeners = set()
+        self._views = {}
+        for name in script.agentorder:
+            agent = script.agents[name]
+            type = agent.get('type')
+            if type in ('rtcout', 'rtcin'):
+                self.adaptortype[name] = self.getDataType(agent.get('datatype', ''))
+            if type == 'rtcin':
+                self.createView(name, agent)
+            elif type == 'server':
+                self._listeners.add(name)
+
+    def keepSessions(self):
+        '''move the sessions in a state no longer in the script to the start state'''
+        self.session.state = self.currentstate
+        self.session.stack = self.statestack or None
+        states = set(self.states)
+        for session in [self._defaultsession] + list(self.sessions):
+            if session.state not in states:
+                self._logger.RTC_WARN("state %s removed, session %s moved to %s" %
+                                      (session.state, session.id, self.startstate))
+                session.state = self.startstate
+            if session.stack:
+                session.stack = [st for st in session.stack if st in states] or None
+        self.currentstate = self.session.state
+        self.statestack = self.session.stack or []
+
+    def openCheckpoint(self, path):
+        '''keep the states of the dialogs in the file (on the dialog thread)
+
+        The first file opened has the states of the previous run, which are
+        restored as soon as a script is loaded; a file opened later gets
+        the states of the running dialogs.'''
+        if self._checkpoint is not None:
+            self._checkpoint.close()
+            self._checkpoint = None
+        if path == "none":
+            return
+        t = time.time()
+        checkpoint = Checkpoint(path)
+        try:
+            saved = checkpoint.open()
+        except (EnvironmentError, ValueError, EOFError), e:
+            self._logger.RTC_ERROR("unable to open checkpoint file %s: %s" % (path, e))
+            return
+        self._checkpoint = checkpoint
+        if not self._restored:
+            self._restored = True
+            self._saved = saved
+            self._logger.info('load', "read %i sessions from checkpoint %s in %.1f ms",
+                              len(saved[0]), path, (time.time() - t) * 1000)
+            if self.script is not None:
+                self.restoreSessions()
+        elif self.script is not None:
+            self.saveDialogs()
+
+    def restoreSessions(self):
+        '''bring back the sessions and the variables read from the checkpoint
+
+        Sessions in a state no longer in the script go to the start state
+        and the timeouts of the states count from now.'''
+        t = time.time()
+        sessions, variables = self._saved
+        self._saved = None
+        states = set(self.states)
+        timed = set(st for st in states if self.rules.timeouts(st))
+        self.useSession(self._defaultsession)
+        self.session.state = self.currentstate
+        self.session.stack = self.statestack or None
+        armed = []
+        moved = [self._defaultsession]
+        # (the collector would go through all the new sessions again and again)
+        collect = gc.isenabled()
+        gc.disable()
+        try:
+            for sid, (state, stack) in sessions.iteritems():
+                if sid is None:
+                    session = self._defaultsession
                 else:
-                    substr += str[i]
-                i += 1
-            poststr = str[i+1:]
-            for s in substrs:
-                ret.extend([prestr+s+poststr])
-        elif kc > 0:
-            i = str.index('[')
-            prestr = str[:i]
-            substr = ''
-            level = 0
-            i += 1
-            while i < str.__len__():
-                if str[i] == '[':
-                    level += 1
-                elif str[i] == ']':
-                    if level == 0:
-                        break
-                    level -= 1
-                substr += str[i]
-                i += 1
-            poststr = str[i+1:]
-            ret.extend([prestr+poststr])
-            ret.extend([prestr+substr+poststr])
+                    session = self.sessions.get(sid, t) or self.sessions.add(sid, None, t)
+                if state not in states:
+                    state = self.startstate
+                    moved.append(session)
+                if stack:
+                    stack = [st for st in stack if st in states]
+                    if len(stack) < len(sessions[sid][1]):
+                        moved.append(session)
+                session.state = state
+                session.stack = stack or None
+                if state in timed:
+                    armed.append(session)
+        finally:
+            if collect:
+                gc.enable()
+        self.currentstate = self._defaultsession.state
+        self.statestack = self._defaultsession.stack or []
+        self._scriptns.update(variables)
+        for session in armed:
+            self.useSession(session)
+            self.armTimers()
+        self.useSession(self._defaultsession)
+        # the checkpoint has the saved states but those of the sessions moved
+        for session in moved:
+            self._checkpoint.session(session.id, session.state, session.stack)
+        self._savedvars = self.scriptVariables()
+        self.stats.gauge('sessions', len(self.sessions))
+        self.stats.record('restore', time.time() - t)
+        self._logger.info('load', "restored %i sessions in %.1f ms", len(sessions), (time.time() - t) * 1000)
+
+    def dialogStates(self):
+        '''return the states of the sessions as id -> (state, stack)'''
+        self.session.state = self.currentstate
+        self.session.stack = self.statestack or None
+        states = {}
+        for session in [self._defaultsession] + list(self.sessions):
+            states[session.id] = (session.state, session.stack and tuple(session.stack) or None)
+        return states
+
+    def scriptVariables(self):
+        '''return the variables set by the scripts as name -> marshalled value
+
+        Variables of a type marshal does not know (modules, functions,
+        objects) are left out.'''
+        variables = {}
+        for name, value in self._scriptns.iteritems():
+            if name in self._scriptglobals:
+                continue
+            try:
+                variables[name] = marshal.dumps(value)
+            except ValueError:
+                pass
+        return variables
+
+    def variablesOf(self, code):
+        '''return the names of the variables a script may change, None for all
+
+        These are the global names in the code of the script and in the
+        code of the functions of the scripts it uses. (A variable changed by
+        a method of an object of the scripts is saved when a script using it
+        runs, or when the dialogs are saved.)'''
+        ns = self._scriptns
+        cache = self._globalnames
+        used = set()
+        codes = [code]
+        while codes:
+            c = codes.pop()
+            try:
+                names = cache[c]
+            except KeyError:
+                names = cache[c] = globalnames(c)
+            if names is None:
+                return None
+            for name in names:
+                if name in used:
+                    continue
+                used.add(name)
+                value = ns.get(name)
+                if isinstance(value, types.MethodType):
+                    value = value.im_func
+                if isinstance(value, types.FunctionType) and value.func_globals is ns:
+                    codes.append(value.func_code)
+        return used
+
+    def saveVariables(self, names=None):
+        '''write the variables the scripts changed to the checkpoint
+
+        Only the variables of the names are looked at if given, all the
+        variables otherwise.'''
+        ns = self._scriptns
+        saved = self._savedvars
+        if names is None:
+            variables = self.scriptVariables()
+            changed = dict((name, ns[name]) for name, data in variables.iteritems()
+                           if saved.get(name) != data)
+            deleted = [name for name in saved if name not in variables]
+            self._savedvars = variables
         else:
-            ret.extend([str])
-        return ret
-
+            changed = {}
+            deleted = []
+            for name in names:
+                if name in self._scriptglobals:
+                    continue
+                try:
+                    data = marshal.dumps(ns[name])
+                except (KeyError, ValueError):
+                    if saved.pop(name, None) is not None:
+                        deleted.append(name)
+                    continue
+                if saved.get(name) != data:
+                    saved[name] = data
+                    changed[name] = ns[name]
+        if changed or deleted:
+            self._checkpoint.update(changed, deleted)
+
+    def saveDialogs(self, default=True):
+        '''write the states of all the dialogs to the checkpoint, compacting it'''
+        states = self.dialogStates()
+        if not default:
+            del states[None]
+        self._savedvars = self.scriptVariables()
+        self._checkpoint.replace(states, dict((name, self._scriptns[name]) for name in self._savedvars))
+
+    def enableGUI(self):
+        '''show the test panel (imports Tk, which needs a display)'''
+        loadgui()
+        self.root = tk.Tk()
+        self.gui_flag = True
+        for name in self.states:
+            self.frames[name] = tk.Frame(self.root)
 
     def mkcallback(self, name):
         def __callback_func__():
-           self.processResult("gui", name)
+           self.post(self.processResult, "gui", name)
         return __callback_func__
 
     def create_button(self, frame, name):
-        btn = Button(frame, text=name, command=self.mkcallback(name) )
+        btn = tk.Button(frame, text=name, command=self.mkcallback(name) )
         return btn
 
     def create_label(self, frame, name):
-        lbl = Label(frame, text=name )
+        lbl = tk.Label(frame, text=name )
         return lbl
 
     def pack_buttons(self, name):
@@ -684,11 +1452,11 @@ class SEAT(OpenRTM_aist.DataFlowComponentBase):
            for b in self.gui_buttons[name] :
                if ( i % 10 ) == 0:
                    j += 1
-               b.grid(row=j, column=i, sticky=W + E)
+               b.grid(row=j, column=i, sticky=tk.W + tk.E)
                i = (i+1) % 10
 
     def pack_item(self, item, i, j):
-        item.grid(row=j, column=i, sticky=W + E)
+        item.grid(row=j, column=i, sticky=tk.W + tk.E)
 
     def show_frame(self, name):
         if self.frames[name] :
@@ -704,8 +1472,9 @@ class SEAT(OpenRTM_aist.DataFlowComponentBase):
            self.gui_buttons[name] = []
            self.pack_item(self.create_label(self.frames[name], name), 0, 0)
 
-           for b in buttons:
-               self.gui_buttons[name].append( self.create_button(self.frames[name],b))
+           for k in buttons:
+               for b in k.variants():
+                   self.gui_buttons[name].append( self.create_button(self.frames[name],b))
            self.pack_buttons(name)
 
         return 0
@@ -732,6 +1501,10 @@ class SEATManager:
         parser.add_option('-s', type='float', nargs=1, dest='maxscore',
                           default=0.0,
                           help=_('max_score for voice recognition'))
+
+        parser.add_option('-w', '--workers', type='int', dest='workers',
+                          default=0,
+                          help=_('run the dialogs in the given number of worker processes (sessions are distributed by session_key, only faster with more than one CPU core)'))
         try:
             opts, args = parser.parse_args()
         except optparse.OptionError, e:
@@ -771,11 +1544,13 @@ class SEATManager:
         manager.registerFactory(profile, SEAT, OpenRTM_aist.Delete)
         self.comp = manager.createComponent("SEAT?exec_cxt.periodic.rate=1")
         if opts.testmode == True:
-            self.comp.gui_flag = True
+            self.comp.enableGUI()
         self.comp.max_score = opts.maxscore
         ret = self.comp.loadSEATML(self._scriptfiles)
         if ret != 0:
             print >>sys.stderr, 'Unable to load script file: see log file for details...'
+        elif opts.workers > 0:
+            self.comp.startWorkers(opts.workers)
 
 def main():
     seat = SEATManager()
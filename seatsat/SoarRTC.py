@@ -23,14 +23,13 @@ import types
 import threading
 import optparse
 from pprint import pformat
-from BeautifulSoup import BeautifulSoup
-from BeautifulSoup import Tag
 import OpenRTM_aist
 import RTC
 from seatsat.XableRTC import *
 from Python_sml_ClientInterface import *
 from seatsat.__init__ import __version__
 from seatsat import utils
+from seatsat.seatlog import CategoryLogger, Lazy
 try:
     import gettext
     _ = gettext.translation(domain='seatsat', localedir=os.path.dirname(__file__)+'/../share/locale').ugettext
@@ -39,6 +38,16 @@ except:
 
 __doc__ = _('Soar general artificial intelligence component.')
 
+# BeautifulSoup is imported with the first XML input (see parsexml())
+BeautifulSoup = None
+Tag = None
+
+def parsexml(data):
+    global BeautifulSoup, Tag
+    if BeautifulSoup is None:
+        from BeautifulSoup import BeautifulSoup, Tag
+    return BeautifulSoup(data)
+
 SoarRTC_spec = ["implementation_id", "SoarRTC",
                 "type_name",         "SoarRTC",
                 "description",       __doc__.encode('UTF-8'),
@@ -49,6 +58,10 @@ SoarRTC_spec = ["implementation_id", "SoarRTC",
                 "max_instance",      "10",
                 "language",          "Python",
                 "lang_type",         "script",
+                "conf.default.loglevel", "INFO",
+                "conf.__description__.loglevel", _("Log level, optionally per category (e.g. INFO,input=WARN). Categories are input and command.").encode('UTF-8'),
+                "conf.default.log_thread", "0",
+                "conf.__description__.log_thread", _("Write log messages from a background thread (1) or from the caller (0).").encode('UTF-8'),
                 ""]
 
 class SoarRTC(XableRTC):
@@ -61,11 +74,15 @@ class SoarRTC(XableRTC):
         self._timewme = {}
         self._dataidwme = {}
         self._dataid = 0
+        self._loglevel = ["INFO"]
+        self._logthread = ["0"]
 
     def onInitialize(self):
         OpenRTM_aist.DataFlowComponentBase.onInitialize(self)
         XableRTC.onInitialize(self)
-        self._logger = OpenRTM_aist.Manager.instance().getLogbuf(self._properties.getProperty("instance_name"))
+        self._logger = CategoryLogger(OpenRTM_aist.Manager.instance().getLogbuf(self._properties.getProperty("instance_name")))
+        self.bindParameter("loglevel", self._loglevel, "INFO", self.loglevelTrans)
+        self.bindParameter("log_thread", self._logthread, "0", self.logthreadTrans)
         self._logger.RTC_INFO("SoarRTC version " + __version__)
         self._logger.RTC_INFO("Copyright (C) 2010 Yosuke Matsusaka")
         # create and initialize Soar kernel
@@ -83,6 +100,20 @@ class SoarRTC(XableRTC):
         self.registerOutPort("command", self._commandport)
         return RTC.RTC_OK
     
+    def loglevelTrans(self, _type, _str):
+        try:
+            self._logger.setlevels(_str)
+        except ValueError:
+            self._logger.RTC_ERROR("invalid log level: " + _str)
+        return OpenRTM_aist.stringTo(_type, _str)
+
+    def logthreadTrans(self, _type, _str):
+        if _str.strip() in ("1", "true", "on"):
+            self._logger.startthread()
+        else:
+            self._logger.stopthread()
+        return OpenRTM_aist.stringTo(_type, _str)
+
     def onActivated(self, ec_id):
         OpenRTM_aist.DataFlowComponentBase.onActivated(self, ec_id)
         return RTC.RTC_OK
@@ -97,6 +128,7 @@ class SoarRTC(XableRTC):
         self._kernel.StopAllAgents()
         self._kernel.DestroyAgent(self._agent)
         self._kernel.Shutdown()
+        self._logger.stopthread()
         return RTC.RTC_OK
 
     def docRecur(self, doc, wme, usedwords):
@@ -120,19 +152,19 @@ class SoarRTC(XableRTC):
 
     def onData(self, info, data):
         try:
-            self._logger.RTC_INFO('got input: ' + pformat(info) + ', ' + pformat(data))
+            self._logger.info('input', 'got input: %s, %s', Lazy(pformat, info), Lazy(pformat, data))
             t = data.tm.sec + data.tm.nsec * 1e-9
             portid = (info['component'], info['port'])
             if portid not in self._basewme:
-                self._logger.RTC_INFO('First input from this port > create basic structure on WME')
+                self._logger.debug('input', 'First input from this port > create basic structure on WME')
                 iid = self._agent.GetInputLink()
                 wme = self._agent.CreateIdWME(iid, 'data')
                 self._basewme[portid] = wme
                 ot = type(data.data)
                 if ot in types.StringTypes:
                     if data.data[:5] == '<?xml':
-                        self._logger.RTC_INFO('Parsing XML type input')
-                        doc = BeautifulSoup(data.data)
+                        self._logger.debug('input', 'Parsing XML type input')
+                        doc = parsexml(data.data)
                         wme2 = self._agent.CreateIdWME(wme, 'data')
                         usedwords = {}
                         self.docRecur(doc.first(), wme2, usedwords)
@@ -153,8 +185,8 @@ class SoarRTC(XableRTC):
                 self._agent.Update(self._timewme[portid], t)
                 self._agent.Update(self._dataidwme[portid], self._dataid)
                 if type(data.data) in types.StringTypes and data.data[:5] == '<?xml':
-                    self._logger.RTC_INFO('Parsing XML type input')
-                    doc = BeautifulSoup(data.data)
+                    self._logger.debug('input', 'Parsing XML type input')
+                    doc = parsexml(data.data)
                     self._agent.DestroyWME(self._datawme[portid])
                     wme2 = self._agent.CreateIdWME(self._basewme[portid], 'data')
                     usedwords = {}
@@ -173,12 +205,12 @@ class SoarRTC(XableRTC):
         for i in range(0, numberCommands):
             command = self._agent.GetCommand(i)
             name  = command.GetCommandName()
-            self._logger.RTC_INFO('execute command '+name);
+            self._logger.info('command', 'execute command %s', name)
             if name == "rtcout":
                 port = command.GetParameterValue("port")
                 self._commanddata.data = command.GetParameterValue("data")
                 self._commandport.write()
-                self._logger.RTC_INFO('output data '+self._commanddata.data.decode('UTF-8')+' to port '+port);
+                self._logger.info('command', 'output data %s to port %s', Lazy(self._commanddata.data.decode, 'UTF-8'), port)
             command.AddStatusComplete()
         self._agent.ClearOutputLinkChanges()
         if self._kernel.HadError():
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Checkpoint file of the dialog states for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+The states of the sessions are appended to a file mapped in memory as
+they change, so writing one costs a memory copy and survives the process
+dying (the pages belong to the kernel). Every record is marshalled and
+has its length and CRC in front, written after the record itself: a
+record cut short by a crash is recognized and ends the file. When the
+file is full it is compacted, i.e. replaced with a file starting with a
+snapshot of the latest states, twice as large as that if needed.
+
+Records are ('S', sessions, variables) for the snapshot, ('s', id,
+state, stack) for the state of a session, ('d', id) for a session which
+went away and ('v', variables, deleted) for the variables of the
+scripts which changed.
+'''
+
+import os
+import gc
+import glob
+import mmap
+import zlib
+import struct
+import marshal
+
+MAGIC = 'SEATCKP1'
+
+# size of a new checkpoint file
+INITIALSIZE = 1 << 20
+
+_header = struct.Struct('<II')
+
+def readrecords(path):
+    '''iterate over the records of the checkpoint file up to the first bad one'''
+    fp = open(path, 'rb')
+    try:
+        size = os.fstat(fp.fileno()).st_size
+        if size < len(MAGIC) or fp.read(len(MAGIC)) != MAGIC:
+            return
+        mm = mmap.mmap(fp.fileno(), size, access=mmap.ACCESS_READ)
+    finally:
+        fp.close()
+    try:
+        pos = len(MAGIC)
+        while pos + _header.size <= size:
+            n, crc = _header.unpack_from(mm, pos)
+            pos += _header.size
+            if n == 0 or pos + n > size:
+                break
+            data = mm[pos:pos + n]
+            if zlib.crc32(data) & 0xffffffff != crc:
+                break
+            pos += n
+            yield marshal.loads(data)
+    finally:
+        mm.close()
+
+def encode(record):
+    data = marshal.dumps(record)
+    return _header.pack(len(data), zlib.crc32(data) & 0xffffffff), data
+
+class Checkpoint:
+    '''latest states of the sessions and the script variables, kept in a file
+
+    open() reads the file left by a previous run (and the files of its
+    workers, path.<n>) and compacts them into path. The sessions are
+    dictionaries of id -> (state, stack) and variables of name -> value;
+    the values have to be marshallable.'''
+
+    def __init__(self, path, size=INITIALSIZE):
+        self.path = path
+        self.initialsize = size
+        self.size = 0
+        self.sessions = {}
+        self.variables = {}
+        self.compactions = 0
+        self._fp = None
+        self._mm = None
+        self._pos = 0
+
+    def __len__(self):
+        return self._pos
+
+    def open(self):
+        '''read the saved states, return (sessions, variables) as they were'''
+        files = [self.path] + sorted(glob.glob(self.path + '.[0-9]*'))
+        collect = gc.isenabled()
+        gc.disable()
+        try:
+            for path in files:
+                if os.path.exists(path):
+                    for record in readrecords(path):
+                        self._apply(record)
+        finally:
+            if collect:
+                gc.enable()
+        saved = (dict(self.sessions), dict(self.variables))
+        self.compact()
+        for path in files[1:]:
+            os.remove(path)
+        return saved
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._fp.close()
+            self._mm = None
+            self._fp = None
+
+    def flush(self):
+        '''write the pages to the disk (not needed to survive a crash of the process)'''
+        if self._mm is not None:
+            self._mm.flush()
+
+    def _apply(self, record):
+        kind = record[0]
+        if kind == 's':
+            self.sessions[record[1]] = (record[2], record[3])
+        elif kind == 'd':
+            self.sessions.pop(record[1], None)
+        elif kind == 'v':
+            self.variables.update(record[1])
+            for name in record[2]:
+                self.variables.pop(name, None)
+        elif kind == 'S':
+            # (merged, as the files of the workers come after the file of the component)
+            self.sessions.update(record[1])
+            self.variables.update(record[2])
+
+    def _write(self, data):
+        pos = self._pos
+        end = pos + _header.size + len(data)
+        if self._mm is None or end > self.size:
+            self.compact()
+            return
+        # the header goes last, so that a record is complete once it is there
+        self._mm[pos + _header.size:end] = data
+        self._mm[pos:pos + _header.size] = _header.pack(len(data), zlib.crc32(data) & 0xffffffff)
+        self._pos = end
+
+    def session(self, id, state, stack):
+        stack = stack and tuple(stack) or None
+        self.sessions[id] = (state, stack)
+        self._write(marshal.dumps(('s', id, state, stack)))
+
+    def drop(self, id):
+        if self.sessions.pop(id, None) is not None:
+            self._write(marshal.dumps(('d', id)))
+
+    def update(self, variables, deleted=()):
+        record = ('v', variables, tuple(deleted))
+        self._apply(record)
+        self._write(marshal.dumps(record))
+
+    def replace(self, sessions, variables):
+        '''replace all the states with the given ones'''
+        self.sessions = sessions
+        self.variables = variables
+        self.compact()
+
+    def compact(self):
+        '''write the latest states to a new file and put it in place of the file'''
+        data = MAGIC + ''.join(encode(('S', self.sessions, self.variables)))
+        size = self.initialsize
+        while size < 2 * len(data):
+            size *= 2
+        tmp = self.path + '.tmp'
+        fp = open(tmp, 'w+b')
+        try:
+            fp.write(data)
+            fp.truncate(size)
+            fp.flush()
+            os.fsync(fp.fileno())
+            os.rename(tmp, self.path)
+        except:
+            fp.close()
+            raise
+        self.close()
+        self._fp = fp
+        self._mm = mmap.mmap(fp.fileno(), size)
+        self._pos = len(data)
+        self.size = size
+        self.compactions += 1
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Dialog event loop for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+import time
+import threading
+import traceback
+import collections
+from seatsat.timerwheel import TimerWheel
+
+# what to do when an input is posted to a full queue
+BLOCK = 'block'
+DROP_OLDEST = 'drop-oldest'
+DROP_NEWEST = 'drop-newest'
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+class DialogLoop:
+    '''run the inputs of a dialog one at a time on a dedicated thread
+
+    post() queues a call from any thread and the calls are run in order by
+    the single dialog thread, so the dialog state is only ever changed by
+    that thread. The queue holds at most maxlen calls (0 for unbounded);
+    when it is full the poster is blocked, or the oldest or the new call is
+    dropped, as the policy says. The time the calls waited in the queue,
+    the depth of the queue and the number of dropped calls are reported to
+    stats (a seatstats.Stats) if given. Calls posted while the thread is
+    not running are run right away by the caller.
+
+    later() runs a call on the same thread after a delay, measured by
+    clock(). Timers only fire while the thread runs; otherwise the owner
+    can run the timers returned by expire().'''
+
+    def __init__(self, maxlen=64, policy=BLOCK, stats=None, logger=None):
+        self._queue = collections.deque()
+        self._lock = threading.Lock()
+        self._notempty = threading.Condition(self._lock)
+        self._notfull = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+        self.maxlen = maxlen
+        self.policy = policy
+        self.stats = stats
+        self.logger = logger
+        self.dropped = 0
+        self.maxdepth = 0
+        self.clock = time.time
+        self.timers = TimerWheel(now=self.clock())
+
+    def setpolicy(self, policy):
+        if policy not in POLICIES:
+            raise ValueError("unknown queue policy: " + policy)
+        self.policy = policy
+
+    def depth(self):
+        return len(self._queue)
+
+    def start(self):
+        self._lock.acquire()
+        try:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="dialog")
+            self._thread.setDaemon(True)
+            self._thread.start()
+        finally:
+            self._lock.release()
+
+    def stop(self):
+        '''run the calls already queued and stop the thread'''
+        self._lock.acquire()
+        try:
+            thread = self._thread
+            self._running = False
+            self._thread = None
+            self._notempty.notifyAll()
+            self._notfull.notifyAll()
+        finally:
+            self._lock.release()
+        if thread is not None and thread is not threading.currentThread():
+            thread.join()
+
+    def post(self, func, *args):
+        '''queue func(*args), return False if a call had to be dropped'''
+        ret = True
+        self._lock.acquire()
+        try:
+            while self._running and self.maxlen > 0 and len(self._queue) >= self.maxlen:
+                if self.policy == DROP_NEWEST:
+                    self._dropped(func)
+                    return False
+                elif self.policy == DROP_OLDEST:
+                    t, f, a = self._queue.popleft()
+                    self._dropped(f)
+                    ret = False
+                else:
+                    self._notfull.wait()
+            if self._running:
+                self._queue.append((time.time(), func, args))
+                depth = len(self._queue)
+                if depth > self.maxdepth:
+                    self.maxdepth = depth
+                if self.stats is not None:
+                    self.stats.gauge('queue_depth', depth)
+                    self.stats.gauge('queue_maxdepth', self.maxdepth)
+                self._notempty.notify()
+                return ret
+        finally:
+            self._lock.release()
+        self._call(func, args)
+        return ret
+
+    def control(self, func, *args):
+        '''queue func(*args) regardless of the length limit and the policy
+
+        For calls which must not be dropped nor block the caller, such as
+        replacing the script.'''
+        self._lock.acquire()
+        try:
+            if self._running:
+                self._queue.append((time.time(), func, args))
+                self._notempty.notify()
+                return
+        finally:
+            self._lock.release()
+        self._call(func, args)
+
+    def later(self, delay, func, *args):
+        '''run func(*args) on the dialog thread after delay seconds, return the timer'''
+        self._lock.acquire()
+        try:
+            timer = self.timers.add(self.clock() + delay, func, *args)
+            if self.stats is not None:
+                self.stats.gauge('timers', len(self.timers))
+            if threading.currentThread() is not self._thread:
+                # (the dialog thread looks at the timers before waiting)
+                self._notempty.notify()
+            return timer
+        finally:
+            self._lock.release()
+
+    def cancel(self, timer):
+        self._lock.acquire()
+        try:
+            self.timers.cancel(timer)
+        finally:
+            self._lock.release()
+
+    def expire(self, now=None):
+        '''remove and return the timers due (at now)'''
+        if now is None:
+            now = self.clock()
+        self._lock.acquire()
+        try:
+            return self.timers.expire(now)
+        finally:
+            self._lock.release()
+
+    def _dropped(self, func):
+        self.dropped += 1
+        if self.stats is not None:
+            self.stats.count('queue_dropped')
+        if self.logger is not None:
+            self.logger.warn('dispatch', "input queue is full, dropped %s", getattr(func, '__name__', func))
+
+    def _run(self):
+        while True:
+            self._lock.acquire()
+            try:
+                while True:
+                    now = self.clock()
+                    due = self.timers.expire(now)
+                    if due or self._queue or not self._running:
+                        break
+                    self._notempty.wait(self.timers.timeout(now))
+                if not due:
+                    if not self._queue:
+                        return
+                    t, func, args = self._queue.popleft()
+                    depth = len(self._queue)
+                    self._notfull.notify()
+            finally:
+                self._lock.release()
+            if due:
+                self._fire(due, now)
+                continue
+            if self.stats is not None:
+                self.stats.record('queue', time.time() - t)
+                self.stats.gauge('queue_depth', depth)
+            self._call(func, args)
+
+    def _fire(self, timers, now):
+        for timer in timers:
+            if self.stats is not None:
+                self.stats.record('timer', now - timer.deadline)
+            self._call(timer.func, timer.args)
+        if self.stats is not None:
+            self.stats.gauge('timers', len(self.timers))
+
+    def _call(self, func, args):
+        try:
+            func(*args)
+        except:
+            if self.logger is not None:
+                self.logger.RTC_ERROR(traceback.format_exc())
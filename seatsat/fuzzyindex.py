@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Approximate key matching for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+If two strings are within edit distance d, deleting at most d characters
+from each of them yields a common string.  FuzzyIndex stores every key
+under all of its deletion variants, so that looking up an input needs
+only the deletion variants of the input and an edit distance check of
+the few keys found, instead of a scan over all keys.
+'''
+
+# largest edit distance supported by the index
+MAXDIST = 3
+
+# largest number of concrete strings indexed per key pattern
+MAXVARIANTS = 1000
+
+def deletions(s, depth):
+    '''return the set of strings made by deleting up to depth characters'''
+    ret = set([s])
+    level = [s]
+    for i in range(depth):
+        nlevel = []
+        for w in level:
+            for j in range(len(w)):
+                d = w[:j] + w[j+1:]
+                if d not in ret:
+                    ret.add(d)
+                    nlevel.append(d)
+        level = nlevel
+    return ret
+
+def editdistance(a, b, maxdist):
+    '''Levenshtein distance of a and b (maxdist+1 if larger than maxdist)'''
+    if abs(len(a) - len(b)) > maxdist:
+        return maxdist + 1
+    prev = range(len(b) + 1)
+    for i in range(1, len(a) + 1):
+        ca = a[i-1]
+        cur = [i]
+        low = i
+        for j in range(1, len(b) + 1):
+            v = prev[j-1]
+            if ca != b[j-1]:
+                v = min(v, prev[j], cur[j-1]) + 1
+            cur.append(v)
+            if v < low:
+                low = v
+        if low > maxdist:
+            return maxdist + 1
+        prev = cur
+    return min(prev[-1], maxdist + 1)
+
+class FuzzyIndex:
+    '''symmetric deletion index of keys with per key distance thresholds'''
+
+    def __init__(self):
+        self._deletes = {}
+        self._entries = []
+        self._depth = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key, maxdist, seq, value):
+        '''index the key to match inputs within maxdist edits'''
+        maxdist = min(maxdist, MAXDIST)
+        if maxdist <= 0:
+            return
+        eid = len(self._entries)
+        self._entries.append((key, maxdist, seq, value))
+        for d in deletions(key, maxdist):
+            try:
+                self._deletes[d].append(eid)
+            except KeyError:
+                self._deletes[d] = [eid]
+        if maxdist > self._depth:
+            self._depth = maxdist
+
+    def match(self, s):
+        '''return (distance, seq, value) of the nearest key or None
+
+        Among keys of the same distance the one with the largest sequence
+        number wins.'''
+        best = None
+        seen = set()
+        for d in deletions(s, self._depth):
+            for eid in self._deletes.get(d, ()):
+                if eid in seen:
+                    continue
+                seen.add(eid)
+                key, maxdist, seq, value = self._entries[eid]
+                if best is not None and best[0] < maxdist:
+                    maxdist = best[0]
+                dist = editdistance(s, key, maxdist)
+                if dist > maxdist:
+                    continue
+                if best is None or dist < best[0] or (dist == best[0] and seq > best[1]):
+                    best = (dist, seq, value)
+        return best
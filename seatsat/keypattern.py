@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Key pattern matcher for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+Keys of SEAT scripts can describe paraphrases by "(a|b|c)" (one of the
+alternatives) and "[a]" (optional part), which can be nested.  Instead
+of expanding a key into all of the concrete strings it stands for, the
+key is parsed into a tree and every key of a table is inserted into one
+shared automaton (a character trie with epsilon transitions), which is
+determinized lazily while matching.
+'''
+
+# number of cached DFA states per automaton before the cache is flushed
+MAXDSTATES = 10000
+
+def isliteral(text):
+    '''True if the key has no alternative nor optional part'''
+    return text.count('(') == 0 and text.count('[') == 0
+
+def parse(text):
+    '''parse the key into a tuple of items
+
+    An item is a literal string, ('alt', (seq, ...)) for "(a|b)" or
+    ('opt', seq) for "[a]", where seq is again a tuple of items.'''
+    seq, i = _parseseq(text, 0, '')
+    return seq
+
+def _parseseq(text, i, stops):
+    items = []
+    lit = []
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c in stops:
+            break
+        if c == '(' or c == '[':
+            if lit:
+                items.append(u''.join(lit))
+                lit = []
+            if c == '(':
+                alts = []
+                i += 1
+                while True:
+                    seq, i = _parseseq(text, i, '|)')
+                    alts.append(seq)
+                    if i >= n:
+                        break
+                    i += 1
+                    if text[i-1] == ')':
+                        break
+                items.append(('alt', tuple(alts)))
+            else:
+                seq, i = _parseseq(text, i + 1, ']')
+                i += 1
+                items.append(('opt', seq))
+        else:
+            lit.append(c)
+            i += 1
+    if lit:
+        items.append(u''.join(lit))
+    return tuple(items), i
+
+def variants(seq, i=0):
+    '''iterate over the concrete strings described by the parsed key'''
+    if i == len(seq):
+        yield u''
+        return
+    for head in _itemvariants(seq[i]):
+        for tail in variants(seq, i + 1):
+            yield head + tail
+
+def _itemvariants(item):
+    if isinstance(item, basestring):
+        yield item
+    elif item[0] == 'alt':
+        for seq in item[1]:
+            for v in variants(seq):
+                yield v
+    else:
+        yield u''
+        for v in variants(item[1]):
+            yield v
+
+class KeyPattern:
+    '''a key of the SEAT script'''
+
+    def __init__(self, text):
+        self.text = text
+        self.tree = parse(text)
+
+    def __getstate__(self):
+        return self.text
+
+    def __setstate__(self, text):
+        self.text = text
+
+    def __getattr__(self, name):
+        # the tree of an unpickled key is parsed on first use
+        if name == 'tree':
+            self.tree = parse(self.text)
+            return self.tree
+        raise AttributeError(name)
+
+    def isliteral(self):
+        return isliteral(self.text)
+
+    def variants(self):
+        '''iterate over the concrete strings (lazily)'''
+        return variants(self.tree)
+
+class _DState(object):
+    __slots__ = ('nodes', 'trans', 'accept')
+
+    def __init__(self, nodes, accepts):
+        self.nodes = nodes
+        self.trans = {}
+        self.accept = None
+        for n in nodes:
+            a = accepts[n]
+            if a is not None and (self.accept is None or a[0] > self.accept[0]):
+                self.accept = a
+
+def _closure(nodes, eps):
+    seen = set(nodes)
+    stack = list(nodes)
+    while stack:
+        for m in eps[stack.pop()]:
+            if m not in seen:
+                seen.add(m)
+                stack.append(m)
+    return frozenset(seen)
+
+class KeyAutomaton:
+    '''shared automaton matching an input against many key patterns
+
+    Literal parts of the keys are stored in a trie whose nodes are shared
+    between keys with a common prefix; alternatives and optional parts
+    join back through epsilon transitions.  Each key is registered with a
+    sequence number: if an input matches several keys, the value of the
+    key with the largest sequence number wins, the same as registering
+    every expanded string into a dictionary in order.  Nodes are numbers
+    indexing flat lists of edges, epsilon transitions and accepted values
+    (cheaper to keep and to pickle than an object per node).'''
+
+    def __init__(self):
+        self._edges = [{}]
+        self._eps = [[]]
+        self._accept = [None]
+        self._dstates = {}
+        self._start = None
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getstate__(self):
+        # the deterministic states are only a cache
+        state = self.__dict__.copy()
+        state['_dstates'] = {}
+        state['_start'] = None
+        return state
+
+    def _node(self):
+        self._edges.append({})
+        self._eps.append([])
+        self._accept.append(None)
+        return len(self._edges) - 1
+
+    def add(self, tree, value, seq):
+        '''add the parsed key (see parse()) with its value'''
+        end = self._insert(0, tree)
+        if self._accept[end] is None or self._accept[end][0] < seq:
+            self._accept[end] = (seq, value)
+        self._count += 1
+        self._dstates = {}
+        self._start = None
+
+    def _insert(self, node, seq):
+        for item in seq:
+            if isinstance(item, basestring):
+                for ch in item:
+                    edges = self._edges[node]
+                    nxt = edges.get(ch)
+                    if nxt is None:
+                        nxt = edges[ch] = self._node()
+                    node = nxt
+            else:
+                if item[0] == 'alt':
+                    branches = item[1]
+                else:
+                    branches = ((), item[1])
+                join = self._node()
+                for b in branches:
+                    end = self._insert(node, b)
+                    if join not in self._eps[end]:
+                        self._eps[end].append(join)
+                node = join
+        return node
+
+    def _dstate(self, nodes):
+        nodes = _closure(nodes, self._eps)
+        try:
+            return self._dstates[nodes]
+        except KeyError:
+            if len(self._dstates) >= MAXDSTATES:
+                self._dstates = {}
+                self._start = None
+            d = self._dstates[nodes] = _DState(nodes, self._accept)
+            return d
+
+    def _step(self, d, ch):
+        nodes = []
+        edges = self._edges
+        for n in d.nodes:
+            nxt = edges[n].get(ch)
+            if nxt is not None:
+                nodes.append(nxt)
+        if nodes:
+            nd = self._dstate(nodes)
+        else:
+            nd = None
+        d.trans[ch] = nd
+        return nd
+
+    def match(self, s):
+        '''return (seq, value) of the winning key matching s or None'''
+        d = self._start
+        if d is None:
+            d = self._start = self._dstate([0])
+        for ch in s:
+            trans = d.trans
+            if ch in trans:
+                d = trans[ch]
+            else:
+                d = self._step(d, ch)
+            if d is None:
+                return None
+        return d.accept
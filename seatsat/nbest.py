@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''N-best recognition result parser for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+from lxml import etree
+
+CHUNKSIZE = 2048
+
+def iternbest(s, minscore=None, chunksize=CHUNKSIZE):
+    '''iterate over (rank, score, text) of the <data> elements of a result
+
+    The result is fed to a pull parser chunk by chunk, so the rest of the
+    document is not parsed once the caller stops iterating or a score
+    falls below minscore (hypotheses are sorted by score). Results which
+    are not well-formed XML (a bare "&", no root element) are parsed as
+    a whole by BeautifulSoup from the hypothesis the XML parser failed
+    at, as SEAT always did.'''
+    if isinstance(s, unicode):
+        s = s.encode('utf-8')
+    # (recovering would drop what lxml cannot make sense of without a word)
+    parser = etree.XMLPullParser(events=('end',), tag='data', encoding='utf-8')
+    n = 0
+    for i in xrange(0, len(s), chunksize):
+        try:
+            parser.feed(s[i:i+chunksize])
+        except etree.XMLSyntaxError:
+            for h in _soupnbest(s, minscore, n):
+                yield h
+            return
+        for event, e in parser.read_events():
+            n += 1
+            try:
+                rank = int(e.get('rank'))
+                score = float(e.get('score'))
+            except (TypeError, ValueError):
+                continue
+            text = unicode(e.get('text') or u'')
+            e.clear()
+            if minscore is not None and score < minscore:
+                return
+            yield (rank, score, text)
+
+def _soupnbest(s, minscore, skip):
+    '''iterate over the hypotheses of a whole result parsed by BeautifulSoup'''
+    from BeautifulSoup import BeautifulSoup
+    for e in BeautifulSoup(s).findAll('data')[skip:]:
+        try:
+            rank = int(e.get('rank'))
+            score = float(e.get('score'))
+        except (TypeError, ValueError):
+            continue
+        if minscore is not None and score < minscore:
+            return
+        yield (rank, score, unicode(e.get('text') or u''))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Local stand-in for OpenRTM_aist and RTC
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+Provides just enough of the OpenRTM-aist python API for the SEAT
+component to be created, configured and fed with data in process,
+without a naming service or CORBA (used by seatreplay and the
+benchmarks). Output ports record what was written instead of sending
+it. install() has to be called before seatsat.SEAT is imported.
+'''
+
+import sys
+import types
+
+DATATYPES = ['String', 'WString', 'Short', 'Long', 'UShort', 'ULong',
+             'Float', 'Double', 'Octet', 'Char', 'Boolean']
+
+class Time:
+    def __init__(self, sec, nsec):
+        self.sec = sec
+        self.nsec = nsec
+
+class TimedData:
+    def __init__(self, tm, data):
+        self.tm = tm
+        self.data = data
+
+class LogBuf:
+    '''logger counting the messages and writing them to a stream (if any)'''
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.count = 0
+
+    def _log(self, level, msg):
+        self.count += 1
+        if self.stream is not None:
+            self.stream.write("%s: %s\n" % (level, msg))
+
+    def RTC_TRACE(self, msg):
+        self._log('TRACE', msg)
+
+    def RTC_DEBUG(self, msg):
+        self._log('DEBUG', msg)
+
+    def RTC_INFO(self, msg):
+        self._log('INFO', msg)
+
+    def RTC_WARN(self, msg):
+        self._log('WARN', msg)
+
+    def RTC_ERROR(self, msg):
+        self._log('ERROR', msg)
+
+    def RTC_FATAL(self, msg):
+        self._log('FATAL', msg)
+
+class Manager:
+    _instance = None
+
+    def __init__(self):
+        self.logbuf = LogBuf()
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = Manager()
+        return cls._instance
+
+    def getLogbuf(self, name=None):
+        return self.logbuf
+
+class Properties:
+    def __init__(self, defaults_str=None):
+        self._props = {}
+        if defaults_str:
+            for i in range(0, len(defaults_str) - 1, 2):
+                self._props[defaults_str[i]] = defaults_str[i + 1]
+
+    def getProperty(self, key, default=''):
+        return self._props.get(key, default)
+
+    def setProperty(self, key, value):
+        self._props[key] = value
+
+class RingBuffer:
+    def __init__(self, length=8):
+        self.length = length
+
+class InPort:
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+        self.listeners = []
+
+    def addConnectorDataListener(self, type, listener):
+        self.listeners.append(listener)
+
+class OutPort:
+    def __init__(self, name, value, buffer=None):
+        self.name = name
+        self.value = value
+        self.buffer = buffer
+        self.properties = Properties()
+        self.written = 0
+        self.last = None
+
+    def init(self, prop):
+        self.properties = prop
+
+    def write(self):
+        self.written += 1
+        self.last = self.value.data
+        return True
+
+class ConnectorDataListenerT:
+    def __call__(self, info, cdrdata, data):
+        data.data = cdrdata
+        return data
+
+class ConnectorDataListenerType:
+    ON_BUFFER_WRITE = 0
+
+class DataFlowComponentBase:
+    def __init__(self, manager):
+        self._properties = Properties(['instance_name', 'standin0'])
+        self._inports = {}
+        self._outports = {}
+        self._params = {}
+
+    def onInitialize(self):
+        return 0
+
+    def onFinalize(self):
+        return 0
+
+    def onExecute(self, ec_id):
+        return 0
+
+    def registerInPort(self, name, port):
+        self._inports[name] = port
+
+    def registerOutPort(self, name, port):
+        self._outports[name] = port
+
+    def removeInPort(self, port):
+        for name, p in self._inports.items():
+            if p is port:
+                del self._inports[name]
+
+    def removeOutPort(self, port):
+        for name, p in self._outports.items():
+            if p is port:
+                del self._outports[name]
+
+    def bindParameter(self, name, var, default, trans=None):
+        self._params[name] = (var, trans)
+        self.setParameter(name, default)
+
+    def setParameter(self, name, value):
+        '''change a configuration parameter as the configuration set would'''
+        var, trans = self._params[name]
+        if trans is None:
+            var[0] = stringTo(var, value)
+        else:
+            var[0] = trans(var, value)
+
+def stringTo(_type, _str):
+    return type(_type[0])(_str)
+
+def setTimestamp(data):
+    pass
+
+def Delete(*args):
+    pass
+
+def install():
+    '''register the stand-in modules as OpenRTM_aist and RTC'''
+    rtc = types.ModuleType('RTC')
+    rtc.RTC_OK = 0
+    rtc.RTC_ERROR = 1
+    rtc.Time = Time
+    for t in DATATYPES:
+        for name in ('Timed' + t, 'Timed' + t + 'Seq'):
+            setattr(rtc, name, types.ClassType(name, (TimedData,), {}))
+    openrtm = types.ModuleType('OpenRTM_aist')
+    for name in ('Manager', 'Properties', 'RingBuffer', 'InPort', 'OutPort',
+                 'ConnectorDataListenerT', 'ConnectorDataListenerType',
+                 'DataFlowComponentBase', 'stringTo', 'setTimestamp', 'Delete'):
+        setattr(openrtm, name, globals()[name])
+    sys.modules['RTC'] = rtc
+    sys.modules['OpenRTM_aist'] = openrtm
@@ -0,0 +1,520 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Compiled rule index for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+import re
+from seatsat.keypattern import isliteral, parse, variants, KeyAutomaton
+from seatsat.fuzzyindex import FuzzyIndex, MAXVARIANTS
+
+DEFAULT = 'default'
+ALL = 'all'
+
+# patterns which cannot be embedded in a combined alternation
+# (back references, conditionals and global inline flags)
+_unsafe = re.compile(r'\\[1-9]|\(\?P=|\(\?\(|\(\?[iLmsux]+\)')
+_quantifier = re.compile(r'[*+?]\??|\{\d*(,\d*)?\}\??')
+_literalgroup = re.compile(r'\((?:\?:)?([^\\()\[\]{}.*+?^$|]+(?:\|[^\\()\[\]{}.*+?^$|]+)*)\)$')
+
+# python 2 sre supports at most 100 groups per pattern
+MAXGROUPS = 99
+
+def _skipclass(pattern, j):
+    '''return the index next to the character class starting at j'''
+    n = len(pattern)
+    j += 1
+    if j < n and pattern[j] == '^':
+        j += 1
+    if j < n and pattern[j] == ']':
+        j += 1
+    while j < n and pattern[j] != ']':
+        if pattern[j] == '\\':
+            j += 1
+        j += 1
+    return j + 1
+
+def _skipescape(pattern, j):
+    '''return the index next to the escape sequence starting at j'''
+    c = pattern[j+1:j+2]
+    if c == 'x':
+        return j + 4
+    if c == '0':
+        k = j + 2
+        while k < j + 4 and pattern[k:k+1].isdigit():
+            k += 1
+        return k
+    return j + 2
+
+def decapture(pattern):
+    '''turn capturing groups of the pattern into non-capturing groups'''
+    ret = []
+    n = len(pattern)
+    i = 0
+    while i < n:
+        c = pattern[i]
+        if c == '\\':
+            j = _skipescape(pattern, i)
+        elif c == '[':
+            j = _skipclass(pattern, i)
+        elif c == '(' and pattern[i+1:i+2] != '?':
+            ret.append('(?:')
+            i += 1
+            continue
+        elif c == '(' and pattern[i+1:i+3] == '?P' and pattern[i+3:i+4] == '<':
+            ret.append('(?:')
+            i = pattern.index('>', i) + 1
+            continue
+        else:
+            j = i + 1
+        ret.append(pattern[i:j])
+        i = j
+    return ''.join(ret)
+
+def atoms(pattern):
+    '''split the pattern into quantified atoms (None if it has a top level "|")'''
+    ret = []
+    n = len(pattern)
+    i = 0
+    while i < n:
+        c = pattern[i]
+        if c == '\\':
+            j = _skipescape(pattern, i)
+        elif c == '[':
+            j = _skipclass(pattern, i)
+        elif c == '(':
+            depth = 0
+            j = i
+            while j < n:
+                ch = pattern[j]
+                if ch == '\\':
+                    j = _skipescape(pattern, j)
+                    continue
+                if ch == '[':
+                    j = _skipclass(pattern, j)
+                    continue
+                if ch == '(':
+                    depth += 1
+                elif ch == ')':
+                    depth -= 1
+                    if depth == 0:
+                        break
+                j += 1
+            j += 1
+        elif c == '|' or c == ')':
+            return None
+        else:
+            j = i + 1
+        m = _quantifier.match(pattern, j)
+        if m:
+            j = m.end()
+        ret.append(pattern[i:j])
+        i = j
+    return ret
+
+def _deterministic(atom):
+    '''True if the atom can match the input in at most one way'''
+    if atom[0] == '(':
+        m = _literalgroup.match(atom)
+        if not m:
+            return False
+        alts = m.group(1).split('|')
+        for a in alts:
+            for b in alts:
+                if a is not b and b.startswith(a):
+                    return False
+        return True
+    if atom[0] == '\\':
+        return _skipescape(atom, 0) == len(atom)
+    if atom[0] == '[':
+        return _skipclass(atom, 0) == len(atom)
+    return len(atom) == 1
+
+def _firstchars(atom):
+    '''set of characters the atom can start with (None if unknown)'''
+    if atom[0] == '(':
+        m = _literalgroup.match(atom)
+        if m and _deterministic(atom):
+            return set([a[0] for a in m.group(1).split('|')])
+        return None
+    if atom[0] == '\\' and len(atom) == 2 and not atom[1].isalnum():
+        return set([atom[1]])
+    if len(atom) == 1 and atom not in '.^$':
+        return set([atom])
+    return None
+
+def _factor(entries):
+    '''build an alternation of the (atoms, marker) entries sharing prefixes
+
+    Entries with the same deterministic head are merged only if every
+    alternative between them starts with a different character, so the
+    first entry matching the input is still the one that wins.'''
+    blocks = []
+    for rest, marker in entries:
+        head = None
+        if rest and _deterministic(rest[0]):
+            head = rest[0]
+        first = None
+        if rest:
+            first = _firstchars(rest[0])
+        target = None
+        if head is not None:
+            for b in reversed(blocks):
+                if b[0] == head:
+                    target = b
+                    break
+                if first is None or b[1] is None or first & b[1]:
+                    break
+        if target is None:
+            target = [head, first, []]
+            blocks.append(target)
+        target[2].append((rest, marker))
+    parts = []
+    for head, first, members in blocks:
+        if head is None:
+            rest, marker = members[0]
+            parts.append(''.join(rest) + '(?P<_r%i>)' % (marker,))
+        else:
+            parts.append(head + _factor([(rest[1:], marker) for rest, marker in members]))
+    if len(parts) == 1:
+        return parts[0]
+    return '(?:' + '|'.join(parts) + ')'
+
+class RegexMatcher:
+    '''match a string against a list of regular expressions at once
+
+    Patterns are compiled into alternations with an empty named group
+    marking the end of each pattern, and common deterministic prefixes
+    are shared as a trie, so that a match costs about one pass over the
+    input regardless of the number of patterns.  The alternation keeps
+    the order of registration: the first pattern that matches wins, as
+    if the patterns were tried one by one.  Since sre limits the number
+    of groups, patterns are compiled into chunks of MAXGROUPS patterns,
+    and patterns which cannot be combined are tried on their own.'''
+
+    def __init__(self, entries):
+        self._values = []
+        self._stages = []
+        chunk = []
+        for pattern, value in entries:
+            if isinstance(pattern, basestring):
+                pattern = re.compile(pattern)
+            marker = len(self._values)
+            self._values.append(value)
+            if _unsafe.search(pattern.pattern) or pattern.flags & ~re.UNICODE:
+                self._flush(chunk)
+                chunk = []
+                self._stages.append((pattern, marker))
+                continue
+            chunk.append((pattern, marker))
+            if len(chunk) == MAXGROUPS:
+                self._flush(chunk)
+                chunk = []
+        self._flush(chunk)
+
+    def _flush(self, chunk):
+        if not chunk:
+            return
+        entries = []
+        for pattern, marker in chunk:
+            p = decapture(pattern.pattern)
+            a = atoms(p)
+            if a is None:
+                a = ['(?:' + p + ')']
+            entries.append((a, marker))
+        try:
+            self._stages.append((re.compile(_factor(entries)), None))
+        except (re.error, AssertionError, OverflowError, RuntimeError):
+            for pattern, marker in chunk:
+                self._stages.append((pattern, marker))
+
+    def __len__(self):
+        return len(self._values)
+
+    def match(self, s):
+        '''return value of the first pattern matching s or None'''
+        for pattern, marker in self._stages:
+            m = pattern.match(s)
+            if m is not None:
+                if marker is None:
+                    marker = int(m.lastgroup[2:])
+                return self._values[marker]
+        return None
+
+class Rule(list):
+    '''commands of a rule, with the name of the rule (state#number)'''
+
+    def __init__(self, name, commands=()):
+        list.__init__(self, commands)
+        self.name = name
+
+class RuleIndex:
+    '''key table of a SEAT script indexed by state and source
+
+    Keys are registered per (state, source) pair in the same way as the
+    script file describes them.  compile() merges the "default" source
+    and the "all" state into every (state, source) row, so that a lookup
+    is a single dictionary probe instead of the four step fallback
+    (state:source, state:default, all:source, all:default).  Keys with
+    alternatives or optional parts are not expanded but inserted into a
+    KeyAutomaton per (state, source), which is run only when it may beat
+    the result of the dictionary probe.  Regular expression keys of the
+    same levels are combined into one RegexMatcher per row; a key wins
+    over a regular expression of the same or a lower priority level.
+    Keys registered with a fuzzy distance are also stored in a FuzzyIndex
+    which is consulted only when nothing matches exactly.'''
+
+    def __init__(self):
+        self._stateids = {}
+        self._sourceids = {DEFAULT: 0}
+        self._keys = {}
+        self._patterns = {}
+        self._regkeys = {}
+        self._fuzzy = {}
+        self._seq = 0
+        self._entry = {}
+        self._exit = {}
+        self._timeouts = {}
+        self._rows = []
+        self._allrows = None
+        self._dirty = True
+
+    def __getstate__(self):
+        # the merged rows repeat the tables and are quick to build again
+        state = self.__dict__.copy()
+        state['_rows'] = []
+        state['_allrows'] = None
+        state['_dirty'] = True
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compile()
+
+    def stateid(self, name):
+        '''return integer id of the state (allocate if unknown)'''
+        try:
+            return self._stateids[name]
+        except KeyError:
+            sid = len(self._stateids)
+            self._stateids[name] = sid
+            self._dirty = True
+            return sid
+
+    def sourceid(self, name):
+        '''return integer id of the source (allocate if unknown)'''
+        if name is None:
+            return 0
+        try:
+            return self._sourceids[name]
+        except KeyError:
+            srcid = len(self._sourceids)
+            self._sourceids[name] = srcid
+            self._dirty = True
+            return srcid
+
+    def states(self):
+        return self._stateids.keys()
+
+    def register(self, state, source, key, commands, fuzzy=0):
+        '''register commands to the key (later registration wins)
+
+        The key may contain alternatives "(a|b)" and optional parts "[a]".
+        If fuzzy is positive, inputs within the edit distance also match
+        the key when nothing matches exactly.'''
+        k = (self.stateid(state), self.sourceid(source))
+        self._seq += 1
+        if isliteral(key):
+            try:
+                table = self._keys[k]
+            except KeyError:
+                table = self._keys[k] = {}
+            table[key] = (self._seq, commands)
+            words = [key]
+        else:
+            try:
+                automaton = self._patterns[k]
+            except KeyError:
+                automaton = self._patterns[k] = KeyAutomaton()
+            tree = parse(key)
+            automaton.add(tree, commands, self._seq)
+            words = variants(tree)
+        if fuzzy > 0:
+            try:
+                index = self._fuzzy[k]
+            except KeyError:
+                index = self._fuzzy[k] = FuzzyIndex()
+            for i, w in enumerate(words):
+                if i >= MAXVARIANTS:
+                    break
+                index.add(w, fuzzy, self._seq, commands)
+        self._dirty = True
+
+    def registerregex(self, state, source, pattern, commands):
+        '''register commands to the regular expression (first match wins)'''
+        k = (self.stateid(state), self.sourceid(source))
+        try:
+            regkeys = self._regkeys[k]
+        except KeyError:
+            regkeys = self._regkeys[k] = []
+        regkeys.append((re.compile(pattern), (0, commands)))
+        self._dirty = True
+
+    def registerentry(self, state, commands):
+        self._entry[self.stateid(state)] = commands
+
+    def registerexit(self, state, commands):
+        self._exit[self.stateid(state)] = commands
+
+    def registertimeout(self, state, seconds, commands):
+        '''register commands to run after seconds without input in the state'''
+        self._timeouts.setdefault(self.stateid(state), []).append((seconds, commands))
+
+    def copystates(self, other, states):
+        '''take the keys, the entry and exit commands and the timeouts of
+        the states over from another index
+
+        The tables are shared, not copied (compile() only reads them), so
+        nothing may be registered to these states in either index any more.'''
+        sids = {}
+        for name in states:
+            try:
+                sids[other._stateids[name]] = self.stateid(name)
+            except KeyError:
+                pass
+        srcids = {}
+        for name, srcid in other._sourceids.iteritems():
+            srcids[srcid] = self.sourceid(name)
+        for theirs, mine in ((other._keys, self._keys), (other._patterns, self._patterns),
+                             (other._regkeys, self._regkeys), (other._fuzzy, self._fuzzy)):
+            for (sid, srcid), table in theirs.iteritems():
+                if sid in sids:
+                    mine[(sids[sid], srcids[srcid])] = table
+        for theirs, mine in ((other._entry, self._entry), (other._exit, self._exit),
+                             (other._timeouts, self._timeouts)):
+            for sid, commands in theirs.iteritems():
+                if sid in sids:
+                    mine[sids[sid]] = commands
+        self._seq = max(self._seq, other._seq)
+        self._dirty = True
+
+    def entry(self, state):
+        try:
+            return self._entry[self._stateids[state]]
+        except KeyError:
+            return None
+
+    def exit(self, state):
+        try:
+            return self._exit[self._stateids[state]]
+        except KeyError:
+            return None
+
+    def timeouts(self, state):
+        '''return the (seconds, commands) of the timeouts of the state (and of all the states)'''
+        ret = []
+        for name in (state, ALL):
+            sid = self._stateids.get(name)
+            if sid is not None:
+                ret.extend(self._timeouts.get(sid, ()))
+        return ret
+
+    def levels(self, sid, srcid):
+        '''return (state, source) pairs to consider in order of priority'''
+        allid = self.stateid(ALL)
+        levels = []
+        for k in ((sid, srcid), (sid, 0), (allid, srcid), (allid, 0)):
+            if k not in levels:
+                levels.append(k)
+        return levels
+
+    def compile(self):
+        '''merge the fallback tables into one table per (state, source)'''
+        if not self._dirty:
+            return
+        allid = self.stateid(ALL)
+        nsrc = len(self._sourceids)
+        matchers = {}
+        rows = []
+        for sid in range(len(self._stateids)):
+            row = []
+            for srcid in range(nsrc):
+                levels = self.levels(sid, srcid)
+                merged = {}
+                for level in range(len(levels) - 1, -1, -1):
+                    try:
+                        keys = self._keys[levels[level]]
+                    except KeyError:
+                        continue
+                    for key, (seq, commands) in keys.iteritems():
+                        merged[key] = (level, seq, commands)
+                automata = tuple([(level, self._patterns[k]) for level, k in enumerate(levels)
+                                  if k in self._patterns])
+                fuzzy = tuple([(level, self._fuzzy[k]) for level, k in enumerate(levels)
+                               if k in self._fuzzy])
+                regk = tuple([(level, k) for level, k in enumerate(levels) if k in self._regkeys])
+                matcher = None
+                if regk:
+                    try:
+                        matcher = matchers[regk]
+                    except KeyError:
+                        entries = []
+                        for level, k in regk:
+                            for pattern, (seq, commands) in self._regkeys[k]:
+                                entries.append((pattern, (level, seq, commands)))
+                        matcher = matchers[regk] = RegexMatcher(entries)
+                row.append((merged, automata, matcher, fuzzy))
+            rows.append(row)
+        self._rows = rows
+        self._allrows = rows[allid]
+        self._dirty = False
+
+    def lookup(self, state, source, s):
+        '''return commands registered to the input s or None'''
+        return self.match(state, source, s)[0]
+
+    def match(self, state, source, s):
+        '''return (commands, distance) for the input s
+
+        distance is 0 for an exact match and the edit distance for an
+        approximate match; commands is None if nothing matches.'''
+        if self._dirty:
+            self.compile()
+        try:
+            row = self._rows[self._stateids[state]]
+        except KeyError:
+            row = self._allrows
+        try:
+            table, automata, matcher, fuzzy = row[self._sourceids[source]]
+        except KeyError:
+            table, automata, matcher, fuzzy = row[0]
+        hit = table.get(s)
+        for level, automaton in automata:
+            if hit is not None and level > hit[0]:
+                break
+            ahit = automaton.match(s)
+            if ahit is not None and (hit is None or level < hit[0] or ahit[0] > hit[1]):
+                hit = (level, ahit[0], ahit[1])
+        if matcher is not None and (hit is None or hit[0] > 0):
+            rhit = matcher.match(s)
+            if rhit is not None and (hit is None or rhit[0] < hit[0]):
+                hit = rhit
+        if hit is not None:
+            return (hit[2], 0)
+        best = None
+        for level, index in fuzzy:
+            fhit = index.match(s)
+            if fhit is not None and (best is None or fhit[0] < best[0]):
+                best = fhit
+        if best is None:
+            return (None, 0)
+        return (best[2], best[0])
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Logging layer for SEAT and SoarRTC
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+import threading
+import traceback
+import Queue
+
+SILENT, FATAL, ERROR, WARN, INFO, DEBUG, TRACE = range(7)
+LEVELNAMES = ['SILENT', 'FATAL', 'ERROR', 'WARN', 'INFO', 'DEBUG', 'TRACE']
+_methods = [None, 'RTC_FATAL', 'RTC_ERROR', 'RTC_WARN', 'RTC_INFO', 'RTC_DEBUG', 'RTC_TRACE']
+
+GENERAL = 'general'
+
+class Lazy:
+    '''defer a function call until the log message is actually formatted'''
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def value(self):
+        return self._func(*self._args)
+
+    def __str__(self):
+        return str(self.value())
+
+    def __unicode__(self):
+        return unicode(self.value())
+
+class StreamLogBuf:
+    '''logger writing the messages to a stream (used where the OpenRTM
+    logger is not available, e.g. in worker processes)'''
+
+    def __init__(self, stream, name='seat'):
+        self._stream = stream
+        self._name = name
+        self._lock = threading.Lock()
+
+    def _log(self, level, msg):
+        self._lock.acquire()
+        try:
+            self._stream.write("%s %s: %s\n" % (self._name, level, msg))
+        finally:
+            self._lock.release()
+
+    def RTC_TRACE(self, msg):
+        self._log('TRACE', msg)
+
+    def RTC_DEBUG(self, msg):
+        self._log('DEBUG', msg)
+
+    def RTC_INFO(self, msg):
+        self._log('INFO', msg)
+
+    def RTC_WARN(self, msg):
+        self._log('WARN', msg)
+
+    def RTC_ERROR(self, msg):
+        self._log('ERROR', msg)
+
+    def RTC_FATAL(self, msg):
+        self._log('FATAL', msg)
+
+class CategoryLogger:
+    '''logger with a level per category and deferred formatting
+
+    Messages are given as a format string and its arguments, which are
+    formatted only if the level of the category lets the message through.
+    Optionally the messages are formatted and written to the underlying
+    OpenRTM logger by a background thread, so that logging never blocks
+    the caller (messages are dropped and counted if the queue is full).
+    The RTC_* methods of the OpenRTM logger are available as well and log
+    to the "general" category.'''
+
+    def __init__(self, logbuf, level=INFO):
+        self._logbuf = logbuf
+        self._default = level
+        self._levels = {}
+        self._queue = None
+        self._thread = None
+        self.dropped = 0
+
+    def setlevels(self, spec):
+        '''set levels from a string like "INFO,load=WARN,lookup=DEBUG"'''
+        levels = {}
+        default = self._default
+        for item in spec.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            if item.count('='):
+                category, name = item.split('=', 1)
+                levels[category.strip()] = LEVELNAMES.index(name.strip().upper())
+            else:
+                default = LEVELNAMES.index(item.upper())
+        self._levels = levels
+        self._default = default
+
+    def level(self, category):
+        return self._levels.get(category, self._default)
+
+    def enabled(self, category, level):
+        return level <= self._levels.get(category, self._default)
+
+    def log(self, category, level, fmt, *args):
+        if level > self._levels.get(category, self._default):
+            return
+        # (read once, stopthread() may set it to None in between)
+        q = self._queue
+        if q is not None:
+            try:
+                q.put_nowait((level, fmt, args))
+            except Queue.Full:
+                self.dropped += 1
+            return
+        self._write(level, fmt, args)
+
+    def trace(self, category, fmt, *args):
+        self.log(category, TRACE, fmt, *args)
+
+    def debug(self, category, fmt, *args):
+        self.log(category, DEBUG, fmt, *args)
+
+    def info(self, category, fmt, *args):
+        self.log(category, INFO, fmt, *args)
+
+    def warn(self, category, fmt, *args):
+        self.log(category, WARN, fmt, *args)
+
+    def error(self, category, fmt, *args):
+        self.log(category, ERROR, fmt, *args)
+
+    def RTC_TRACE(self, msg):
+        self.log(GENERAL, TRACE, msg)
+
+    def RTC_DEBUG(self, msg):
+        self.log(GENERAL, DEBUG, msg)
+
+    def RTC_INFO(self, msg):
+        self.log(GENERAL, INFO, msg)
+
+    def RTC_WARN(self, msg):
+        self.log(GENERAL, WARN, msg)
+
+    def RTC_ERROR(self, msg):
+        self.log(GENERAL, ERROR, msg)
+
+    def RTC_FATAL(self, msg):
+        self.log(GENERAL, FATAL, msg)
+
+    def _write(self, level, fmt, args):
+        try:
+            if args:
+                msg = fmt % tuple([a.value() if isinstance(a, Lazy) else a for a in args])
+            else:
+                msg = fmt
+            getattr(self._logbuf, _methods[level])(msg)
+        except:
+            self._logbuf.RTC_ERROR("unable to log message: " + traceback.format_exc())
+
+    def startthread(self, maxqueue=4096):
+        '''format and write messages on a background thread'''
+        if self._thread is not None:
+            return
+        self._queue = Queue.Queue(maxqueue)
+        self._thread = threading.Thread(target=self._run, args=(self._queue,), name="logwriter")
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def threaded(self):
+        return self._thread is not None
+
+    def stopthread(self):
+        '''flush the queue and go back to writing on the caller thread'''
+        if self._thread is None:
+            return
+        queue = self._queue
+        self._queue = None
+        queue.put(None)
+        self._thread.join()
+        self._thread = None
+        # (messages queued by the threads which took the queue before it was None)
+        while True:
+            try:
+                record = queue.get_nowait()
+            except Queue.Empty:
+                break
+            self._write(*record)
+
+    def _run(self, queue):
+        while True:
+            record = queue.get()
+            if record is None:
+                return
+            self._write(*record)
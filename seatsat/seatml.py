@@ -0,0 +1,454 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''SEAT script (SEATML) reader
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+import os
+import sys
+import re
+import types
+import marshal
+import hashlib
+import glob
+import tempfile
+import cPickle
+import cStringIO
+import opcode
+from lxml import etree
+from seatsat.__init__ import __version__
+from seatsat.ruleindex import RuleIndex, Rule
+from seatsat.keypattern import KeyPattern
+
+# header of compiled model files (changed with the layout of Script)
+MAGIC = 'SEATMLC3'
+
+class Script:
+    '''agents, states and compiled rules read from SEAT script files
+
+    A script is not modified once read, so that the live script of a
+    component can be replaced as a whole when the files are reloaded.
+    agents maps the name of an agent to the attributes of its element and
+    fingerprints maps the name of a state to the digest of its elements,
+    which tells the states left unchanged by an edit.'''
+
+    def __init__(self):
+        self.agents = {}
+        self.agentorder = []
+        self.states = []
+        self.rules = RuleIndex()
+        self.buttons = {}
+        self.fingerprints = {}
+        self.startstate = None
+        self.reused = 0
+
+def pythonversion():
+    return "%i.%i.%i" % sys.version_info[:3]
+
+_sourcedigest = None
+
+def sourcedigest():
+    '''return the digest of the source files of the package'''
+    global _sourcedigest
+    if _sourcedigest is None:
+        digest = hashlib.sha1()
+        for f in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+            fp = open(f, 'rb')
+            try:
+                digest.update(fp.read())
+            finally:
+                fp.close()
+        _sourcedigest = digest.hexdigest()
+    return _sourcedigest
+
+def modelkey(files, schemafile=None):
+    '''return the key of the compiled model of the files
+
+    The key is a digest of the names of the files followed by a digest of
+    the versions of the package and of Python (the model contains
+    marshalled code), of the source files of the package (the model
+    contains instances of its classes), of the schema the files were
+    validated with and of the names and contents of the files.'''
+    names = hashlib.sha1()
+    digest = hashlib.sha1()
+    digest.update("%s\0%s\0%s\0%s\0" % (MAGIC, __version__, sys.version, sourcedigest()))
+    if schemafile is not None:
+        fp = open(schemafile, 'rb')
+        try:
+            digest.update("%s\0" % (hashlib.sha1(fp.read()).hexdigest(),))
+        finally:
+            fp.close()
+    for f in files:
+        name = os.path.abspath(f)
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+        fp = open(f, 'rb')
+        try:
+            names.update("%s\0" % (name,))
+            digest.update("%s\0%s\0" % (name, hashlib.sha1(fp.read()).hexdigest()))
+        finally:
+            fp.close()
+    return "%s-%s" % (names.hexdigest()[:16], digest.hexdigest())
+
+_nameops = frozenset([opcode.opmap[op] for op in ('LOAD_NAME', 'STORE_NAME', 'DELETE_NAME',
+                                                  'LOAD_GLOBAL', 'STORE_GLOBAL', 'DELETE_GLOBAL')])
+_dynamicops = frozenset([opcode.opmap['EXEC_STMT'], opcode.opmap['IMPORT_STAR']])
+_dynamicnames = frozenset(['globals', 'vars', 'locals', 'eval', 'execfile'])
+
+def globalnames(code):
+    '''return the global names a script (and the functions it defines) uses
+
+    Return None if it may use other names than those in its code (with
+    exec, import *, globals() and the like).'''
+    names = set()
+    codes = [code]
+    while codes:
+        c = codes.pop()
+        co = c.co_code
+        i = 0
+        ext = 0
+        while i < len(co):
+            op = ord(co[i])
+            if op < opcode.HAVE_ARGUMENT:
+                if op in _dynamicops:
+                    return None
+                i += 1
+                continue
+            arg = ord(co[i + 1]) | ord(co[i + 2]) << 8 | ext
+            i += 3
+            ext = 0
+            if op == opcode.EXTENDED_ARG:
+                ext = arg << 16
+            elif op in _nameops:
+                names.add(c.co_names[arg])
+        codes.extend([const for const in c.co_consts if isinstance(const, types.CodeType)])
+    if names & _dynamicnames:
+        return None
+    return frozenset(names)
+
+def _persistent_id(obj):
+    if isinstance(obj, types.CodeType):
+        return marshal.dumps(obj)
+    return None
+
+def dumpmodel(script, f, key=''):
+    '''write the script to the file as a compiled model
+
+    The header has the versions of the package and of Python which wrote
+    the model, as it contains marshalled code.'''
+    f.write("%s %s %s %s\n" % (MAGIC, __version__, pythonversion(), key))
+    pickler = cPickle.Pickler(f, cPickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = _persistent_id
+    pickler.dump(script)
+
+def loadmodel(f, key=None):
+    '''read a compiled model written by dumpmodel
+
+    Return None if the key is given and the model was compiled for
+    another key. Raise ValueError if the model was written by another
+    version of the package or of Python.'''
+    data = f.read()
+    end = data.find('\n', 0, 256)
+    header = data[:end].split(' ')
+    if end < 0 or header[0] != MAGIC:
+        raise ValueError("not a compiled SEAT script")
+    if header[1:3] != [__version__, pythonversion()]:
+        raise ValueError("compiled by another version of SEAT or Python (%s), compile the script again"
+                         % (' '.join(header[1:3]),))
+    if key is not None and header[3:] != [key]:
+        return None
+    data = cStringIO.StringIO(data)
+    data.seek(end + 1)
+    unpickler = cPickle.Unpickler(data)
+    unpickler.persistent_load = marshal.loads
+    return unpickler.load()
+
+def iscompiled(f):
+    '''return True if f names a compiled model file'''
+    try:
+        fp = open(f, 'rb')
+    except IOError:
+        return False
+    try:
+        return fp.read(len(MAGIC)) == MAGIC
+    finally:
+        fp.close()
+
+def defaultcachedir():
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'seatsat')
+
+class ModelCache:
+    '''compiled models of script files stored by their key (see modelkey())
+
+    Only the latest model of the same files is kept.'''
+
+    def __init__(self, directory=None):
+        self.directory = directory or defaultcachedir()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.seatmlc')
+
+    def load(self, key):
+        '''return the cached Script, None if not cached'''
+        try:
+            fp = open(self.path(key), 'rb')
+        except IOError:
+            return None
+        try:
+            return loadmodel(fp, key)
+        finally:
+            fp.close()
+
+    def store(self, key, script):
+        '''write the model to a temporary file and rename it into place'''
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            fp = os.fdopen(fd, 'wb')
+            try:
+                dumpmodel(script, fp, key)
+            finally:
+                fp.close()
+            if sys.platform == 'win32' and os.path.exists(self.path(key)):
+                os.remove(self.path(key))
+            os.rename(tmp, self.path(key))
+        except:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        # the models of older versions of the files (or of the package)
+        for path in glob.glob(os.path.join(self.directory, key.split('-')[0] + '-*.seatmlc')):
+            if path != self.path(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return self.path(key)
+
+class ScriptReader:
+    '''read SEAT script files into a Script
+
+    If a ModelCache is given, a script is read from the files only when
+    the cache does not have the compiled model of the files yet. The
+    schema is not loaded until a file has to be validated.'''
+
+    def __init__(self, schemafile, logger, cache=None):
+        self._schemafile = schemafile
+        self._xmlschema = None
+        self.logger = logger
+        self.cache = cache
+        self.errors = 0
+
+    def schema(self):
+        if self._xmlschema is None:
+            self._xmlschema = etree.XMLSchema(etree.parse(self._schemafile))
+        return self._xmlschema
+
+    def delayed(self, c, command):
+        '''wrap the command as a delayed action if it has a delay'''
+        delay = c.get('delay')
+        if delay is None:
+            return command
+        return ['d', float(delay), command]
+
+    def parsecommands(self, r):
+        commands = []
+        for c in r.findall('command'): # get commands
+            host = c.get('host')
+            data = c.text
+            commands.append(self.delayed(c, ['c', host, data]))
+        for c in r.findall('statetransition'): # get statetransition (as command)
+            func = c.get('func')
+            data = c.text
+            commands.append(['t', func, data])
+        for c in r.findall('log'): # get statetransition (as command)
+            data = c.text
+            commands.append(self.delayed(c, ['l', data]))
+        for c in r.findall('shell'): # get shell (as command)
+            func = c.get('host')
+            data = c.text
+            timeout = c.get('timeout')
+            if timeout is not None:
+                timeout = float(timeout)
+            commands.append(self.delayed(c, ['x', func, data, timeout, c.get('result', 'status')]))
+        for c in r.findall('script'): # get script (as compiled command)
+            func = c.get('host')
+            data = c.text or ''
+            fname = "<script at %s:%i>" % (c.getroottree().docinfo.URL, c.sourceline)
+            try:
+                code = compile(data, fname, 'exec')
+            except SyntaxError, e:
+                self.logger.RTC_ERROR(u"unable to compile " + fname + ": " + unicode(e))
+                self.errors += 1
+                continue
+            commands.append(self.delayed(c, ['s', func, code]))
+        return commands
+
+    def parse(self, files):
+        '''return the parsed and validated documents (invalid files are skipped)'''
+        docs = []
+        for f in files:
+            f = f.replace("\\", "\\\\")
+            self.logger.info('load', u"load script file: %s", f)
+            try:
+                doc = etree.parse(f)
+            except etree.XMLSyntaxError, e:
+                self.logger.RTC_ERROR(u"invalid xml syntax: " + unicode(e))
+                self.errors += 1
+                continue
+            except IOError, e:
+                self.logger.RTC_ERROR(u"unable to open file " + f + ": " + unicode(e))
+                self.errors += 1
+                continue
+            try:
+                self.schema().assert_(doc)
+            except AssertionError, b:
+                self.logger.RTC_ERROR(u"invalid script file: " + f + ": " + unicode(b))
+                self.errors += 1
+                continue
+            docs.append(doc)
+        return docs
+
+    def read(self, files, previous=None):
+        '''read the files into a new Script
+
+        The rules of the states whose elements did not change since the
+        previous script are taken over from it instead of being built
+        again. A single compiled model file (see dumpmodel()) is loaded as
+        it is.'''
+        if len(files) == 1 and iscompiled(files[0]):
+            self.logger.info('load', u"load compiled script: %s", files[0])
+            fp = open(files[0], 'rb')
+            try:
+                return loadmodel(fp)
+            except ValueError, e:
+                self.logger.RTC_ERROR(u"unable to load compiled script: " + files[0] + ": " + unicode(e))
+                self.errors = 1
+                return Script()
+            finally:
+                fp.close()
+        key = None
+        if self.cache is not None:
+            try:
+                key = modelkey(files, self._schemafile)
+                script = self.cache.load(key)
+            except (IOError, OSError, ValueError, cPickle.UnpicklingError):
+                script = None
+            if script is not None:
+                self.logger.info('load', u"load compiled script from %s", self.cache.path(key))
+                return script
+        script = self.compile(files, previous)
+        if key is not None and self.errors == 0 and len(script.states) > 0:
+            try:
+                self.cache.store(key, script)
+            except (IOError, OSError), e:
+                self.logger.RTC_WARN(u"unable to write compiled script: " + unicode(e))
+        return script
+
+    def compile(self, files, previous=None):
+        '''read the files into a new Script without the cache'''
+        self.errors = 0
+        script = Script()
+        docs = self.parse(files)
+        elements = {}
+        for doc in docs:
+            for g in doc.findall('general'):
+                for a in g.findall('agent'):
+                    name = str(a.get('name'))
+                    if name not in script.agents:
+                        script.agentorder.append(name)
+                    script.agents[name] = dict(a.attrib)
+            for s in doc.findall('state'):
+                name = s.get('name')
+                if name not in elements:
+                    elements[name] = []
+                    script.states.append(name)
+                elements[name].append(s)
+
+        changed = []
+        for name in script.states:
+            digest = hashlib.sha1()
+            for s in elements[name]:
+                digest.update(etree.tostring(s, with_tail=False))
+            script.fingerprints[name] = digest.hexdigest()
+            if previous is not None and previous.fingerprints.get(name) == script.fingerprints[name]:
+                script.buttons[name] = previous.buttons[name]
+            else:
+                changed.append(name)
+        if previous is not None:
+            reused = [name for name in script.states if name not in changed]
+            script.rules.copystates(previous.rules, reused)
+            script.reused = len(reused)
+        for name in changed:
+            script.buttons[name] = []
+            for s in elements[name]:
+                self.readstate(script, name, s)
+
+        script.rules.compile()
+        if script.states.count("start") > 0:
+            script.startstate = "start"
+        elif len(script.states) > 0:
+            script.startstate = script.states[0]
+        return script
+
+    def readstate(self, script, name, s):
+        rules = script.rules
+        buttons = script.buttons[name]
+        sfuzzy = int(s.get('fuzzy', 0))
+        for e in s.findall('onentry'):
+            commands = self.parsecommands(e)
+            self.logger.debug('load', "register %s:::entry", name)
+            rules.registerentry(name, commands) # register commands to key table
+        for e in s.findall('onexit'):
+            commands = self.parsecommands(e)
+            self.logger.debug('load', "register %s:::exit", name)
+            rules.registerexit(name, commands) # register commands to key table
+        for e in s.findall('timeout'):
+            commands = self.parsecommands(e)
+            self.logger.debug('load', "register %s:::timeout %s", name, e.get('seconds'))
+            rules.registertimeout(name, float(e.get('seconds')), commands)
+        for i, r in enumerate(s.findall('rule')):
+            words = []
+            commands = Rule("%s#%i" % (name, i + 1), self.parsecommands(r))
+            fuzzy = int(r.get('fuzzy', sfuzzy))
+            for k in r.findall('key'): # get keys
+                if k.text is None:
+                    continue
+                source = k.get('source')
+                if source is None:
+                    words.append(k.text)
+                else:
+                    self.logger.debug('load', "register %s:%s:%s", name, source, k.text)
+                    rules.register(name, source, k.text, commands, fuzzy) # register commands to key table
+                    buttons.append(KeyPattern(k.text))
+
+            for k in r.findall('regkey'): # get regular expression keys
+                if k.text is None:
+                    continue
+                source = k.get('source') or 'default'
+                try:
+                    rules.registerregex(name, source, k.text, commands)
+                except re.error, e:
+                    self.logger.RTC_ERROR(u"invalid regkey in " + name + ": " + unicode(e))
+                    self.errors += 1
+                    continue
+                self.logger.debug('load', "register %s:%s:/%s/", name, source, k.text)
+
+            for w in words:
+                self.logger.debug('load', "register %s:default:%s", name, w)
+                rules.register(name, 'default', w, commands, fuzzy) # register commands to key table
+                buttons.append(KeyPattern(w))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''script compiler for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+import sys
+import os
+import time
+import codecs
+import locale
+import optparse
+from seatsat.__init__ import __version__
+from seatsat import utils
+from seatsat.seatml import ScriptReader, ModelCache, modelkey, dumpmodel
+from seatsat.seatlog import CategoryLogger, StreamLogBuf
+try:
+    import gettext
+    _ = gettext.translation(domain='seatsat', localedir=os.path.dirname(__file__)+'/../share/locale').ugettext
+except:
+    _ = lambda s: s
+
+__doc__ = _('Compile SEAT script files ahead of time, so that SEAT starts without reading XML.')
+
+__examples__ = '''
+Examples:
+
+- '''+_('Compile the script into the user model cache (used by SEAT with model_cache=auto when the script is unchanged).')+'''
+
+  ::
+
+  $ seatmlc -c auto sample.seatml
+
+- '''+_('Compile the scripts into a file to give to SEAT instead of the scripts.')+'''
+
+  ::
+
+  $ seatmlc -o sample.seatmlc sample.seatml
+  $ seat sample.seatmlc
+'''
+
+def main():
+    encoding = locale.getpreferredencoding()
+    sys.stdout = codecs.getwriter(encoding)(sys.stdout, errors = "replace")
+    sys.stderr = codecs.getwriter(encoding)(sys.stderr, errors = "replace")
+
+    if hasattr(sys, "frozen"):
+        basedir = os.path.dirname(unicode(sys.executable, sys.getfilesystemencoding()))
+    else:
+        basedir = os.path.dirname(__file__)
+
+    parser = utils.MyParser(version=__version__, usage="%prog [seatmlfile...]",
+                            description=__doc__, epilog=__examples__)
+    parser.add_option('-o', '--output', dest='output', action='store',
+                      type='string', default=None,
+                      help=_('write the compiled script to the file'))
+    parser.add_option('-c', '--cache', dest='cache', action='store',
+                      type='string', default=None,
+                      help=_('write the compiled script to the model cache in the directory (auto for the user cache directory)'))
+    parser.add_option('-v', '--verbose', dest='verbose', action='store_true',
+                      default=False,
+                      help=_('output verbose information'))
+    try:
+        opts, args = parser.parse_args()
+    except optparse.OptionError, e:
+        print >>sys.stderr, 'OptionError:', e
+        sys.exit(1)
+
+    if len(args) == 0:
+        parser.error("wrong number of arguments")
+        sys.exit(1)
+    if opts.output is None and opts.cache is None:
+        parser.error("give the file (-o) or the model cache (-c) to write to")
+        sys.exit(1)
+
+    logger = CategoryLogger(StreamLogBuf(sys.stderr, "seatmlc"))
+    logger.setlevels(opts.verbose and "INFO" or "WARN")
+    schemafile = os.path.join(basedir, 'seatml.xsd')
+    reader = ScriptReader(schemafile, logger)
+    t = time.time()
+    script = reader.compile(args)
+    if reader.errors > 0 or len(script.states) == 0:
+        print >>sys.stderr, "[error] unable to compile the script files"
+        sys.exit(1)
+
+    if opts.output is not None:
+        fp = open(opts.output, 'wb')
+        try:
+            dumpmodel(script, fp)
+        finally:
+            fp.close()
+        path = opts.output
+    else:
+        cache = ModelCache(opts.cache != 'auto' and opts.cache or None)
+        path = cache.store(modelkey(args, schemafile), script)
+    print "%i states compiled in %.3f s: %s" % (len(script.states), time.time() - t, path)
+
+if __name__ == '__main__':
+    main()
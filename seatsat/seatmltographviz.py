@@ -64,6 +64,13 @@ def seatmltographviz(doc):
                 ret += "%s -> %s %s;\n" % (s.getAttribute('name'), t.item(0).childNodes[0].data, lab)
             else:
                 ret += "%s -> %s %s;\n" % (s.getAttribute('name'), s.getAttribute('name'), lab)
+        for r in s.getElementsByTagName('timeout'):
+            lab = '[label = "timeout %s s", style = dashed]' % (r.getAttribute('seconds'),)
+            t = r.getElementsByTagName('statetransition')
+            if len(t) > 0:
+                ret += "%s -> %s %s;\n" % (s.getAttribute('name'), t.item(0).childNodes[0].data, lab)
+            else:
+                ret += "%s -> %s %s;\n" % (s.getAttribute('name'), s.getAttribute('name'), lab)
     ret += '}\n'
     return ret
 
@@ -21,6 +21,7 @@ import locale
 from seatsat.__init__ import __version__
 from xml.dom.minidom import parse
 from seatsat import utils
+from seatsat.keypattern import KeyPattern
 try:
     import gettext
     _ = gettext.translation(domain='seatsat', localedir=os.path.dirname(__file__)+'/../share/locale').ugettext
@@ -79,8 +80,8 @@ def main():
         for s in doc.getElementsByTagName('state'):
             for r in s.getElementsByTagName('rule'):
                 for k in r.getElementsByTagName('key'):
-                    lab = k.childNodes[0].data
-                    print '      <item>%s</item>' % (lab,)
+                    for lab in KeyPattern(k.childNodes[0].data).variants():
+                        print '      <item>%s</item>' % (lab,)
     print '''\
     </one-of>
   </rule>
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Transcript replay for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+The SEAT component is run on the local OpenRTM stand-in (no naming
+service nor CORBA is needed) and fed with the inputs of transcript
+files, while the commands, state transitions, log and shell actions of
+the script are recorded instead of being sent. Note that importing this
+module installs the stand-in as the OpenRTM_aist and RTC modules.
+'''
+
+import sys
+import os
+import time
+import json
+import codecs
+import locale
+import optparse
+import traceback
+from seatsat.__init__ import __version__
+from seatsat import utils
+from seatsat import rtcstandin
+rtcstandin.install()
+import RTC
+from seatsat import SEAT as seatmodule
+from seatsat.timerwheel import TimerWheel
+try:
+    import gettext
+    _ = gettext.translation(domain='seatsat', localedir=os.path.dirname(__file__)+'/../share/locale').ugettext
+except:
+    _ = lambda s: s
+
+__doc__ = _('Replay transcripts of inputs to the SEAT script files without OpenRTM.')
+
+__examples__ = '''
+Transcript files have one input per line: the time in seconds from the
+start of the dialog, the name of the source agent and the input,
+separated by white spaces. A line "---" starts a new dialog and lines
+starting with "#" are comments. Timeouts and delayed actions fire at
+their time in the transcript if it comes before the next input.
+
+Every event is output on a line with the number of the dialog, the time
+in the transcript, the type of the event (input, command, transition,
+log, shell or error), its target and its data, separated by tabs. The
+actions of timeouts and delayed actions are output at the time they
+fired. The parameters given with -p are those of SEAT; with trace=FILE
+the trace of the turns is written to FILE at the end.
+
+Examples:
+
+- '''+_('Replay a transcript as fast as possible.')+'''
+
+  ::
+
+  $ seatreplay -t dialog.txt sample.seatml
+
+- '''+_('Replay a transcript in real time.')+'''
+
+  ::
+
+  $ seatreplay --speed 1 -t dialog.txt sample.seatml
+
+- '''+_('Replay a transcript and write a trace of the turns to open in chrome://tracing or Perfetto.')+'''
+
+  ::
+
+  $ seatreplay -p trace=trace.json -t dialog.txt sample.seatml
+'''
+
+def readtranscript(f):
+    '''return the dialogs of a transcript file as lists of (time, source, input)'''
+    dialogs = []
+    dialog = []
+    fp = codecs.open(f, 'r', 'utf-8')
+    try:
+        for lineno, line in enumerate(fp):
+            line = line.strip()
+            if len(line) == 0 or line[0] == '#':
+                continue
+            if line == '---':
+                if dialog:
+                    dialogs.append(dialog)
+                dialog = []
+                continue
+            items = line.split(None, 2)
+            try:
+                dialog.append((float(items[0]), str(items[1]), items[2]))
+            except (IndexError, ValueError):
+                raise ValueError("%s:%i: expected time, source and input" % (f, lineno + 1))
+    finally:
+        fp.close()
+    if dialog:
+        dialogs.append(dialog)
+    return dialogs
+
+class ReplaySEAT(seatmodule.SEAT):
+    '''SEAT component recording its actions instead of sending them
+
+    events is the list of (time, type, target, data) recorded since the
+    last restart, where time is the transcript time of the input.'''
+
+    def __init__(self, manager, runshell=False):
+        seatmodule.SEAT.__init__(self, manager)
+        self.runshell = runshell
+        self.events = []
+        self.now = 0.0
+        self.timers = TimerWheel()
+
+    def record(self, type, target, data):
+        self.events.append((self.now, type, target, data))
+
+    def createSocketAdaptor(self, name, host, port, **options):
+        return self
+
+    def createSocketServer(self, name, host, port, **options):
+        return self
+
+    def send(self, name, data):
+        self.record('command', name, data)
+
+    def startTimer(self, delay, func, *args):
+        return self.timers.add(self.now + delay, func, *args)
+
+    def stopTimer(self, timer):
+        self.timers.cancel(timer)
+
+    def advance(self, t):
+        '''fire the timers due until the transcript time t'''
+        while True:
+            due = self.timers.expire(t)
+            if not due:
+                break
+            for timer in due:
+                self.now = timer.deadline
+                timer.func(*timer.args)
+        self.now = t
+
+    def stateTransfer(self, newstate):
+        self.record('transition', self.currentstate, newstate)
+        seatmodule.SEAT.stateTransfer(self, newstate)
+
+    def activateCommand(self, c):
+        if self.recordaction(c):
+            seatmodule.SEAT.activateCommand(self, c)
+
+    def activateCommandEx(self, c, s):
+        if self.recordaction(c):
+            seatmodule.SEAT.activateCommandEx(self, c, s)
+
+    def recordaction(self, c):
+        '''record log and shell actions, return False if the action is not to be run'''
+        if c[0] == 'l':
+            self.record('log', None, c[1])
+        elif c[0] == 'x':
+            self.record('shell', c[1], c[2])
+            return self.runshell
+        return True
+
+    def restart(self):
+        '''start a new dialog from the start state'''
+        self.events = []
+        self.now = 0.0
+        self.timers.clear()
+        self._delayed = []
+        self.sessions.clear()
+        self.session = self._defaultsession
+        self.session.timers = None
+        self.statestack = []
+        self._scriptns = self.newScriptNamespace()
+        self.currentstate = "start"
+        self.stateTransfer(self.startstate)
+        self.armTimers()
+
+    def feed(self, source, text):
+        '''process the input as the port or the socket of the source would'''
+        self.record('input', source, text)
+        try:
+            t = self.adaptortype.get(source)
+            if t is not None and t[0] is not RTC.TimedString:
+                dtype = t[1]
+                if dtype == str:
+                    text = text.encode('utf-8')
+                if t[2]:
+                    self.processNonString(source, [dtype(d) for d in text.split(',')])
+                else:
+                    self.processNonString(source, dtype(text))
+            else:
+                self.processResult(source, text)
+        except:
+            self.record('error', source, traceback.format_exc().splitlines()[-1])
+
+def replay(comp, dialogs, speed=0.0):
+    '''replay the dialogs and yield the events of each dialog
+
+    Inputs are fed as fast as possible if speed is 0, or else at their
+    time in the transcript divided by speed.'''
+    for dialog in dialogs:
+        comp.restart()
+        start = time.time()
+        for t, source, text in dialog:
+            if speed > 0:
+                delay = start + t / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            comp.advance(t)
+            comp.feed(source, text)
+        yield comp.events
+
+def formatevent(n, event, usejson=False):
+    t, type, target, data = event
+    if usejson:
+        return json.dumps({'dialog': n, 'time': t, 'type': type, 'target': target, 'data': data},
+                          ensure_ascii=False, sort_keys=True)
+    if not isinstance(data, basestring):
+        data = repr(data)
+    return u"%i\t%.3f\t%s\t%s\t%s" % (n, t, type, target or '', data.replace('\n', '\\n'))
+
+def main():
+    encoding = locale.getpreferredencoding()
+    sys.stdout = codecs.getwriter(encoding)(sys.stdout, errors = "replace")
+    sys.stderr = codecs.getwriter(encoding)(sys.stderr, errors = "replace")
+
+    parser = utils.MyParser(version=__version__, usage="%prog [options] -t transcript [seatmlfile]",
+                            description=__doc__, epilog=__examples__)
+    parser.add_option('-t', '--transcript', dest='transcripts', action='append', default=[],
+                      help=_('transcript file to replay (can be given more than once)'))
+    parser.add_option('--speed', dest='speed', type='float', default=0.0,
+                      help=_('replay at the given multiple of real time (0 for as fast as possible) [default: %default]'))
+    parser.add_option('--repeat', dest='repeat', type='int', default=1,
+                      help=_('replay the transcripts the given number of times [default: %default]'))
+    parser.add_option('-s', type='float', nargs=1, dest='maxscore', default=0.0,
+                      help=_('max_score for voice recognition'))
+    parser.add_option('--shell', dest='runshell', action='store_true', default=False,
+                      help=_('run the shell actions (only recorded by default)'))
+    parser.add_option('--json', dest='json', action='store_true', default=False,
+                      help=_('output the events as json (one object per line)'))
+    parser.add_option('-q', '--quiet', dest='quiet', action='store_true', default=False,
+                      help=_('output only the summary'))
+    parser.add_option('--loglevel', dest='loglevel', default='ERROR',
+                      help=_('log level of the component [default: %default]'))
+    parser.add_option('-c', '--cache', dest='cache', default=None,
+                      help=_('use the model cache in the directory (auto for the user cache directory, not used by default)'))
+    parser.add_option('-p', '--param', dest='params', action='append', default=[],
+                      help=_('set a configuration parameter of the component (NAME=VALUE)'))
+    try:
+        opts, args = parser.parse_args()
+    except optparse.OptionError, e:
+        print >>sys.stderr, 'OptionError:', e
+        sys.exit(1)
+
+    if len(args) == 0 or len(opts.transcripts) == 0:
+        parser.error("wrong number of arguments")
+        sys.exit(1)
+
+    sys.stdout = codecs.getwriter('utf_8')(sys.__stdout__)
+
+    dialogs = []
+    for f in opts.transcripts:
+        try:
+            dialogs.extend(readtranscript(f))
+        except (IOError, ValueError), e:
+            print >>sys.stderr, e
+            return 1
+    dialogs = dialogs * opts.repeat
+
+    logbuf = rtcstandin.Manager.instance().getLogbuf()
+    comp = ReplaySEAT(rtcstandin.Manager.instance(), opts.runshell)
+    comp.onInitialize()
+    comp.setParameter('loglevel', opts.loglevel)
+    if opts.cache is not None:
+        comp.setParameter('model_cache', opts.cache)
+    for p in opts.params:
+        name, value = p.split('=', 1)
+        comp.setParameter(name, value)
+    logbuf.stream = sys.stderr
+    comp.max_score = opts.maxscore
+    if comp.loadSEATML(args) != 0:
+        print >>sys.stderr, 'Unable to load script file'
+        return 1
+
+    ninputs = 0
+    nevents = 0
+    start = time.time()
+    for n, events in enumerate(replay(comp, dialogs, opts.speed)):
+        nevents += len(events)
+        if not opts.quiet:
+            for e in events:
+                print formatevent(n, e, opts.json)
+        ninputs += len(dialogs[n])
+    elapsed = time.time() - start
+    comp.onFinalize()
+    print >>sys.stderr, "%i dialogs, %i inputs, %i events in %.3f s (%.0f inputs/s)" % \
+        (len(dialogs), ninputs, nevents, elapsed, ninputs / elapsed if elapsed > 0 else 0.0)
+    return 0
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Latency histograms and counters for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+import time
+
+class Histogram:
+    '''latency histogram with fixed power of two buckets in microseconds
+
+    Bucket i counts the samples of less than 2**i microseconds (the last
+    bucket counts everything above), so the memory used does not depend
+    on the number of samples.'''
+
+    NBUCKETS = 32
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * self.NBUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, sec):
+        b = int(sec * 1e6).bit_length()
+        if b >= self.NBUCKETS:
+            b = self.NBUCKETS - 1
+        self.buckets[b] += 1
+        self.count += 1
+        self.total += sec
+        if sec > self.max:
+            self.max = sec
+
+    def percentile(self, p):
+        '''upper bound of the p-th percentile in seconds'''
+        if self.count == 0:
+            return 0.0
+        rank = self.count * p / 100.0
+        n = 0
+        for i, c in enumerate(self.buckets):
+            n += c
+            if n >= rank:
+                return min((1 << i) * 1e-6, self.max)
+        return self.max
+
+    def summary(self):
+        if self.count == 0:
+            return {'count': 0}
+        return {'count': self.count,
+                'mean': self.total / self.count,
+                'max': self.max,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99)}
+
+class Stats:
+    '''per phase latency histograms, per state/rule hit counters and gauges
+
+    The phases recorded are also given to tracer (a tracer.Tracer) if set.'''
+
+    def __init__(self):
+        self.tracer = None
+        self.reset()
+
+    def reset(self):
+        self._histograms = {}
+        self.hits = {}
+        self.misses = {}
+        self.rules = {}
+        self.counters = {}
+        self.gauges = {}
+        self.since = time.time()
+
+    def histogram(self, phase):
+        try:
+            return self._histograms[phase]
+        except KeyError:
+            h = self._histograms[phase] = Histogram()
+            return h
+
+    def record(self, phase, sec, end=None):
+        '''record that the phase took sec seconds (ending at end, now if None)'''
+        if self.tracer is not None:
+            self.tracer.record(phase, sec, end)
+        try:
+            h = self._histograms[phase]
+        except KeyError:
+            h = self.histogram(phase)
+        h.record(sec)
+
+    def hit(self, state, rule):
+        self.hits[state] = self.hits.get(state, 0) + 1
+        self.rules[rule] = self.rules.get(rule, 0) + 1
+
+    def miss(self, state):
+        self.misses[state] = self.misses.get(state, 0) + 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        '''set the current value of a gauge (e.g. the depth of a queue)'''
+        self.gauges[name] = value
+
+    def snapshot(self):
+        '''return the current statistics as a dictionary (for json)'''
+        phases = {}
+        for phase, h in self._histograms.items():
+            phases[phase] = h.summary()
+        return {'since': self.since,
+                'time': time.time(),
+                'phases': phases,
+                'hits': dict(self.hits),
+                'misses': dict(self.misses),
+                'rules': dict(self.rules),
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges)}
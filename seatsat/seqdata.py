@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Numeric sequences for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+The ORB gives the data of sequence ports as python lists (octet and
+char sequences as strings) and wants lists back. Scripts can get the
+data of an input as array.array or numpy array instead, filled in C
+without a python object per element (numpy views strings without
+copying them), and arrays or other buffers sent to an output are turned
+back into lists in C as well. numpy is optional.
+
+An array is not always faster: making one from the list given by the
+ORB is a pass over all the elements, so a script using only a few
+elements of a float sequence (decimating it, say) does better with the
+list.
+'''
+
+import array
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LIST = 'list'
+ARRAY = 'array'
+NUMPY = 'numpy'
+KINDS = (LIST, ARRAY, NUMPY)
+
+# array typecodes of the elements (CORBA long is 32 bit), unsigned first
+TYPECODES = [('UShort', 'H'), ('ULong', 'I'), ('Short', 'h'), ('Long', 'i'),
+             ('Float', 'f'), ('Double', 'd'), ('Octet', 'B'), ('Char', 'b'),
+             ('Boolean', 'B')]
+INTCODES = 'bBhHiIlL'
+
+def typecode(datatype):
+    '''return the typecode of the elements of a numeric sequence type, None otherwise'''
+    if not datatype.endswith('Seq'):
+        return None
+    for name, code in TYPECODES:
+        if name in datatype:
+            return code
+    return None
+
+def viewer(code, kind):
+    '''return a function making sequence data into the kind of array (None for lists)'''
+    if code is None or kind == LIST:
+        return None
+    if kind == NUMPY:
+        if numpy is None:
+            raise ImportError("numpy is not available")
+        dtype = numpy.dtype(code)
+        def tonumpy(data):
+            if isinstance(data, str):
+                return numpy.frombuffer(data, dtype)
+            return numpy.asarray(data, dtype)
+        return tonumpy
+    def toarray(data):
+        if isinstance(data, array.array) and data.typecode == code:
+            return data
+        return array.array(code, data)
+    return toarray
+
+def tolist(data, code):
+    '''return the elements of an array or a buffer as a list, None for other objects'''
+    if numpy is not None and isinstance(data, numpy.ndarray):
+        if code is not None and data.dtype != numpy.dtype(code):
+            data = data.astype(code)
+        return data.ravel().tolist()
+    if isinstance(data, array.array):
+        if code is None or data.typecode == code or (data.typecode in INTCODES and code in INTCODES):
+            return data.tolist()
+        return None # converted element by element
+    if isinstance(data, (bytearray, buffer, memoryview)):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        data = str(data)
+        ret = array.array(code or 'B')
+        # (a trailing partial element is left out)
+        ret.fromstring(data[:len(data) - len(data) % ret.itemsize])
+        return ret.tolist()
+    return None
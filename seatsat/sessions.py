@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Dialog sessions for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+import time
+
+class Session(object):
+    '''state of one dialog (the rules are shared by all the sessions)'''
+
+    __slots__ = ('id', 'state', 'stack', 'last', 'timers')
+
+    def __init__(self, id, state=None, now=None):
+        self.id = id
+        self.state = state
+        self.stack = None # state stack, None while empty
+        self.last = now or time.time()
+        self.timers = None # pending timers, None until the first one
+
+class SessionTable:
+    '''sessions by id, forgetting the sessions idle for longer than timeout
+
+    Expired sessions are never returned by get() nor peek() (a new
+    session has to be added instead). They are removed when found by
+    these or by evict(), and given to expired(session) if given.'''
+
+    def __init__(self, timeout=0.0, expired=None):
+        self.timeout = timeout
+        self.expired = expired
+        self._sessions = {}
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __iter__(self):
+        return self._sessions.itervalues()
+
+    def get(self, id, now=None):
+        '''return the session and mark it as active, None if unknown or expired'''
+        session = self._sessions.get(id)
+        if session is None:
+            return None
+        now = now or time.time()
+        if self.timeout > 0 and now - session.last > self.timeout:
+            self._expire(session)
+            return None
+        session.last = now
+        return session
+
+    def peek(self, id, now=None):
+        '''return the session without marking it as active, None if unknown or expired'''
+        session = self._sessions.get(id)
+        if session is None:
+            return None
+        if self.timeout > 0 and (now or time.time()) - session.last > self.timeout:
+            self._expire(session)
+            return None
+        return session
+
+    def add(self, id, state=None, now=None):
+        session = self._sessions[id] = Session(id, state, now)
+        return session
+
+    def remove(self, id):
+        '''remove the session, return it (None if unknown)'''
+        return self._sessions.pop(id, None)
+
+    def evict(self, now=None):
+        '''remove the expired sessions, return the ids of the sessions removed'''
+        if self.timeout <= 0:
+            return []
+        limit = (now or time.time()) - self.timeout
+        expired = [s for s in self._sessions.itervalues() if s.last < limit]
+        for session in expired:
+            self._expire(session)
+        return [s.id for s in expired]
+
+    def _expire(self, session):
+        del self._sessions[session.id]
+        if self.expired is not None:
+            self.expired(session)
+
+    def clear(self):
+        self._sessions = {}
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Shell command executor for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+'''
+
+import os
+import time
+import signal
+import threading
+import subprocess
+import traceback
+import Queue
+
+# exit status reported for commands killed by the timeout
+TIMEOUT_STATUS = -9
+
+class ShellExecutor:
+    '''run shell commands on a bounded pool of worker threads
+
+    submit() only queues the command and returns, the command runs on one
+    of the worker threads (at most `workers` commands at the same time)
+    and callback(status, output) is called on that thread when the
+    command exits or is killed by its timeout. The commands are traced
+    by the tracer of stats (a seatstats.Stats) if it has one.'''
+
+    def __init__(self, workers=4, maxqueue=64, timeout=30.0, logger=None, stats=None):
+        self._queue = Queue.Queue(maxqueue)
+        self._timeout = timeout
+        self._logger = logger
+        self._stats = stats
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._run, name="shell%i" % (i,))
+            t.setDaemon(True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, cmd, callback=None, timeout=None):
+        '''queue the command (returns False if the queue is full)'''
+        if timeout is None:
+            timeout = self._timeout
+        try:
+            self._queue.put_nowait((cmd, callback, timeout))
+        except Queue.Full:
+            return False
+        return True
+
+    def terminate(self):
+        for t in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            cmd, callback, timeout = job
+            try:
+                t = time.time()
+                status, output = self.execute(cmd, timeout)
+                tracer = self._stats is not None and self._stats.tracer
+                if tracer:
+                    tracer.span('shell command', t, cat='io', args={'command': cmd, 'status': status})
+                if callback is not None:
+                    callback(status, output)
+            except:
+                if self._logger is not None:
+                    self._logger.RTC_ERROR(traceback.format_exc())
+
+    def execute(self, cmd, timeout):
+        '''run the command and return (exit status, stdout)'''
+        if hasattr(os, 'setsid'):
+            # run in its own process group to kill the children of the shell too
+            p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, close_fds=True,
+                                 preexec_fn=os.setsid)
+        else:
+            p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
+        killed = []
+        def kill():
+            killed.append(True)
+            try:
+                if hasattr(os, 'killpg'):
+                    os.killpg(p.pid, signal.SIGKILL)
+                else:
+                    p.kill()
+            except OSError:
+                pass
+        timer = None
+        if timeout > 0:
+            timer = threading.Timer(timeout, kill)
+            timer.start()
+        try:
+            output = p.communicate()[0]
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if killed:
+            if self._logger is not None:
+                self._logger.RTC_WARN("shell command timed out: " + cmd)
+            return (TIMEOUT_STATUS, output)
+        return (p.returncode, output)
@@ -0,0 +1,795 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Socket I/O hub for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+All the socket agents of a component are run by one thread polling
+non-blocking sockets (epoll, poll or select, whichever the platform
+has). Messages are framed on the stream, either as lines or with a
+4-byte big-endian length prefix, and connections which fail or are
+closed by the peer are opened again after a delay doubling up to
+MAXBACKOFF. Messages sent to a connection are only queued: the hub
+writes them when the socket is writable, several small messages at a
+time, so that a slow or dead peer never blocks the sender. A listener
+accepts any number of clients on the same thread; each client is a
+source of its own, named "<agent>#<number>".
+'''
+
+import os
+import time
+import errno
+import socket
+import select
+import struct
+import bisect
+import threading
+import traceback
+import collections
+from seatsat.dialogloop import DROP_OLDEST, DROP_NEWEST
+
+LINE = 'line'
+LENGTH = 'length'
+FRAMINGS = (LINE, LENGTH)
+
+# delays before connecting again, doubled after every failure
+MINBACKOFF = 0.05
+MAXBACKOFF = 5.0
+
+RECVSIZE = 65536
+
+# largest message accepted with the length framing
+MAXFRAME = 16 * 1024 * 1024
+
+# messages queued per connection by default (0 for unbounded)
+QUEUELENGTH = 256
+SENDPOLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+# queued messages are joined into writes of up to this many bytes
+COALESCE = 65536
+
+# separates the name of a listener and the number of its client
+CLIENTSEP = '#'
+
+_length = struct.Struct('!I')
+
+_inprogress = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, 'WSAEWOULDBLOCK', 10035))
+_again = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+_nofiles = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+
+def agentof(source, listeners):
+    '''return the agent name of a source (the listener of a client)
+
+    The source is a client only if it is "<listener>#<number>" of one of
+    the listeners, other names are agents even if they have a "#".'''
+    name, sep, number = source.rpartition(CLIENTSEP)
+    if sep and number.isdigit() and name in listeners:
+        return name
+    return source
+
+class Framer:
+    '''split a stream into messages and messages into a stream'''
+
+    def __init__(self, framing=LINE):
+        if framing not in FRAMINGS:
+            raise ValueError("unknown framing: " + str(framing))
+        self.framing = framing
+        self._chunks = []
+        self._size = 0
+        self._need = 0
+
+    def feed(self, data):
+        '''return the messages completed by the data'''
+        # (the pending data is kept in chunks and joined only once a message
+        # can be complete, not copied again on every read)
+        if self.framing == LINE:
+            if '\n' not in data:
+                self._append(data)
+                if self._size > MAXFRAME:
+                    raise ValueError("line of more than %i bytes is too long" % (MAXFRAME,))
+                return []
+            lines = self._take(data).split('\n')
+            self._append(lines.pop())
+            if self._size > MAXFRAME or max([len(l) for l in lines]) > MAXFRAME:
+                raise ValueError("line of more than %i bytes is too long" % (MAXFRAME,))
+            return [l.rstrip('\r') for l in lines if l.rstrip('\r')]
+        self._append(data)
+        if self._size < self._need:
+            return []
+        buf = self._take('')
+        frames = []
+        pos = 0
+        self._need = _length.size
+        while len(buf) - pos >= _length.size:
+            n = _length.unpack_from(buf, pos)[0]
+            if n > MAXFRAME:
+                raise ValueError("message of %i bytes is too long" % (n,))
+            if len(buf) - pos - _length.size < n:
+                self._need = _length.size + n
+                break
+            pos += _length.size
+            frames.append(buf[pos:pos + n])
+            pos += n
+        self._append(buf[pos:])
+        return frames
+
+    def _append(self, data):
+        if data:
+            self._chunks.append(data)
+            self._size += len(data)
+
+    def _take(self, data):
+        '''return the pending data followed by the data and forget it'''
+        self._chunks.append(data)
+        buf = ''.join(self._chunks)
+        self._chunks = []
+        self._size = 0
+        return buf
+
+    def encode(self, msg):
+        if isinstance(msg, unicode):
+            msg = msg.encode('utf-8')
+        if self.framing == LINE:
+            return msg + '\n'
+        return _length.pack(len(msg)) + msg
+
+    def reset(self):
+        self._chunks = []
+        self._size = 0
+        self._need = 0
+
+class Poller:
+    '''epoll, poll or select, whichever the platform has'''
+
+    def __init__(self):
+        if hasattr(select, 'epoll'):
+            self._poll = select.epoll()
+            self._in, self._out = select.EPOLLIN, select.EPOLLOUT
+            self._err = select.EPOLLERR | select.EPOLLHUP
+            self._scale = 1.0
+        elif hasattr(select, 'poll'):
+            self._poll = select.poll()
+            self._in, self._out = select.POLLIN, select.POLLOUT
+            self._err = select.POLLERR | select.POLLHUP | select.POLLNVAL
+            self._scale = 1000.0
+        else:
+            self._poll = None
+            self._read = set()
+            self._write = set()
+
+    def _mask(self, read, write):
+        return (read and self._in or 0) | (write and self._out or 0)
+
+    def register(self, fd, read=True, write=False):
+        if self._poll is None:
+            self.modify(fd, read, write)
+        else:
+            self._poll.register(fd, self._mask(read, write))
+
+    def modify(self, fd, read=True, write=False):
+        if self._poll is None:
+            for fds, flag in ((self._read, read), (self._write, write)):
+                if flag:
+                    fds.add(fd)
+                else:
+                    fds.discard(fd)
+        else:
+            self._poll.modify(fd, self._mask(read, write))
+
+    def unregister(self, fd):
+        if self._poll is None:
+            self._read.discard(fd)
+            self._write.discard(fd)
+        else:
+            try:
+                self._poll.unregister(fd)
+            except (IOError, OSError, KeyError, ValueError):
+                pass
+
+    def poll(self, timeout):
+        '''return [(fd, readable, writable)] (errors count as both)'''
+        if self._poll is None:
+            r, w, e = select.select(list(self._read), list(self._write), [], timeout)
+            w = set(w)
+            return [(fd, True, fd in w) for fd in r] + [(fd, False, True) for fd in w if fd not in r]
+        if timeout is None:
+            timeout = -1
+        else:
+            timeout = timeout * self._scale
+        events = []
+        for fd, mask in self._poll.poll(timeout):
+            err = mask & self._err
+            events.append((fd, bool(mask & self._in or err), bool(mask & self._out or err)))
+        return events
+
+    def close(self):
+        if self._poll is not None and hasattr(self._poll, 'close'):
+            self._poll.close()
+
+def _wakeuppair():
+    '''return a pair of connected sockets (emulated where socketpair is missing)'''
+    if hasattr(socket, 'socketpair'):
+        return socket.socketpair()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        a = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        a.connect(listener.getsockname())
+        b, addr = listener.accept()
+        return a, b
+    finally:
+        listener.close()
+
+class Connection:
+    '''outbound connection of a socket agent, run by a SocketHub
+
+    receive(name, message) is called on the hub thread for every message
+    read from the peer. send() may be called from any thread: it queues
+    the message and returns at once. At most queuelength messages are
+    queued (while connecting too); when the queue is full the oldest or
+    the new message is dropped, as the policy says. A message partly
+    written when the connection fails is dropped as well, since the
+    rest of it would break the framing of the next connection.'''
+
+    def __init__(self, hub, name, host, port, framing, receive,
+                 queuelength=QUEUELENGTH, policy=DROP_OLDEST):
+        if policy not in SENDPOLICIES:
+            raise ValueError("unknown queue policy: " + str(policy))
+        self.hub = hub
+        self.name = name
+        self.agent = name # name used in the statistics
+        self.listener = None # the Listener of an accepted client
+        self.host = host
+        self.port = port
+        self.framer = Framer(framing)
+        self.receive = receive
+        self.queuelength = queuelength
+        self.policy = policy
+        self.sock = None
+        self.connected = False
+        self.connecting = False
+        self.closed = False
+        self.backoff = MINBACKOFF
+        self.retry = 0.0
+        self.failures = 0
+        self.queue = collections.deque()
+        self.queued = 0 # bytes in the queue
+        self.partial = '' # rest of a write the socket did not take
+        self.ends = [] # where the messages in partial end
+        self.dropped = 0
+        self.writes = 0
+        self.sent = 0
+
+    def send(self, name, msg):
+        '''queue the message, return False if a message had to be dropped'''
+        data = self.framer.encode(msg)
+        ret = True
+        hub = self.hub
+        hub._lock.acquire()
+        try:
+            if self.closed:
+                return False
+            if self.queuelength > 0 and len(self.queue) >= self.queuelength:
+                if self.policy == DROP_NEWEST:
+                    self._dropped(1)
+                    return False
+                self.queued -= len(self.queue.popleft())
+                self._dropped(1)
+                ret = False
+            wake = not self.queue and not self.partial
+            self.queue.append(data)
+            self.queued += len(data)
+            if wake:
+                hub._flush.add(self)
+            hub._gauge(self)
+        finally:
+            hub._lock.release()
+        if wake:
+            hub.wakeup()
+        return ret
+
+    def _dropped(self, n):
+        self.dropped += n
+        if self.hub.stats is not None:
+            self.hub.stats.count('socket.%s.dropped' % (self.agent,), n)
+        if self.dropped == n or self.dropped % 100 < n:
+            self.hub.log('warn', "send queue of %s is full, %i messages dropped", self.name, self.dropped)
+
+    def pending(self):
+        return bool(self.queue or self.partial)
+
+    def terminate(self):
+        self.hub.remove(self)
+
+class Listener:
+    '''listening socket of a server agent, run by a SocketHub
+
+    Every accepted client is a Connection named "<name>#<number>", which
+    is given to receive() with the messages of the client and to
+    closed() when the client goes away. send() writes to one client when
+    given the name of a client and to all the clients when given the
+    name of the listener.'''
+
+    def __init__(self, hub, name, host, port, framing, receive,
+                 queuelength=QUEUELENGTH, policy=DROP_OLDEST, closed=None):
+        if policy not in SENDPOLICIES:
+            raise ValueError("unknown queue policy: " + str(policy))
+        if framing not in FRAMINGS:
+            raise ValueError("unknown framing: " + str(framing))
+        self.hub = hub
+        self.name = name
+        self.host = host
+        self.port = port
+        self.framing = framing
+        self.receive = receive
+        self.queuelength = queuelength
+        self.policy = policy
+        self.onclose = closed
+        self.sock = None
+        self.closed = False
+        self.accepting = False
+        self.backoff = MINBACKOFF
+        self.retry = 0.0
+        self.failures = 0
+        self.clients = {}
+        self.accepted = 0
+
+    def send(self, name, msg):
+        '''queue the message for the client or for all the clients'''
+        hub = self.hub
+        hub._lock.acquire()
+        try:
+            if name == self.name:
+                clients = self.clients.values()
+            else:
+                clients = [c for c in (self.clients.get(name),) if c is not None]
+        finally:
+            hub._lock.release()
+        if not clients and name != self.name:
+            hub.log('debug', "client %s is gone, message dropped", name)
+            return False
+        ret = True
+        for c in clients:
+            ret = c.send(name, msg) and ret
+        return ret
+
+    def terminate(self):
+        self.hub.remove(self)
+
+class SocketHub(threading.Thread):
+    '''one thread running the sockets of all the socket agents'''
+
+    def __init__(self, logger=None, stats=None):
+        threading.Thread.__init__(self, name="sockethub")
+        self.setDaemon(True)
+        self.logger = logger
+        self.stats = stats
+        self._lock = threading.Lock()
+        self._poller = Poller()
+        self._conns = []
+        self._byfd = {}
+        self._waiting = set()
+        self._flush = set()
+        self._calls = []
+        self._running = True
+        self._wakeupr, self._wakeupw = _wakeuppair()
+        self._wakeupr.setblocking(0)
+        self._wakeupw.setblocking(0)
+        self._poller.register(self._wakeupr.fileno())
+
+    def log(self, level, fmt, *args):
+        if self.logger is not None:
+            getattr(self.logger, level)('socket', fmt, *args)
+
+    def wakeup(self):
+        try:
+            self._wakeupw.send('x')
+        except socket.error:
+            pass
+
+    def call(self, func, *args):
+        '''run func(*args) on the hub thread'''
+        self._lock.acquire()
+        try:
+            self._calls.append((func, args))
+        finally:
+            self._lock.release()
+        self.wakeup()
+
+    def connect(self, name, host, port, framing=LINE, receive=None,
+                queuelength=QUEUELENGTH, policy=DROP_OLDEST):
+        '''return a Connection to host:port, connected in the background'''
+        conn = Connection(self, name, host, port, framing, receive, queuelength, policy)
+        self.call(self._add, conn)
+        return conn
+
+    def listen(self, name, host, port, framing=LINE, receive=None,
+               queuelength=QUEUELENGTH, policy=DROP_OLDEST, closed=None):
+        '''return a Listener accepting clients on host:port'''
+        listener = Listener(self, name, host, port, framing, receive, queuelength, policy, closed)
+        self.call(self._add, listener)
+        return listener
+
+    def remove(self, conn):
+        self._lock.acquire()
+        try:
+            conn.closed = True
+        finally:
+            self._lock.release()
+        self.call(self._remove, conn)
+
+    def stop(self):
+        self._running = False
+        self.wakeup()
+        if self.isAlive() and self is not threading.currentThread():
+            self.join()
+
+    def abandon(self):
+        '''close the sockets of the hub in a forked process (where the thread
+        of the hub is not running); they stay open in the parent'''
+        for conn in self._conns:
+            for c in [conn] + getattr(conn, 'clients', {}).values():
+                if c.sock is not None:
+                    c.sock.close()
+                    c.sock = None
+        self._conns = []
+        self._byfd = {}
+        self._waiting = set()
+        self._running = False
+        self._wakeupr.close()
+        self._wakeupw.close()
+        self._poller.close()
+
+    def _add(self, conn):
+        self._conns.append(conn)
+        self._open(conn)
+
+    def _remove(self, conn):
+        self._close(conn)
+        self._waiting.discard(conn)
+        if conn in self._conns:
+            self._conns.remove(conn)
+        if isinstance(conn, Listener):
+            for client in conn.clients.values():
+                self._drop(client, "listener removed")
+
+    def _gauge(self, conn):
+        # (called with the lock held) clients are too many to have gauges
+        if self.stats is not None and conn.listener is None:
+            self.stats.gauge('socket.%s.queued_bytes' % (conn.agent,), conn.queued + len(conn.partial))
+
+    def _open(self, conn):
+        if conn.closed:
+            return
+        if isinstance(conn, Listener):
+            self._listen(conn)
+            return
+        conn.framer.reset()
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(0)
+            err = sock.connect_ex((conn.host, conn.port))
+        except socket.error, e:
+            self._failed(conn, e)
+            return
+        conn.sock = sock
+        self._byfd[sock.fileno()] = conn
+        if err == 0:
+            self._poller.register(sock.fileno(), True, False)
+            self._connected(conn)
+        elif err in _inprogress:
+            conn.connecting = True
+            self._poller.register(sock.fileno(), False, True)
+        else:
+            self._failed(conn, os.strerror(err))
+
+    def _connected(self, conn):
+        conn.connecting = False
+        conn.connected = True
+        conn.backoff = MINBACKOFF
+        conn.failures = 0
+        self.log('info', "connected to %s (%s:%i)", conn.name, conn.host, conn.port)
+        self._update(conn)
+
+    def _listen(self, listener):
+        if listener.sock is not None:
+            # accepting again after running out of descriptors
+            listener.accepting = True
+            self._poller.modify(listener.sock.fileno(), True, False)
+            return
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setblocking(0)
+            sock.bind((listener.host, listener.port))
+            sock.listen(socket.SOMAXCONN)
+        except socket.error, e:
+            self._failed(listener, e)
+            return
+        listener.sock = sock
+        listener.accepting = True
+        listener.backoff = MINBACKOFF
+        listener.failures = 0
+        self._byfd[sock.fileno()] = listener
+        self._poller.register(sock.fileno(), True, False)
+        self.log('info', "listening for %s on %s:%i", listener.name, listener.host or '*', listener.port)
+
+    def _accept(self, listener):
+        '''accept all the pending clients of the listener'''
+        while True:
+            try:
+                sock, addr = listener.sock.accept()
+            except socket.error, e:
+                if e.args[0] in _again or e.args[0] == errno.ECONNABORTED:
+                    return
+                if e.args[0] in _nofiles:
+                    # stop accepting for a while, the pending clients would wake us up at once
+                    self.log('warn', "%s can not accept more clients: %s", listener.name, e)
+                    listener.accepting = False
+                    self._poller.modify(listener.sock.fileno(), False, False)
+                    listener.retry = time.time() + MAXBACKOFF
+                    self._waiting.add(listener)
+                    return
+                raise
+            sock.setblocking(0)
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except socket.error:
+                pass
+            listener.accepted += 1
+            name = "%s%s%i" % (listener.name, CLIENTSEP, listener.accepted)
+            client = Connection(self, name, addr[0], addr[1], listener.framing, listener.receive,
+                                listener.queuelength, listener.policy)
+            client.agent = listener.name
+            client.listener = listener
+            client.sock = sock
+            client.connected = True
+            self._lock.acquire()
+            try:
+                listener.clients[name] = client
+            finally:
+                self._lock.release()
+            self._byfd[sock.fileno()] = client
+            self._poller.register(sock.fileno(), True, False)
+            self.log('debug', "%s connected from %s:%i", name, addr[0], addr[1])
+            if self.stats is not None:
+                self.stats.gauge('socket.%s.clients' % (listener.name,), len(listener.clients))
+
+    def _drop(self, client, reason):
+        '''close an accepted client for good'''
+        self._close(client)
+        listener = client.listener
+        self._lock.acquire()
+        try:
+            client.closed = True
+            listener.clients.pop(client.name, None)
+            n = len(client.queue) + len(client.ends)
+            if n > 0:
+                client.dropped += n
+                if self.stats is not None:
+                    self.stats.count('socket.%s.dropped' % (client.agent,), n)
+                client.queue.clear()
+                client.queued = 0
+                client.partial = ''
+                client.ends = []
+        finally:
+            self._lock.release()
+        self.log('debug', "%s disconnected: %s", client.name, reason)
+        if self.stats is not None:
+            self.stats.gauge('socket.%s.clients' % (listener.name,), len(listener.clients))
+        if listener.onclose is not None:
+            try:
+                listener.onclose(client.name)
+            except:
+                self.log('error', "%s", traceback.format_exc())
+
+    def _close(self, conn):
+        if conn.sock is not None:
+            self._poller.unregister(conn.sock.fileno())
+            self._byfd.pop(conn.sock.fileno(), None)
+            try:
+                conn.sock.close()
+            except socket.error:
+                pass
+            conn.sock = None
+        conn.connected = False
+        conn.connecting = False
+
+    def _failed(self, conn, reason):
+        '''close the connection and try again after the backoff delay'''
+        if getattr(conn, 'listener', None) is not None:
+            self._drop(conn, reason)
+            return
+        self._close(conn)
+        if getattr(conn, 'partial', None):
+            self._lock.acquire()
+            try:
+                conn.partial = ''
+                conn._dropped(len(conn.ends))
+                conn.ends = []
+            finally:
+                self._lock.release()
+        if conn.closed:
+            return
+        if conn.failures == 0 and isinstance(conn, Listener):
+            self.log('warn', "unable to listen for %s on %s:%i: %s", conn.name, conn.host or '*', conn.port, reason)
+        elif conn.failures == 0:
+            self.log('warn', "connection to %s (%s:%i) failed: %s", conn.name, conn.host, conn.port, reason)
+        else:
+            self.log('debug', "connection to %s failed again: %s", conn.name, reason)
+        conn.failures += 1
+        conn.retry = time.time() + conn.backoff
+        self._waiting.add(conn)
+        conn.backoff = min(conn.backoff * 2, MAXBACKOFF)
+
+    def _update(self, conn):
+        '''watch the connection for writing while it has bytes to send'''
+        if conn.sock is not None and conn.connected:
+            self._poller.modify(conn.sock.fileno(), True, conn.pending())
+
+    def _read(self, conn):
+        tracer = self.stats is not None and self.stats.tracer
+        if tracer:
+            t = time.time()
+        try:
+            data = conn.sock.recv(RECVSIZE)
+        except socket.error, e:
+            if e.args[0] in _again:
+                return
+            self._failed(conn, e)
+            return
+        if not data:
+            self._failed(conn, "closed by peer")
+            return
+        try:
+            frames = conn.framer.feed(data)
+        except ValueError, e:
+            self._failed(conn, e)
+            return
+        for frame in frames:
+            try:
+                frame = frame.decode('utf-8')
+            except UnicodeDecodeError:
+                pass
+            if conn.receive is not None:
+                try:
+                    conn.receive(conn.name, frame)
+                except:
+                    self.log('error', "%s", traceback.format_exc())
+        if tracer:
+            # (receiving includes waiting for room in the input queue)
+            tracer.span('socket read', t, cat='io',
+                        args={'agent': conn.name, 'bytes': len(data), 'frames': len(frames)})
+
+    def _write(self, conn):
+        '''write the partial write and queued messages, up to COALESCE bytes'''
+        self._lock.acquire()
+        try:
+            chunks = [conn.partial]
+            n = len(conn.partial)
+            ends = conn.ends
+            queue = conn.queue
+            while queue and n < COALESCE:
+                data = queue.popleft()
+                chunks.append(data)
+                n += len(data)
+                ends.append(n)
+                conn.queued -= len(data)
+            data = ''.join(chunks)
+            conn.partial = data
+        finally:
+            self._lock.release()
+        tracer = self.stats is not None and self.stats.tracer
+        if tracer:
+            t = time.time()
+        try:
+            sent = conn.sock.send(data)
+        except socket.error, e:
+            if e.args[0] not in _again:
+                self._failed(conn, e)
+            return
+        if tracer:
+            tracer.span('socket write', t, cat='io', args={'agent': conn.name, 'bytes': sent})
+        self._lock.acquire()
+        try:
+            conn.partial = data[sent:]
+            ends = conn.ends
+            conn.ends = [end - sent for end in ends[bisect.bisect(ends, sent):]]
+            conn.writes += 1
+            conn.sent += sent
+            self._gauge(conn)
+            if self.stats is not None:
+                self.stats.count('socket.%s.sent_bytes' % (conn.agent,), sent)
+                self.stats.count('socket.%s.writes' % (conn.agent,))
+        finally:
+            self._lock.release()
+        self._update(conn)
+
+    def run(self):
+        try:
+            while self._running:
+                try:
+                    self._step()
+                except:
+                    # (the sockets are served on, after a pause in case the error comes back)
+                    self.log('error', "%s", traceback.format_exc())
+                    if self.stats is not None:
+                        self.stats.count('socket.errors')
+                    time.sleep(MINBACKOFF)
+        finally:
+            for conn in list(self._conns):
+                if isinstance(conn, Listener):
+                    for client in conn.clients.values():
+                        self._close(client)
+                self._close(conn)
+            self._poller.close()
+            self._wakeupr.close()
+            self._wakeupw.close()
+
+    def _step(self):
+        self._lock.acquire()
+        try:
+            calls = self._calls
+            self._calls = []
+            flush = self._flush
+            self._flush = set()
+        finally:
+            self._lock.release()
+        for func, args in calls:
+            try:
+                func(*args)
+            except:
+                self.log('error', "%s", traceback.format_exc())
+        for conn in flush:
+            self._update(conn)
+        now = time.time()
+        timeout = None
+        for conn in [c for c in self._waiting if c.retry <= now]:
+            self._waiting.discard(conn)
+            self._open(conn)
+        for conn in self._waiting:
+            wait = max(conn.retry - now, 0.0)
+            if timeout is None or wait < timeout:
+                timeout = wait
+        try:
+            events = self._poller.poll(timeout)
+        except (IOError, OSError, select.error), e:
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+        for fd, readable, writable in events:
+            if fd == self._wakeupr.fileno():
+                try:
+                    while self._wakeupr.recv(4096):
+                        pass
+                except socket.error:
+                    pass
+                continue
+            conn = self._byfd.get(fd)
+            if conn is None:
+                continue
+            if isinstance(conn, Listener):
+                if readable and conn.accepting:
+                    self._accept(conn)
+                continue
+            if conn.connecting:
+                if writable:
+                    err = conn.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if err == 0:
+                        self._connected(conn)
+                    else:
+                        self._failed(conn, os.strerror(err))
+                continue
+            if readable:
+                self._read(conn)
+            if writable and conn.sock is not None:
+                self._write(conn)
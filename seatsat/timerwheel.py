@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Timer wheel for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+Timers are kept in LEVELS wheels of SLOTS slots: a slot of the first
+wheel holds the timers due in one tick, a slot of the next wheel the
+timers due in SLOTS ticks, and so on. Adding and cancelling a timer is a
+set operation whatever the number of timers; when the first wheel comes
+round, the next slot of the wheel above is spread over it ("cascade").
+Timers further away than the wheels reach wait in the last wheel and are
+put back when they come round too early.
+'''
+
+import math
+
+# seconds per tick of the first wheel
+TICK = 0.01
+
+BITS = 6
+SLOTS = 1 << BITS
+MASK = SLOTS - 1
+LEVELS = 4 # 2^24 ticks, 46 hours with 10 ms ticks
+
+class Timer(object):
+    '''a timer of a TimerWheel (slot is None once fired or cancelled)'''
+
+    __slots__ = ('deadline', 'func', 'args', 'expires', 'slot')
+
+    def __init__(self, deadline, func, args):
+        self.deadline = deadline
+        self.func = func
+        self.args = args
+        self.expires = 0
+        self.slot = None
+
+    def pending(self):
+        return self.slot is not None
+
+class TimerWheel:
+    '''hierarchical timer wheel
+
+    The wheel does not read the clock: add() takes the deadline and
+    expire() the time now, in any unit of seconds (time.time() or the
+    time of a transcript).'''
+
+    def __init__(self, tick=TICK, now=0.0):
+        self.tick = tick
+        self._wheels = [[set() for i in range(SLOTS)] for l in range(LEVELS)]
+        self.clear(now)
+
+    def __len__(self):
+        return self._count
+
+    def clear(self, now=0.0):
+        '''forget all the timers and start at now'''
+        for wheel in self._wheels:
+            for slot in wheel:
+                for timer in slot:
+                    timer.slot = None
+                slot.clear()
+        self._current = int(now / self.tick)
+        self._count = 0
+
+    def add(self, deadline, func, *args):
+        '''return a timer calling func(*args) at deadline'''
+        timer = Timer(deadline, func, args)
+        timer.expires = max(int(math.ceil(deadline / self.tick)), self._current + 1)
+        self._insert(timer)
+        self._count += 1
+        return timer
+
+    def cancel(self, timer):
+        if timer.slot is not None:
+            timer.slot.discard(timer)
+            timer.slot = None
+            self._count -= 1
+
+    def _insert(self, timer):
+        delta = timer.expires - self._current
+        for level in range(LEVELS):
+            if delta < 1 << (BITS * (level + 1)):
+                break
+        else:
+            # beyond the last wheel: wait in its farthest slot
+            timer.expires = self._current + (1 << (BITS * LEVELS)) - 1
+        slot = self._wheels[level][(timer.expires >> (BITS * level)) & MASK]
+        slot.add(timer)
+        timer.slot = slot
+
+    def _cascade(self, level):
+        '''spread the current slot of the wheel over the wheels below'''
+        index = (self._current >> (BITS * level)) & MASK
+        slot = self._wheels[level][index]
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            self._insert(timer)
+        return index
+
+    def expire(self, now):
+        '''remove and return the timers due at now, in order of deadline'''
+        target = int(now / self.tick)
+        due = []
+        if self._count == 0:
+            self._current = max(self._current, target)
+            return due
+        while self._current < target and self._count > len(due):
+            tick = self._next()
+            if tick > target:
+                self._current = target
+                break
+            self._current = tick
+            index = tick & MASK
+            if index == 0:
+                level = 1
+                while level < LEVELS and self._cascade(level) == 0:
+                    level += 1
+            slot = self._wheels[0][index]
+            if slot:
+                for timer in slot:
+                    timer.slot = None
+                due.extend(slot)
+                slot.clear()
+        if self._current < target and self._count == len(due):
+            self._current = target
+        self._count -= len(due)
+        ret = []
+        for timer in due:
+            if timer.deadline > now:
+                # waited in the last wheel, or is due in the tick
+                timer.expires = max(int(math.ceil(timer.deadline / self.tick)), self._current + 1)
+                self._insert(timer)
+                self._count += 1
+            else:
+                ret.append(timer)
+        ret.sort(key=lambda t: t.deadline)
+        return ret
+
+    def _next(self):
+        '''return the next tick which may have due timers or a cascade'''
+        level = 0
+        while level < LEVELS - 1 and not any(self._wheels[level]):
+            level += 1
+        if level > 0:
+            # nothing happens until the wheels below the level come round
+            unit = 1 << (BITS * level)
+            return (self._current // unit + 1) * unit
+        wheel = self._wheels[0]
+        index = self._current & MASK
+        for n in range(1, SLOTS - index):
+            if wheel[index + n]:
+                return self._current + n
+        return self._current + SLOTS - index
+
+    def timeout(self, now):
+        '''return the seconds until a timer may be due (None if there is none)'''
+        if self._count == 0:
+            return None
+        return max(self._next() * self.tick - now, 0.0)
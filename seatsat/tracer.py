@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Trace of the dialog turns for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+Every thread records its spans (what it did from when to when) into a
+ring buffer of its own, so recording takes no lock and a long running
+component keeps the latest spans of each thread only. dump() writes the
+spans as Chrome trace events, which chrome://tracing and Perfetto
+(ui.perfetto.dev) show on a time line per thread.
+'''
+
+import os
+import time
+import json
+import threading
+import collections
+
+# spans kept per thread
+RINGSIZE = 65536
+
+# phases of seatstats which are waits rather than work of the thread
+# (they overlap with the spans of the thread, so they go to async tracks)
+WAITS = frozenset(['queue', 'timer'])
+
+# phases of seatstats which are not one span (the n-best parsing is the
+# n-best loop less the lookups in it, SEAT records the loop instead)
+PARTS = frozenset(['nbest'])
+
+class Tracer:
+    '''spans of the threads in per-thread ring buffers
+
+    The times are time.time() in seconds; the trace events have them in
+    microseconds, so the traces of several processes can be opened
+    together.'''
+
+    def __init__(self, size=RINGSIZE):
+        self.size = size
+        self._local = threading.local()
+        self._rings = [] # (pid, tid, thread name, ring) of the threads
+        self._lock = threading.Lock()
+
+    def _ring(self):
+        thread = threading.currentThread()
+        ring = collections.deque(maxlen=self.size)
+        self._lock.acquire()
+        try:
+            self._rings.append((os.getpid(), thread.ident, thread.getName(), ring))
+        finally:
+            self._lock.release()
+        self._local.ring = ring
+        return ring
+
+    def span(self, name, begin, end=None, cat='seat', args=None):
+        '''record that the current thread did name from begin to end (now if None)'''
+        try:
+            ring = self._local.ring
+        except AttributeError:
+            ring = self._ring()
+        ring.append((name, cat, begin, end or time.time(), args))
+
+    def record(self, phase, sec, end=None):
+        '''record the phase of seatstats which took sec seconds until end (now if None)'''
+        if phase in PARTS:
+            return
+        if end is None:
+            end = time.time()
+        if phase in WAITS:
+            self.span(phase, end - sec, end, 'wait')
+        else:
+            self.span(phase, end - sec, end)
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            for pid, tid, name, ring in self._rings:
+                ring.clear()
+        finally:
+            self._lock.release()
+
+    def events(self):
+        '''return the spans as a list of trace events'''
+        self._lock.acquire()
+        try:
+            rings = list(self._rings)
+        finally:
+            self._lock.release()
+        events = []
+        waits = 0
+        for pid, tid, thread, ring in rings:
+            events.append({'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': tid,
+                           'args': {'name': thread}})
+            # (the copy is made without letting the thread append in between)
+            for name, cat, begin, end, args in list(ring):
+                if cat == 'wait':
+                    waits += 1
+                    events.append({'ph': 'b', 'name': name, 'cat': cat, 'id': waits,
+                                   'pid': pid, 'tid': tid, 'ts': begin * 1e6})
+                    events.append({'ph': 'e', 'name': name, 'cat': cat, 'id': waits,
+                                   'pid': pid, 'tid': tid, 'ts': end * 1e6})
+                    continue
+                event = {'ph': 'X', 'name': name, 'cat': cat, 'pid': pid, 'tid': tid,
+                         'ts': begin * 1e6, 'dur': (end - begin) * 1e6}
+                if args:
+                    event['args'] = args
+                events.append(event)
+        return events
+
+    def dump(self, path):
+        '''write the trace to the file (replaced at once, never half written)'''
+        tmp = path + '.tmp'
+        fp = open(tmp, 'wb')
+        try:
+            # (dumps encodes in C, dump in python)
+            fp.write(json.dumps({'traceEvents': self.events(), 'displayTimeUnit': 'ms'}))
+        finally:
+            fp.close()
+        os.rename(tmp, path)
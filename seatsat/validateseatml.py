@@ -15,6 +15,7 @@ http://www.opensource.org/licenses/eclipse-1.0.txt
 
 import sys
 import os
+import re
 import getopt
 import codecs
 import locale
@@ -102,6 +103,12 @@ def main():
                 if k.text is None:
                     print "[error] line %i: no data in key" % (k.sourceline,)
                     valid = False
+            for k in r.findall('regkey'):
+                try:
+                    re.compile(k.text or '')
+                except re.error, e:
+                    print "[error] line %i: invalid regular expression in regkey (%s)" % (k.sourceline, e)
+                    valid = False
             for c in r.findall('command'):
                 if c.text is None:
                     print "[error] line %i: no data in command" % (c.sourceline,)
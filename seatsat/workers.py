@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Pre-forked worker processes for SEAT (Speech Event Action Transfer)
+
+Copyright (C) 2009-2010
+    Yosuke Matsusaka and Isao Hara
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the Eclipse Public License -v 1.0 (EPL)
+http://www.opensource.org/licenses/eclipse-1.0.txt
+
+The component loads and compiles the scripts once and then forks the
+workers, which share the compiled rules copy on write and run the
+dialogs of the sessions routed to them by consistent hashing of the
+session id. The component itself only routes the inputs to the workers
+and sends the outputs of the workers to its ports and sockets.
+'''
+
+import os
+import stat
+import struct
+import socket
+import bisect
+import hashlib
+import threading
+import traceback
+import cPickle
+
+# points per worker on the hash ring
+REPLICAS = 100
+
+# descriptors looked at by closeinherited() where /proc/self/fd is missing
+MAXFD = 65536
+
+_header = struct.Struct('!I')
+
+def _hash(key):
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+    return _header.unpack(hashlib.md5(str(key)).digest()[:4])[0]
+
+class HashRing:
+    '''consistent hashing of keys to nodes
+
+    Every node owns REPLICAS points of the ring and a key goes to the node
+    owning the next point after the hash of the key, so keys spread evenly
+    and adding or removing a node only moves the keys of that node.'''
+
+    def __init__(self, nodes, replicas=REPLICAS):
+        ring = []
+        for n in nodes:
+            for i in range(replicas):
+                ring.append((_hash("%s#%i" % (n, i)), n))
+        ring.sort()
+        self._points = [p for p, n in ring]
+        self._nodes = [n for p, n in ring]
+
+    def node(self, key):
+        i = bisect.bisect(self._points, _hash(key or ''))
+        return self._nodes[i % len(self._nodes)]
+
+def sendmsg(sock, obj):
+    data = cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+    sock.sendall(_header.pack(len(data)) + data)
+
+def _recvall(sock, n):
+    buf = []
+    while n > 0:
+        data = sock.recv(n)
+        if not data:
+            return None
+        buf.append(data)
+        n -= len(data)
+    return ''.join(buf)
+
+def recvmsg(sock):
+    '''return the next message, None at the end of the stream'''
+    header = _recvall(sock, _header.size)
+    if header is None:
+        return None
+    data = _recvall(sock, _header.unpack(header)[0])
+    if data is None:
+        return None
+    return cPickle.loads(data)
+
+def closeinherited(keep=()):
+    '''close the sockets and pipes inherited from the parent (those of the
+    ORB among others) but the descriptors to keep; files stay open'''
+    try:
+        fds = [int(fd) for fd in os.listdir('/proc/self/fd')]
+    except OSError:
+        try:
+            fds = range(os.sysconf('SC_OPEN_MAX'))
+        except (ValueError, OSError):
+            fds = range(MAXFD)
+        fds = fds[:MAXFD]
+    for fd in fds:
+        if fd <= 2 or fd in keep:
+            continue
+        try:
+            mode = os.fstat(fd).st_mode
+            if stat.S_ISSOCK(mode) or stat.S_ISFIFO(mode):
+                os.close(fd)
+        except OSError:
+            pass
+
+def serve(comp, sock, index, ring):
+    '''run the inputs sent by the component (in worker process #index)'''
+    lock = threading.Lock()
+    def deliver(host, data):
+        lock.acquire()
+        try:
+            sendmsg(sock, (host, data))
+        finally:
+            lock.release()
+    comp.becomeWorker(index, deliver, lambda sid: ring.node(sid) == index, [sock.fileno()])
+    handlers = {'r': comp.processResult, 's': comp.processString, 'n': comp.processNonString,
+                'v': comp.processSequence}
+    while True:
+        msg = recvmsg(sock)
+        if msg is None:
+            break
+        kind, host, data = msg
+        # the dialogs run on the dialog thread of the worker (with the timers)
+        try:
+            if kind == 'l':
+                comp.reloadSEATML(data)
+            elif kind == 'd':
+                comp._loop.control(comp.dropSession, host)
+            else:
+                comp._loop.control(handlers[kind], host, data)
+        except:
+            comp._logger.RTC_ERROR(traceback.format_exc())
+    comp._loop.stop()
+    comp.writeTrace()
+
+class WorkerPool:
+    '''worker processes forked from a component
+
+    submit() sends an input to the worker of its session and
+    output(host, data) is called (on a reader thread per worker) for every
+    output of the workers. The locks are held across every fork, so that
+    none of them is copied into a worker held by a thread which is not
+    there (give the locks of the threads of the component, in the order
+    they nest).'''
+
+    def __init__(self, comp, nworkers, output, logger=None, locks=()):
+        self._output = output
+        self._logger = logger
+        self._workers = []
+        self._locks = []
+        self._threads = []
+        self._terminating = False
+        self._ring = HashRing(range(nworkers))
+        for i in range(nworkers):
+            parent, child = socket.socketpair()
+            pid = self._fork(locks)
+            if pid == 0:
+                try:
+                    parent.close()
+                    for p, s in self._workers:
+                        s.close()
+                    serve(comp, child, i, self._ring)
+                except:
+                    traceback.print_exc()
+                os._exit(0)
+            child.close()
+            self._workers.append((pid, parent))
+            self._locks.append(threading.Lock())
+        for i, (pid, sock) in enumerate(self._workers):
+            t = threading.Thread(target=self._read, args=(i, sock), name="worker%i" % (i,))
+            t.setDaemon(True)
+            t.start()
+            self._threads.append(t)
+
+    def _fork(self, locks):
+        for lock in locks:
+            lock.acquire()
+        try:
+            return os.fork()
+        finally:
+            # (in the parent and in the child)
+            for lock in reversed(locks):
+                lock.release()
+
+    def __len__(self):
+        return len(self._workers)
+
+    def worker(self, sid):
+        return self._ring.node(sid)
+
+    def submit(self, sid, kind, host, data):
+        '''send an input to the worker of the session (from any thread)
+
+        The kinds are 'r' for processResult, 's' for processString, 'n'
+        for processNonString, 'v' for processSequence and 'd' to drop the
+        session.'''
+        i = self._ring.node(sid)
+        return self._send(i, (kind, host, data))
+
+    def broadcast(self, kind, data):
+        '''send a message to every worker ('l' to reload the scripts data)'''
+        for i in range(len(self._workers)):
+            self._send(i, (kind, None, data))
+
+    def _send(self, i, msg):
+        lock = self._locks[i]
+        lock.acquire()
+        try:
+            sendmsg(self._workers[i][1], msg)
+        except socket.error:
+            if self._logger is not None:
+                self._logger.RTC_ERROR("unable to send to worker %i" % (i,))
+            return False
+        finally:
+            lock.release()
+        return True
+
+    def terminate(self):
+        self._terminating = True
+        for pid, sock in self._workers:
+            try:
+                sock.shutdown(socket.SHUT_WR)
+            except socket.error:
+                pass
+        for t in self._threads:
+            t.join()
+        for pid, sock in self._workers:
+            sock.close()
+            try:
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        self._workers = []
+        self._threads = []
+
+    def _read(self, i, sock):
+        while True:
+            try:
+                msg = recvmsg(sock)
+            except socket.error:
+                msg = None
+            if msg is None:
+                if not self._terminating and self._logger is not None:
+                    self._logger.RTC_ERROR("worker %i exited" % (i,))
+                return
+            try:
+                self._output(*msg)
+            except:
+                if self._logger is not None:
+                    self._logger.RTC_ERROR(traceback.format_exc())
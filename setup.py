@@ -38,6 +38,8 @@ if sys.platform == "win32":
                     "seatsat/validateseatml.py",
                     "seatsat/seatmltographviz.py",
                     "seatsat/seatmltosrgs.py",
+                    "seatsat/seatreplay.py",
+                    "seatsat/seatmlc.py",
                     "seatsat/seateditor.py",
                     "seatsat/SoarRTC.py"
                     ],
@@ -76,6 +78,8 @@ setup(name='seatsat',
       seateditor = seatsat.seateditor:main
       seatmltographviz = seatsat.seatmltographviz:main
       seatmltosrgs = seatsat.seatmltosrgs:main
+      seatreplay = seatsat.seatreplay:main
+      seatmlc = seatsat.seatmlc:main
       soarrtc = seatsat.SoarRTC:main
       """,
       **extra
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the recovery of the checkpoint file after a crash
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.checkpoint import Checkpoint, readrecords
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'seat.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self):
+        '''write some records and leave the file as a crash would'''
+        ckpt = Checkpoint(self.path, 4096)
+        ckpt.open()
+        ckpt.session(u'a', 'start', None)
+        ckpt.session(u'b', 'talking', ['start'])
+        ckpt.update({'count': 1})
+        ckpt.session(u'a', 'talking', None)
+        ckpt.drop(u'b')
+        pos = len(ckpt)
+        ckpt.session(u'c', 'bye', None) # the record to tear
+        end = len(ckpt)
+        ckpt.close()
+        return pos, end
+
+    def patch(self, pos, data):
+        fp = open(self.path, 'r+b')
+        try:
+            fp.seek(pos)
+            fp.write(data)
+        finally:
+            fp.close()
+
+    def restore(self):
+        return Checkpoint(self.path, 4096).open()
+
+    def test_intact(self):
+        self.write()
+        sessions, variables = self.restore()
+        self.assertEqual(sessions, {u'a': ('talking', None), u'c': ('bye', None)})
+        self.assertEqual(variables, {'count': 1})
+
+    def test_record_without_header(self):
+        pos, end = self.write()
+        # (the record is written before its header, a crash in between leaves zeros)
+        self.patch(pos, '\0' * 8)
+        sessions, variables = self.restore()
+        self.assertEqual(sessions, {u'a': ('talking', None)})
+        self.assertEqual(variables, {'count': 1})
+
+    def test_torn_record(self):
+        pos, end = self.write()
+        self.patch(end - 2, '\0\0')
+        self.assertEqual(self.restore()[0], {u'a': ('talking', None)})
+
+    def test_truncated_file(self):
+        pos, end = self.write()
+        fp = open(self.path, 'r+b')
+        fp.truncate(end - 3)
+        fp.close()
+        self.assertEqual(self.restore()[0], {u'a': ('talking', None)})
+
+    def test_bad_length(self):
+        pos, end = self.write()
+        self.patch(pos, '\xff\xff\xff\x7f')
+        self.assertEqual(self.restore()[0], {u'a': ('talking', None)})
+
+    def test_compacted_after_restore(self):
+        pos, end = self.write()
+        self.patch(pos, '\0' * 8)
+        self.restore()
+        # (the records after the torn one are gone, a new run appends after the snapshot)
+        records = list(readrecords(self.path))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0][0], 'S')
+        self.assertEqual(records[0][1], {u'a': ('talking', None)})
+
+    def test_not_a_checkpoint(self):
+        fp = open(self.path, 'wb')
+        fp.write('garbage')
+        fp.close()
+        self.assertEqual(self.restore(), ({}, {}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the queue policies of the dialog thread
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.dialogloop import DialogLoop, BLOCK, DROP_OLDEST, DROP_NEWEST
+
+class DialogLoopTest(unittest.TestCase):
+
+    def setUp(self):
+        self.done = []
+        self.gate = threading.Event()
+        self.busy = threading.Event()
+
+    def tearDown(self):
+        self.gate.set()
+        self.loop.stop()
+
+    def start(self, maxlen, policy):
+        '''start a loop whose thread is kept busy until the gate opens'''
+        self.loop = DialogLoop(maxlen, policy)
+        self.loop.start()
+        def hold():
+            self.busy.set()
+            self.gate.wait()
+        self.loop.post(hold)
+        self.busy.wait()
+
+    def finish(self):
+        self.gate.set()
+        self.loop.stop()
+        return self.done
+
+    def test_drop_newest(self):
+        self.start(3, DROP_NEWEST)
+        results = [self.loop.post(self.done.append, i) for i in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(self.finish(), [0, 1, 2])
+        self.assertEqual(self.loop.dropped, 2)
+
+    def test_drop_oldest(self):
+        self.start(3, DROP_OLDEST)
+        results = [self.loop.post(self.done.append, i) for i in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(self.finish(), [2, 3, 4])
+        self.assertEqual(self.loop.dropped, 2)
+
+    def test_block(self):
+        self.start(2, BLOCK)
+        for i in range(2):
+            self.assertTrue(self.loop.post(self.done.append, i))
+        poster = threading.Thread(target=self.loop.post, args=(self.done.append, 2))
+        poster.start()
+        poster.join(0.2)
+        self.assertTrue(poster.isAlive()) # waiting for room in the queue
+        self.gate.set()
+        poster.join(5.0)
+        self.assertFalse(poster.isAlive())
+        self.assertEqual(self.finish(), [0, 1, 2])
+        self.assertEqual(self.loop.dropped, 0)
+
+    def test_control_ignores_limit(self):
+        self.start(1, DROP_NEWEST)
+        self.assertTrue(self.loop.post(self.done.append, 0))
+        self.assertFalse(self.loop.post(self.done.append, 1))
+        self.loop.control(self.done.append, 2)
+        self.assertEqual(self.finish(), [0, 2])
+
+    def test_unbounded(self):
+        self.start(0, DROP_NEWEST)
+        for i in range(1000):
+            self.assertTrue(self.loop.post(self.done.append, i))
+        self.assertEqual(self.finish(), range(1000))
+
+    def test_not_running(self):
+        self.loop = DialogLoop(1, DROP_NEWEST)
+        for i in range(3):
+            self.assertTrue(self.loop.post(self.done.append, i))
+        self.assertEqual(self.done, [0, 1, 2]) # run by the caller
+
+if __name__ == '__main__':
+    unittest.main()
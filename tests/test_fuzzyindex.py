@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the approximate key matching against a scan over all the keys
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import random
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.fuzzyindex import FuzzyIndex, deletions, editdistance, MAXDIST
+from seatsat.ruleindex import RuleIndex
+
+def levenshtein(a, b):
+    '''the textbook distance, without the cut off'''
+    prev = range(len(b) + 1)
+    for i in range(1, len(a) + 1):
+        cur = [i]
+        for j in range(1, len(b) + 1):
+            cur.append(min(prev[j] + 1, cur[j-1] + 1, prev[j-1] + (a[i-1] != b[j-1])))
+        prev = cur
+    return prev[-1]
+
+def randomword(rand, alphabet=u'abc', maxlen=6):
+    return u''.join([rand.choice(alphabet) for i in range(rand.randint(0, maxlen))])
+
+class FuzzyIndexTest(unittest.TestCase):
+
+    def test_deletions(self):
+        self.assertEqual(deletions(u'abc', 0), set([u'abc']))
+        self.assertEqual(deletions(u'abc', 1), set([u'abc', u'bc', u'ac', u'ab']))
+        self.assertEqual(len(deletions(u'abc', 3)), 8)
+
+    def test_editdistance(self):
+        rand = random.Random(4)
+        for trial in range(2000):
+            a = randomword(rand)
+            b = randomword(rand)
+            d = levenshtein(a, b)
+            for maxdist in range(4):
+                self.assertEqual(editdistance(a, b, maxdist), min(d, maxdist + 1), (a, b, maxdist))
+
+    def test_same_as_scan(self):
+        rand = random.Random(5)
+        for trial in range(50):
+            index = FuzzyIndex()
+            keys = []
+            for seq in range(rand.randint(1, 20)):
+                key = randomword(rand)
+                maxdist = rand.randint(1, MAXDIST)
+                index.add(key, maxdist, seq, key)
+                keys.append((key, maxdist, seq))
+            for i in range(50):
+                s = randomword(rand)
+                best = None
+                for key, maxdist, seq in keys:
+                    d = levenshtein(s, key)
+                    if d <= maxdist and (best is None or d < best[0] or (d == best[0] and seq > best[1])):
+                        best = (d, seq, key)
+                self.assertEqual(index.match(s), best, s)
+
+    def test_thresholds(self):
+        index = FuzzyIndex()
+        index.add(u'hello', 0, 1, 'exact only')
+        self.assertEqual(len(index), 0)
+        index.add(u'goodbye', 10, 2, 'capped')
+        self.assertEqual(index.match(u'good'), (MAXDIST, 2, 'capped'))
+        self.assertEqual(index.match(u'goo'), None)
+
+class FuzzyRuleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = RuleIndex()
+        self.index.register('start', None, u'hello', 'hello', fuzzy=2)
+        self.index.register('start', None, u'help', 'help')
+        self.index.register('start', None, u'good (morning|evening)', 'greeting', fuzzy=1)
+        self.index.register('all', None, u'goodbye', 'goodbye', fuzzy=1)
+
+    def test_exact_first(self):
+        # (help is within the distance of hello but matches exactly)
+        self.assertEqual(self.index.match('start', None, u'help'), ('help', 0))
+        self.assertEqual(self.index.match('start', None, u'hello'), ('hello', 0))
+
+    def test_nearest(self):
+        self.assertEqual(self.index.match('start', None, u'helo'), ('hello', 1))
+        self.assertEqual(self.index.match('start', None, u'yellow'), ('hello', 2))
+        self.assertEqual(self.index.match('start', None, u'good evenin'), ('greeting', 1))
+        self.assertEqual(self.index.match('talking', None, u'godbye'), ('goodbye', 1))
+        self.assertEqual(self.index.match('start', None, u'hexxo!'), (None, 0))
+        # (help has no distance, only the keys given one match approximately)
+        self.assertEqual(self.index.match('start', None, u'hemp'), (None, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the key automaton against the key expansion of SEAT before it
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import random
+import itertools
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.keypattern import parse, variants, KeyAutomaton
+
+def decompstring(strs):
+    '''SEAT.decompString before the automaton: expand the keys into strings'''
+    ret = []
+    nstrs = strs
+    while len(nstrs) > 0:
+        nstrs2 = []
+        for s in nstrs:
+            if s.count('(') > 0 or s.count('[') > 0:
+                nstrs2.extend(decompstringsub(s))
+            else:
+                ret.append(s)
+        nstrs = nstrs2
+    return ret
+
+def decompstringsub(s):
+    ret = []
+    if s.count('(') > 0:
+        i = s.index('(')
+        prestr = s[:i]
+        substrs = []
+        substr = ''
+        level = 0
+        i += 1
+        while i < len(s):
+            if s[i] == '(':
+                level += 1
+                substr += s[i]
+            elif s[i] == ')':
+                if level == 0:
+                    substrs.append(substr)
+                    break
+                else:
+                    substr += s[i]
+                level -= 1
+            elif s[i] == '|':
+                if level == 0:
+                    substrs.append(substr)
+                    substr = ''
+                else:
+                    substr += s[i]
+            else:
+                substr += s[i]
+            i += 1
+        poststr = s[i+1:]
+        for sub in substrs:
+            ret.append(prestr + sub + poststr)
+    else:
+        i = s.index('[')
+        prestr = s[:i]
+        substr = ''
+        level = 0
+        i += 1
+        while i < len(s):
+            if s[i] == '[':
+                level += 1
+            elif s[i] == ']':
+                if level == 0:
+                    break
+                level -= 1
+            substr += s[i]
+            i += 1
+        poststr = s[i+1:]
+        ret.append(prestr + poststr)
+        ret.append(prestr + substr + poststr)
+    return ret
+
+def randomkey(rand, depth=0):
+    '''a random key with nested alternatives and optional parts'''
+    ret = []
+    for i in range(rand.randint(1, 3)):
+        r = rand.random()
+        if r < 0.5 or depth >= 2:
+            ret.append(rand.choice(u'ab'))
+        elif r < 0.8:
+            ret.append(u'(' + u'|'.join([randomkey(rand, depth + 1)
+                                         for j in range(rand.randint(2, 3))]) + u')')
+        else:
+            ret.append(u'[' + randomkey(rand, depth + 1) + u']')
+    return u''.join(ret)
+
+def inputs(maxlen=6):
+    yield u''
+    for n in range(1, maxlen + 1):
+        for chars in itertools.product(u'ab', repeat=n):
+            yield u''.join(chars)
+
+class KeyAutomatonTest(unittest.TestCase):
+
+    def test_variants(self):
+        rand = random.Random(4)
+        for i in range(500):
+            key = randomkey(rand)
+            self.assertEqual(sorted(set(variants(parse(key)))), sorted(set(decompstring([key]))), key)
+
+    def test_same_as_expanded_keys(self):
+        rand = random.Random(5)
+        for trial in range(50):
+            automaton = KeyAutomaton()
+            table = {}
+            for seq in range(1, rand.randint(2, 20)):
+                key = randomkey(rand)
+                automaton.add(parse(key), key, seq)
+                # (a later key takes the strings of an earlier one over)
+                for w in decompstring([key]):
+                    table[w] = (seq, key)
+            for s in inputs():
+                self.assertEqual(automaton.match(s), table.get(s), s)
+
+    def test_japanese(self):
+        automaton = KeyAutomaton()
+        key = u'(こんにちは|こんばんは)[ロボット]'
+        automaton.add(parse(key), 'greet', 1)
+        for w in decompstring([key]):
+            self.assertEqual(automaton.match(w), (1, 'greet'))
+        self.assertEqual(automaton.match(u'こんに'), None)
+        self.assertEqual(automaton.match(u'ロボット'), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the N-best result parser against the BeautifulSoup parsing of SEAT
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import unittest
+import warnings
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.nbest import iternbest
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore')
+    from BeautifulSoup import BeautifulSoup
+
+def oldnbest(s, minscore):
+    '''the hypotheses as SEAT parsed them before iternbest'''
+    ret = []
+    for e in BeautifulSoup(s).findAll('data'):
+        rank = int(e['rank'])
+        score = float(e['score'])
+        if score < minscore:
+            break
+        ret.append((rank, score, e['text']))
+    return ret
+
+def result(hypotheses, root=True):
+    data = u''.join([u'<data rank="%i" score="%s" text="%s"/>' % (i + 1, score, text)
+                     for i, (score, text) in enumerate(hypotheses)])
+    if root:
+        data = u'<results>%s</results>' % (data,)
+    return u'<?xml version="1.0" encoding="UTF-8"?>' + data
+
+RESULTS = [
+    result([(0.9, u'hello'), (0.5, u'yellow'), (0.1, u'mellow')]),
+    result([(0.9, u'こんにちは'), (0.8, u'こんばんは')]),
+    result([(0.9, u'rock & roll'), (0.5, u'rock and roll')]),
+    result([(0.9, u'a'), (0.5, u'b'), (0.4, u'c')], root=False),
+    result([(0.9, u'word%i' % (i,)) for i in range(500)]),
+    result([]),
+]
+
+class NbestTest(unittest.TestCase):
+    def test_same_as_beautifulsoup(self):
+        for s in RESULTS:
+            for minscore in (0.0, 0.45):
+                for chunksize in (7, 2048):
+                    self.assertEqual(list(iternbest(s, minscore, chunksize)), oldnbest(s, minscore))
+
+    def test_unicode_text(self):
+        for s in RESULTS:
+            for rank, score, text in iternbest(s):
+                self.assertTrue(isinstance(text, unicode))
+
+    def test_stops_below_minscore(self):
+        self.assertEqual([t for r, s, t in iternbest(RESULTS[0], 0.45)], [u'hello', u'yellow'])
+
+if __name__ == '__main__':
+    unittest.main()
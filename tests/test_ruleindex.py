@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the rule index and the regkey matcher against the lookups of SEAT before them
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import re
+import random
+import itertools
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.ruleindex import RuleIndex, RegexMatcher, MAXGROUPS
+from seatsat.keypattern import parse, variants
+
+STATES = ['start', 'talking', 'all']
+SOURCES = [None, 'speechin', 'keyboard']
+ALPHABET = u'ab'
+
+class OldKeyTable:
+    '''the key table of SEAT before RuleIndex: a dictionary of the expanded
+    keys by state and source, looked up in four steps'''
+
+    def __init__(self):
+        self.keys = {}
+
+    def register(self, state, source, key, commands):
+        for w in variants(parse(key)):
+            self.keys[(state, source or 'default', w)] = commands
+
+    def lookup(self, state, source, s):
+        for k in ((state, source), (state, 'default'), ('all', source), ('all', 'default')):
+            try:
+                return self.keys[k + (s,)]
+            except KeyError:
+                pass
+        return None
+
+def randomkey(rand):
+    if rand.random() < 0.7:
+        return u''.join([rand.choice(ALPHABET) for i in range(rand.randint(1, 3))])
+    return rand.choice([u'a(a|b)', u'[a]b', u'(a|b)[b]', u'b[a]a', u'(a|ab)[a]'])
+
+# patterns the combined alternation has to get right (captures, back
+# references, flags, classes with brackets, prefixes of each other)
+PATTERNS = [r'ab', r'a', r'(a)(b)\2', r'(?i)AB', r'a(?P<x>b)(?P=x)', r'[]a]b', r'[^a]+',
+            r'(ab|a)b', r'a|b', r'a*', r'b{2,3}', r'a\b', r'\d+', r'(?:a|b)c?$',
+            r'colou?r', r'a.b', r'\(a\)', r'\x61b', r'(a|ab)(c|bcd)', r'(ab|a)bc', r'(ab|a)c', r'']
+
+def randompattern(rand):
+    atoms = [u'a', u'b', u'c', u'.', u'[ab]', u'[^b]', u'(a|b)', u'(ab|a)', u'(?:c|ca)', u'\\.']
+    ret = []
+    for i in range(rand.randint(1, 4)):
+        ret.append(rand.choice(atoms) + rand.choice([u'', u'', u'*', u'+', u'?', u'{1,2}', u'*?']))
+    if rand.random() < 0.2:
+        ret.append(u'$')
+    return u''.join(ret)
+
+def firstmatch(patterns, s):
+    '''the regkeys as SEAT matched them before RegexMatcher, one by one'''
+    for i, p in enumerate(patterns):
+        if re.match(p, s):
+            return i
+    return None
+
+def inputs(maxlen=4, alphabet=ALPHABET):
+    for n in range(1, maxlen + 1):
+        for chars in itertools.product(alphabet, repeat=n):
+            yield u''.join(chars)
+
+class RuleIndexTest(unittest.TestCase):
+
+    def test_fallback_order(self):
+        index = RuleIndex()
+        index.register('all', None, u'hello', 'all:default')
+        index.register('all', 'speechin', u'hello', 'all:speechin')
+        index.register('start', None, u'hello', 'start:default')
+        index.register('start', 'speechin', u'hello', 'start:speechin')
+        self.assertEqual(index.lookup('start', 'speechin', u'hello'), 'start:speechin')
+        self.assertEqual(index.lookup('start', 'keyboard', u'hello'), 'start:default')
+        self.assertEqual(index.lookup('talking', 'speechin', u'hello'), 'all:speechin')
+        self.assertEqual(index.lookup('talking', 'keyboard', u'hello'), 'all:default')
+        self.assertEqual(index.lookup('start', 'speechin', u'bye'), None)
+
+    def test_later_registration_wins(self):
+        index = RuleIndex()
+        index.register('start', None, u'(hello|hi)', 'first')
+        index.register('start', None, u'hello', 'second')
+        index.register('start', None, u'h[e]i', 'third')
+        self.assertEqual(index.lookup('start', None, u'hello'), 'second')
+        self.assertEqual(index.lookup('start', None, u'hi'), 'third')
+        self.assertEqual(index.lookup('start', None, u'hei'), 'third')
+
+    def test_same_as_old_table(self):
+        rand = random.Random(1)
+        for trial in range(20):
+            index = RuleIndex()
+            old = OldKeyTable()
+            for i in range(rand.randint(1, 60)):
+                state = rand.choice(STATES)
+                source = rand.choice(SOURCES)
+                key = randomkey(rand)
+                index.register(state, source, key, i)
+                old.register(state, source, key, i)
+            for state in STATES + ['unknown']:
+                for source in SOURCES[1:] + ['unknown']:
+                    for s in inputs():
+                        self.assertEqual(index.lookup(state, source, s), old.lookup(state, source, s),
+                                         (state, source, s))
+
+class RegexMatcherTest(unittest.TestCase):
+
+    def check(self, patterns, strings):
+        matcher = RegexMatcher([(p, i) for i, p in enumerate(patterns)])
+        for s in strings:
+            self.assertEqual(matcher.match(s), firstmatch(patterns, s), s)
+
+    def test_special_patterns(self):
+        strings = list(inputs(4, u'abcd(r')) + [u'color', u'colour', u'AB', u'(a)', u'12', u'']
+        for i in range(len(PATTERNS)):
+            # (every pattern first, as the first pattern matching wins)
+            self.check(PATTERNS[i:] + PATTERNS[:i], strings)
+
+    def test_same_as_sequential_match(self):
+        rand = random.Random(2)
+        strings = list(inputs(4, u'abc.'))
+        for trial in range(20):
+            self.check([randompattern(rand) for i in range(rand.randint(1, 20))], strings)
+
+    def test_more_patterns_than_groups(self):
+        rand = random.Random(3)
+        patterns = [randompattern(rand) + u'$' for i in range(2 * MAXGROUPS + 10)]
+        self.check(patterns, inputs(4, u'abc.'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,504 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the SEAT component on the local OpenRTM stand-in
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import shutil
+import time
+import json
+import tempfile
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat import rtcstandin
+rtcstandin.install()
+from seatsat import SEAT as seatmodule
+from seatsat.checkpoint import Checkpoint
+import RTC
+
+SEATML = u'''<?xml version="1.0" encoding="UTF-8"?>
+<seatml>
+  <general name="test">
+    <agent name="in" type="rtcin" datatype="TimedString"/>
+    <agent name="out" type="rtcout" datatype="TimedString"/>%s
+  </general>
+%s
+</seatml>
+'''
+
+class SEATTestCase(unittest.TestCase):
+    '''a component per test, fed on the thread of the test'''
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.comps = []
+
+    def tearDown(self):
+        for comp in self.comps:
+            comp.onFinalize()
+            if comp._checkpoint is not None:
+                comp._checkpoint.close()
+        shutil.rmtree(self.dir)
+
+    def newseat(self, states, agents=u'', **params):
+        path = os.path.join(self.dir, 'test.seatml')
+        fp = open(path, 'wb')
+        try:
+            fp.write((SEATML % (agents, states)).encode('utf-8'))
+        finally:
+            fp.close()
+        comp = seatmodule.SEAT(rtcstandin.Manager.instance())
+        comp.onInitialize()
+        comp._loop.stop()
+        self.comps.append(comp)
+        comp.setParameter('loglevel', 'ERROR')
+        for name, value in sorted(params.items()):
+            comp.setParameter(name, value)
+        self.assertEqual(comp.loadSEATML([path]), 0)
+        return comp
+
+class VariablesTest(SEATTestCase):
+
+    STATES = u'''
+  <state name="start">
+    <rule><key>define</key><script>def add(x):
+    names.append(x)
+names = []
+count = 0</script></rule>
+    <rule><key>count</key><script>count = count + 1</script></rule>
+    <rule><key>add</key><script>add(rtc_in_data)</script></rule>
+    <rule><key>forget</key><script>del count</script></rule>
+    <rule><key>all</key><script>globals()['other'] = 2</script></rule>
+  </state>
+'''
+
+    def setUp(self):
+        SEATTestCase.setUp(self)
+        self.checkpoint = os.path.join(self.dir, 'test.checkpoint')
+        self.comp = self.newseat(self.STATES, checkpoint=self.checkpoint)
+        self.comp.processResult('in', u'define')
+        self.updates = []
+        update = self.comp._checkpoint.update
+        def record(variables, deleted=()):
+            self.updates.append((sorted(variables), sorted(deleted)))
+            update(variables, deleted)
+        self.comp._checkpoint.update = record
+
+    def restored(self):
+        self.comp._checkpoint.flush()
+        return self.newseat(self.STATES, checkpoint=self.checkpoint)._scriptns
+
+    def test_only_the_variables_of_the_script(self):
+        self.comp._scriptns['other'] = 1
+        self.comp.processResult('in', u'count')
+        self.comp.processResult('in', u'count')
+        self.assertEqual(self.updates, [(['count'], []), (['count'], [])])
+        ns = self.restored()
+        self.assertEqual(ns['count'], 2)
+        self.assertFalse('other' in ns)
+
+    def test_changed_by_a_function(self):
+        self.comp.processResult('in', u'add')
+        self.assertEqual(self.updates, [(['names'], [])])
+        self.assertEqual(self.restored()['names'], [u'add'])
+
+    def test_unchanged(self):
+        # (the same values again, and a function which is not saved)
+        self.comp.processResult('in', u'define')
+        self.assertEqual(self.updates, [])
+
+    def test_deleted(self):
+        self.comp.processResult('in', u'forget')
+        self.assertEqual(self.updates, [([], ['count'])])
+        self.assertFalse('count' in self.restored())
+
+    def test_dynamic_names(self):
+        self.comp.processResult('in', u'all')
+        self.assertEqual(self.updates, [(['other'], [])])
+        self.assertEqual(self.restored()['other'], 2)
+
+class SessionsTest(SEATTestCase):
+
+    STATES = u'''
+  <state name="start">
+    <onentry><command host="out">entered start</command></onentry>
+    <onexit><command host="out">left start</command></onexit>
+    <rule><key>go</key><command host="out">going</command><statetransition>talking</statetransition></rule>
+  </state>
+  <state name="talking">
+    <onentry><command host="out">entered talking</command></onentry>
+    <timeout seconds="60"><command host="out">timed out</command></timeout>
+    <rule><key>back</key><statetransition>start</statetransition></rule>
+  </state>
+'''
+
+    def setUp(self):
+        SEATTestCase.setUp(self)
+        self.checkpoint = os.path.join(self.dir, 'test.checkpoint')
+        self.comp = self.newseat(self.STATES, session_key='field', session_timeout='10',
+                                 checkpoint=self.checkpoint)
+        self.outputs = []
+        self.comp.deliver = lambda host, data: self.outputs.append(data)
+
+    def saved(self):
+        self.comp._checkpoint.flush()
+        # (a copy, opening the file would compact it)
+        path = os.path.join(self.dir, 'copy.checkpoint')
+        shutil.copy(self.checkpoint, path)
+        return Checkpoint(path).open()[0]
+
+    def test_new_session(self):
+        self.comp.processResult('in', u'@a hello')
+        # (no actions of a transition, the new session is in the start state)
+        self.assertEqual(self.outputs, [])
+        self.assertEqual(self.comp.sessions.peek(u'a').state, 'start')
+        self.assertEqual(self.saved()[u'a'], ('start', None))
+        self.comp.processResult('in', u'@a go')
+        self.assertEqual(self.outputs, [u'@a going', u'@a left start', u'@a entered talking'])
+
+    def test_expired_session(self):
+        self.comp.processResult('in', u'@a go')
+        session = self.comp.sessions.peek(u'a')
+        timers = list(session.timers)
+        self.assertEqual([t.pending() for t in timers], [True])
+        session.last -= 11
+        self.comp.processResult('in', u'@b hello')
+        self.comp.processResult('in', u'@a hello')
+        # (the timeout of the expired session is cancelled, a new session starts)
+        self.assertEqual([t.pending() for t in timers], [False])
+        self.assertEqual(session.timers, None)
+        self.assertFalse(self.comp.sessions.peek(u'a') is session)
+        self.assertEqual(self.comp.sessions.peek(u'a').state, 'start')
+        self.assertEqual(self.saved()[u'a'], ('start', None))
+
+    def test_expired_before_the_timer(self):
+        self.comp.processResult('in', u'@a go')
+        session = self.comp.sessions.peek(u'a')
+        session.last -= 11
+        self.outputs = []
+        for timer in self.comp._loop.expire(time.time() + 61):
+            timer.func(*timer.args)
+        self.assertEqual(self.outputs, [])
+        self.assertEqual(self.comp.sessions.peek(u'a'), None)
+        self.assertFalse(u'a' in self.saved())
+
+    def test_evicted(self):
+        self.comp.processResult('in', u'@a go')
+        self.comp.processResult('in', u'@b go')
+        session = self.comp.sessions.peek(u'a')
+        timers = list(session.timers)
+        session.last -= 11
+        self.comp.evictSessions()
+        self.assertEqual([t.pending() for t in timers], [False])
+        self.assertEqual(sorted(self.saved()), [None, u'b'])
+
+class TimersTest(SEATTestCase):
+
+    STATES = u'''
+  <state name="start">
+    <rule><key>go</key><command host="out">going</command><statetransition>talking</statetransition></rule>
+  </state>
+  <state name="talking">
+    <timeout seconds="60"><command host="out">timed out</command></timeout>
+    <rule><key>hello</key><command host="out">hi</command><command host="out" delay="5">still there?</command></rule>
+    <rule><key>back</key><statetransition>start</statetransition></rule>
+  </state>
+'''
+
+    def setUp(self):
+        SEATTestCase.setUp(self)
+        self.comp = self.newseat(self.STATES)
+        self.outputs = []
+        self.comp.deliver = lambda host, data: self.outputs.append(data)
+
+    def later(self, seconds):
+        '''run the timers due in seconds'''
+        for timer in self.comp._loop.expire(time.time() + seconds):
+            timer.func(*timer.args)
+
+    def pending(self):
+        return sorted([t.args[2] for t in self.comp.session.timers or () if t.pending()])
+
+    def test_timeout(self):
+        self.comp.processResult('in', u'go')
+        self.assertEqual(self.pending(), ['timeout'])
+        self.later(59)
+        self.assertEqual(self.outputs, [u'going'])
+        self.later(61)
+        self.assertEqual(self.outputs, [u'going', u'timed out'])
+        # (once, until the next input or transition)
+        self.assertEqual(self.pending(), [])
+        self.later(200)
+        self.assertEqual(self.outputs, [u'going', u'timed out'])
+
+    def test_restarted_by_input(self):
+        self.comp.processResult('in', u'go')
+        first = list(self.comp.session.timers)
+        self.comp.processResult('in', u'what')
+        self.assertFalse(first[0].pending())
+        self.assertEqual(self.pending(), ['timeout'])
+
+    def test_delayed(self):
+        self.comp.processResult('in', u'go')
+        self.comp.processResult('in', u'hello')
+        self.assertEqual(self.outputs, [u'going', u'hi'])
+        self.assertEqual(self.pending(), ['delay', 'timeout'])
+        self.later(6)
+        self.assertEqual(self.outputs, [u'going', u'hi', u'still there?'])
+        self.assertEqual(self.pending(), ['timeout'])
+
+    def test_cancelled_by_transition(self):
+        self.comp.processResult('in', u'go')
+        self.comp.processResult('in', u'hello')
+        self.comp.processResult('in', u'back')
+        self.assertEqual(self.pending(), [])
+        self.later(120)
+        self.assertEqual(self.outputs, [u'going', u'hi'])
+        self.assertEqual(self.comp.currentstate, 'start')
+
+class StatsTest(SEATTestCase):
+
+    STATES = u'''
+  <state name="start">
+    <rule><key>hello</key><command host="out">hi</command></rule>
+    <rule><key>bye</key><command host="out">bye</command></rule>
+  </state>
+'''
+
+    def test_written_to_the_port(self):
+        comp = self.newseat(self.STATES)
+        comp.stats.reset()
+        comp.processResult('in', u'hello')
+        comp.processResult('in', u'hello')
+        comp.processResult('in', u'bye')
+        comp.processResult('in', u'what')
+        comp.writeStats()
+        self.assertEqual(comp._port['stats'].written, 1)
+        snapshot = json.loads(comp._port['stats'].last)
+        self.assertEqual(snapshot['hits'], {'start': 3})
+        self.assertEqual(snapshot['misses'], {'start': 1})
+        self.assertEqual(snapshot['rules'], {'start#1': 2, 'start#2': 1})
+        self.assertEqual(snapshot['phases']['turn']['count'], 3)
+        self.assertEqual(snapshot['phases']['lookup']['count'], 4)
+
+class ReloadTest(SEATTestCase):
+
+    STATES = u'''
+  <state name="start">
+    <rule><key>go</key><statetransition>talking</statetransition></rule>
+    <rule><key>hide</key><statetransition>hidden</statetransition></rule>
+  </state>
+  <state name="talking">
+    <rule><key>hello</key><command host="out">%s</command></rule>
+  </state>
+  <state name="hidden">
+    <rule><key>hello</key><command host="out">hidden</command></rule>
+  </state>
+'''
+
+    def setUp(self):
+        SEATTestCase.setUp(self)
+        self.comp = self.newseat(self.STATES % ('hi',), session_key='field')
+        self.outputs = []
+        self.comp.deliver = lambda host, data: self.outputs.append(data)
+
+    def reload(self, states, agents=u''):
+        path = os.path.join(self.dir, 'reloaded.seatml')
+        fp = open(path, 'wb')
+        try:
+            fp.write((SEATML % (agents, states)).encode('utf-8'))
+        finally:
+            fp.close()
+        return self.comp.reloadSEATML([path])
+
+    def test_sessions_keep_their_state(self):
+        self.comp.processResult('in', u'@a go')
+        self.comp.processResult('in', u'@b hide')
+        port = self.comp._port['out']
+        states = self.STATES.replace(u'<state name="hidden">', u'<state name="gone">') % ('hello',)
+        self.assertEqual(self.reload(states), 0)
+        self.assertEqual(self.comp.script.reused, 1)
+        self.assertEqual(self.comp.sessions.peek(u'a').state, 'talking')
+        # (the state of b is gone)
+        self.assertEqual(self.comp.sessions.peek(u'b').state, 'start')
+        self.comp.processResult('in', u'@a hello')
+        self.assertEqual(self.outputs, [u'@a hello'])
+        # (an unchanged agent keeps its port)
+        self.assertTrue(self.comp._port['out'] is port)
+
+    def test_agents(self):
+        self.assertEqual(self.reload(self.STATES % ('hi',), u'<agent name="out2" type="rtcout" datatype="TimedString"/>'), 0)
+        self.assertTrue('out2' in self.comp._port)
+        self.assertEqual(self.reload(self.STATES % ('hi',)), 0)
+        self.assertFalse('out2' in self.comp._port)
+        self.assertFalse('out2' in self.comp.agents)
+
+    def test_broken_script_kept_out(self):
+        script = self.comp.script
+        self.assertEqual(self.reload(u''), 1)
+        self.assertTrue(self.comp.script is script)
+
+class TraceTest(SEATTestCase):
+
+    STATES = u'''
+  <state name="start">
+    <rule><key>hello</key><command host="out">hi</command></rule>
+  </state>
+'''
+
+    def test_written_on_finalize(self):
+        path = os.path.join(self.dir, 'seat.trace')
+        comp = self.newseat(self.STATES, trace=path)
+        comp.processResult('in', u'hello')
+        self.assertFalse(os.path.exists(path))
+        comp.onFinalize()
+        fp = open(path, 'rb')
+        try:
+            events = json.load(fp)['traceEvents']
+        finally:
+            fp.close()
+        names = set([e['name'] for e in events if e['ph'] == 'X'])
+        for name in ('lookup', 'command', 'turn', 'port write'):
+            self.assertTrue(name in names, name)
+        write = [e for e in events if e['name'] == 'port write'][0]
+        self.assertEqual((write['cat'], write['args']), ('io', {'port': 'out'}))
+
+    def test_disabled(self):
+        comp = self.newseat(self.STATES)
+        self.assertEqual(comp.stats.tracer, None)
+        comp.setParameter('trace', os.path.join(self.dir, 'seat.trace'))
+        self.assertNotEqual(comp.stats.tracer, None)
+        comp.setParameter('trace', 'none')
+        self.assertEqual(comp.stats.tracer, None)
+
+class OutputsTest(SEATTestCase):
+
+    AGENTS = u'''
+    <agent name="small" type="rtcout" datatype="TimedString" queue="2" queuepolicy="drop-newest"/>
+    <agent name="numbers" type="rtcout" datatype="TimedLongSeq" batch="true"/>
+    <agent name="words" type="rtcout" datatype="TimedStringSeq"/>'''
+
+    STATES = u'''
+  <state name="start">
+    <rule><key>numbers</key><command host="numbers">1,2</command><command host="numbers">3</command></rule>
+    <rule><key>words</key><command host="words">a,b</command></rule>
+  </state>
+'''
+
+    def setUp(self):
+        SEATTestCase.setUp(self)
+        self.comp = self.newseat(self.STATES, self.AGENTS)
+
+    def test_buffers(self):
+        small = self.comp._port['small']
+        self.assertEqual(small.buffer.length, 2)
+        self.assertEqual(small.properties.getProperty('buffer.length'), '2')
+        self.assertEqual(small.properties.getProperty('buffer.write.full_policy'), 'do_nothing')
+        # (left to rtc.conf if the agent does not set them)
+        out = self.comp._port['out']
+        self.assertEqual(out.buffer.length, seatmodule.OUTPORTBUFFER)
+        self.assertEqual(out.properties.getProperty('buffer.length'), '')
+        self.assertEqual(out.properties.getProperty('buffer.write.full_policy'), '')
+
+    def test_sequences(self):
+        self.comp.processResult('in', u'words')
+        self.assertEqual(list(self.comp._port['words'].last), ['a', 'b'])
+
+    def test_batched(self):
+        port = self.comp._port['numbers']
+        loop = self.comp._loop
+        gate = threading.Event()
+        loop.start()
+        loop.post(gate.wait)
+        # (the sequences of the inputs queued before the flush are written at once)
+        loop.post(self.comp.processResult, 'in', u'numbers')
+        loop.post(self.comp.processResult, 'in', u'numbers')
+        gate.set()
+        self.assertTrue(waitfor(lambda: port.written > 0 and loop.depth() == 0))
+        loop.stop()
+        self.assertEqual(port.written, 1)
+        self.assertEqual(list(port.last), [1, 2, 3, 1, 2, 3])
+
+    def test_batched_without_loop(self):
+        port = self.comp._port['numbers']
+        self.comp.processResult('in', u'numbers')
+        self.assertEqual(port.written, 2)
+        self.assertEqual(list(port.last), [3])
+
+def waitfor(cond, timeout=5.0):
+    end = time.time() + timeout
+    while not cond() and time.time() < end:
+        time.sleep(0.01)
+    return cond()
+
+class WorkersTest(SEATTestCase):
+
+    STATES = u'''
+  <state name="start">
+    <rule><key>hello</key><command host="out">hi</command><statetransition>talking</statetransition></rule>
+  </state>
+  <state name="talking">
+    <rule><key>hello</key><command host="out">again</command></rule>
+  </state>
+'''
+
+    RELOADED = u'''<?xml version="1.0" encoding="UTF-8"?>
+<seatml>
+  <general name="test">
+    <agent name="in" type="rtcin" datatype="TimedString"/>
+    <agent name="out" type="rtcout" datatype="TimedString"/>
+    <agent name="out2" type="rtcout" datatype="TimedString"/>
+  </general>
+  <state name="start">
+    <rule><key>hello</key><command host="out2">hi there</command></rule>
+  </state>
+  <state name="talking">
+    <rule><key>hello</key><command host="out2">again there</command></rule>
+  </state>
+</seatml>
+'''
+
+    def setUp(self):
+        SEATTestCase.setUp(self)
+        self.comp = self.newseat(self.STATES, session_key='field')
+        self.outputs = []
+        self.comp.deliver = lambda host, data: self.outputs.append((host, data))
+        self.comp.startWorkers(2)
+
+    def feed(self, data):
+        self.comp.onData('in', RTC.TimedString(RTC.Time(0, 0), data.encode('utf-8')))
+
+    def test_sessions_in_workers(self):
+        sids = [u's%i' % (i,) for i in range(10)]
+        for sid in sids:
+            self.feed(u'@%s hello' % (sid,))
+        self.feed(u'@s3 hello')
+        self.assertTrue(waitfor(lambda: len(self.outputs) == 11))
+        expected = [('out', u'@%s hi' % (sid,)) for sid in sids] + [('out', u'@s3 again')]
+        self.assertEqual(sorted(self.outputs), sorted(expected))
+        # (the dialogs are in the workers, on both of them)
+        self.assertEqual(len(self.comp.sessions), 0)
+        self.assertEqual(len(set([self.comp._workers.worker(sid) for sid in sids])), 2)
+
+    def test_reload(self):
+        self.feed(u'@a hello')
+        self.assertTrue(waitfor(lambda: len(self.outputs) == 1))
+        path = os.path.join(self.dir, 'reloaded.seatml')
+        fp = open(path, 'wb')
+        fp.write(self.RELOADED.encode('utf-8'))
+        fp.close()
+        self.assertEqual(self.comp.reloadSEATML([path]), 0)
+        # (the port of the new agent is made by the component, the workers only use it)
+        self.assertTrue('out2' in self.comp._port)
+        self.feed(u'@a hello')
+        self.feed(u'@b hello')
+        self.assertTrue(waitfor(lambda: len(self.outputs) == 3))
+        self.assertEqual(sorted(self.outputs[1:]), [('out2', u'@a again there'), ('out2', u'@b hi there')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the reader of the script files and of the compiled model cache
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import shutil
+import tempfile
+import StringIO
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat import seatml
+from seatsat.seatml import ScriptReader, ModelCache, modelkey, dumpmodel, loadmodel
+from seatsat.seatlog import CategoryLogger, StreamLogBuf
+
+SCHEMA = os.path.join(os.path.dirname(__file__), '..', 'seatsat', 'seatml.xsd')
+
+SCRIPT = u'''<?xml version="1.0" encoding="UTF-8"?>
+<seatml>
+  <general name="test">
+    <agent name="in" type="rtcin" datatype="TimedString"/>
+    <agent name="out" type="rtcout" datatype="TimedString"/>
+  </general>
+  <state name="start">
+    <rule><key>hello</key><command host="out">%s</command></rule>
+  </state>
+</seatml>
+'''
+
+class ModelCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cachedir = os.path.join(self.dir, 'cache')
+        self.log = StringIO.StringIO()
+        logger = CategoryLogger(StreamLogBuf(self.log))
+        logger.setlevels("INFO")
+        self.reader = ScriptReader(SCHEMA, logger, ModelCache(self.cachedir))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, data):
+        path = os.path.join(self.dir, name)
+        fp = open(path, 'wb')
+        try:
+            fp.write(data)
+        finally:
+            fp.close()
+        return path
+
+    def script(self, reply='hi', name='test.seatml'):
+        return self.write(name, (SCRIPT % (reply,)).encode('utf-8'))
+
+    def cached(self):
+        if not os.path.isdir(self.cachedir):
+            return []
+        return sorted(os.listdir(self.cachedir))
+
+    def test_key(self):
+        path = self.script()
+        key = modelkey([path], SCHEMA)
+        self.assertEqual(modelkey([path], SCHEMA), key)
+        self.assertNotEqual(modelkey([path]), key)
+        # (the names are the prefix, the contents only change the digest)
+        self.script('hello')
+        changed = modelkey([path], SCHEMA)
+        self.assertNotEqual(changed, key)
+        self.assertEqual(changed.split('-')[0], key.split('-')[0])
+        other = self.script(name='other.seatml')
+        self.assertNotEqual(modelkey([other], SCHEMA).split('-')[0], key.split('-')[0])
+
+    def test_schema_in_key(self):
+        path = self.script()
+        fp = open(SCHEMA, 'rb')
+        try:
+            schema = self.write('seatml.xsd', fp.read())
+        finally:
+            fp.close()
+        key = modelkey([path], schema)
+        self.assertEqual(modelkey([path], SCHEMA), key)
+        fp = open(schema, 'ab')
+        fp.write('\n')
+        fp.close()
+        self.assertNotEqual(modelkey([path], schema), key)
+
+    def test_read_through_cache(self):
+        path = self.script()
+        script = self.reader.read([path])
+        self.assertEqual(self.reader.errors, 0)
+        self.assertEqual(self.cached(), [modelkey([path], SCHEMA) + '.seatmlc'])
+        again = self.reader.read([path])
+        self.assertTrue('load compiled script from' in self.log.getvalue())
+        self.assertEqual(again.states, script.states)
+        self.assertEqual(again.rules.lookup('start', 'in', u'hello'), script.rules.lookup('start', 'in', u'hello'))
+
+    def test_older_models_removed(self):
+        path = self.script()
+        self.reader.read([path])
+        self.script('hello')
+        self.reader.read([path])
+        self.assertEqual(self.cached(), [modelkey([path], SCHEMA) + '.seatmlc'])
+
+    def test_other_key(self):
+        path = self.script()
+        self.reader.read([path])
+        fp = open(self.reader.cache.path(modelkey([path], SCHEMA)), 'rb')
+        try:
+            self.assertEqual(loadmodel(fp, 'another-key'), None)
+        finally:
+            fp.close()
+
+    def test_other_version(self):
+        path = self.script()
+        script = self.reader.compile([path])
+        model = os.path.join(self.dir, 'test.seatmlc')
+        version = seatml.__version__
+        seatml.__version__ = version + '.old'
+        try:
+            fp = open(model, 'wb')
+            try:
+                dumpmodel(script, fp)
+            finally:
+                fp.close()
+        finally:
+            seatml.__version__ = version
+        fp = open(model, 'rb')
+        try:
+            self.assertRaises(ValueError, loadmodel, fp)
+        finally:
+            fp.close()
+        # (a compiled script of another version is an error, not a crash)
+        script = self.reader.read([model])
+        self.assertEqual(self.reader.errors, 1)
+        self.assertEqual(script.states, [])
+        self.assertTrue('compile the script again' in self.log.getvalue())
+
+    def test_not_a_model(self):
+        fp = open(self.write('garbage.seatmlc', 'garbage'), 'rb')
+        try:
+            self.assertRaises(ValueError, loadmodel, fp)
+        finally:
+            fp.close()
+
+STATES = u'''<?xml version="1.0" encoding="UTF-8"?>
+<seatml>
+  <general name="test">
+    <agent name="in" type="rtcin" datatype="TimedString"/>
+    <agent name="out" type="rtcout" datatype="TimedString"/>
+  </general>
+  <state name="start">
+    <rule><key>hello</key><command host="out">hi</command></rule>
+  </state>
+  <state name="talking">
+    <rule><key>hello</key><command host="out">%s</command></rule>
+  </state>
+</seatml>
+'''
+
+class ReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        logger = CategoryLogger(StreamLogBuf(StringIO.StringIO()))
+        self.reader = ScriptReader(SCHEMA, logger)
+        self.path = os.path.join(self.dir, 'test.seatml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, reply, previous=None):
+        fp = open(self.path, 'wb')
+        try:
+            fp.write((STATES % (reply,)).encode('utf-8'))
+        finally:
+            fp.close()
+        return self.reader.read([self.path], previous)
+
+    def test_unchanged_states_reused(self):
+        first = self.read('again')
+        second = self.read('once more', first)
+        self.assertEqual(second.reused, 1)
+        self.assertEqual(second.states, ['start', 'talking'])
+        # (the rules of the unchanged state are the same objects)
+        self.assertTrue(second.rules.lookup('start', 'in', u'hello') is first.rules.lookup('start', 'in', u'hello'))
+        self.assertEqual(second.rules.lookup('talking', 'in', u'hello')[0], ['c', 'out', 'once more'])
+        self.assertTrue(second.buttons['start'] is first.buttons['start'])
+        # (the previous script is not changed by the new one)
+        self.assertEqual(first.rules.lookup('talking', 'in', u'hello')[0], ['c', 'out', 'again'])
+
+    def test_same_as_full_read(self):
+        first = self.read('again')
+        reread = self.read('once more', first)
+        full = self.read('once more')
+        self.assertEqual(full.reused, 0)
+        self.assertEqual(reread.fingerprints, full.fingerprints)
+        for state in reread.states + ['all']:
+            for s in (u'hello', u'bye'):
+                self.assertEqual(reread.rules.lookup(state, 'in', s), full.rules.lookup(state, 'in', s))
+
+if __name__ == '__main__':
+    unittest.main()
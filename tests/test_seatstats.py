@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the latency histograms and the counters
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import json
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.seatstats import Histogram, Stats
+
+class HistogramTest(unittest.TestCase):
+
+    def test_buckets(self):
+        h = Histogram()
+        for sec in (0.0, 0.5e-6, 1.5e-6, 2.5e-6, 3.5e-6, 5.5e-6, 1000.0 * 3600):
+            h.record(sec)
+        # (bucket i counts less than 2**i microseconds, the last one the rest)
+        self.assertEqual(h.buckets[:4], [2, 1, 2, 1])
+        self.assertEqual(h.buckets[-1], 1)
+        self.assertEqual(sum(h.buckets), h.count)
+        self.assertEqual(len(h.buckets), Histogram.NBUCKETS)
+
+    def test_percentiles(self):
+        h = Histogram()
+        self.assertEqual(h.summary(), {'count': 0})
+        self.assertEqual(h.percentile(50), 0.0)
+        for i in range(90):
+            h.record(100e-6)
+        for i in range(10):
+            h.record(0.02)
+        self.assertEqual(h.percentile(50), 128e-6)
+        self.assertEqual(h.percentile(90), 128e-6)
+        # (the bound of the bucket, but never more than the largest sample)
+        self.assertEqual(h.percentile(99), 0.02)
+        summary = h.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['max'], 0.02)
+        self.assertAlmostEqual(summary['mean'], (90 * 100e-6 + 10 * 0.02) / 100)
+
+    def test_reset(self):
+        h = Histogram()
+        h.record(1.0)
+        h.reset()
+        self.assertEqual((h.count, h.max, sum(h.buckets)), (0, 0.0, 0))
+
+class StatsTest(unittest.TestCase):
+
+    def test_snapshot(self):
+        stats = Stats()
+        stats.record('turn', 0.001)
+        stats.record('turn', 0.002)
+        stats.hit('start', 'start#1')
+        stats.hit('start', 'start#2')
+        stats.hit('start', 'start#1')
+        stats.miss('talking')
+        stats.count('timeouts')
+        stats.count('timeouts', 2)
+        stats.gauge('sessions', 5)
+        snapshot = json.loads(json.dumps(stats.snapshot()))
+        self.assertEqual(snapshot['phases']['turn']['count'], 2)
+        self.assertEqual(snapshot['hits'], {'start': 3})
+        self.assertEqual(snapshot['misses'], {'talking': 1})
+        self.assertEqual(snapshot['rules'], {'start#1': 2, 'start#2': 1})
+        self.assertEqual(snapshot['counters'], {'timeouts': 3})
+        self.assertEqual(snapshot['gauges'], {'sessions': 5})
+        stats.reset()
+        self.assertEqual(stats.snapshot()['phases'], {})
+
+    def test_tracer(self):
+        recorded = []
+        class Recorder:
+            def record(self, phase, sec, end):
+                recorded.append((phase, sec, end))
+        stats = Stats()
+        stats.tracer = Recorder()
+        stats.record('lookup', 0.5, 10.0)
+        self.assertEqual(recorded, [('lookup', 0.5, 10.0)])
+        self.assertEqual(stats.histogram('lookup').count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
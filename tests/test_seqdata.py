@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the conversion of script outputs to the lists of sequence ports
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import array
+import struct
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat import seqdata
+
+class ToListTest(unittest.TestCase):
+
+    def test_buffers(self):
+        data = struct.pack('=3f', 1.0, 2.5, -3.0)
+        for b in (bytearray(data), buffer(data), memoryview(data)):
+            self.assertEqual(seqdata.tolist(b, 'f'), [1.0, 2.5, -3.0])
+        self.assertEqual(seqdata.tolist(bytearray('ab'), None), [97, 98])
+
+    def test_partial_element(self):
+        data = struct.pack('=2h', 1, -2) + '\x01'
+        for b in (bytearray(data), buffer(data), memoryview(data)):
+            self.assertEqual(seqdata.tolist(b, 'h'), [1, -2])
+        self.assertEqual(seqdata.tolist(bytearray('abc'), 'i'), [])
+
+    def test_arrays(self):
+        self.assertEqual(seqdata.tolist(array.array('f', [1.0, 2.0]), 'f'), [1.0, 2.0])
+        self.assertEqual(seqdata.tolist(array.array('i', [1, -2]), 'h'), [1, -2])
+        # (a float array to an integer port is converted element by element)
+        self.assertEqual(seqdata.tolist(array.array('d', [1.0]), 'i'), None)
+        self.assertEqual(seqdata.tolist([1, 2], 'i'), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the expiry of the sessions of the dialogs
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.sessions import SessionTable
+
+class SessionTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.expired = []
+        self.table = SessionTable(10.0, self.expired.append)
+
+    def test_get_marks_active(self):
+        session = self.table.add('a', 'start', 100.0)
+        self.assertTrue(self.table.get('a', 105.0) is session)
+        self.assertTrue(self.table.get('a', 114.0) is session)
+        self.assertEqual(session.last, 114.0)
+        self.assertEqual(self.table.get('b', 114.0), None)
+        self.assertEqual(self.expired, [])
+
+    def test_get_expired(self):
+        session = self.table.add('a', 'start', 100.0)
+        self.assertEqual(self.table.get('a', 111.0), None)
+        self.assertEqual(self.expired, [session])
+        self.assertEqual(len(self.table), 0)
+        # (a new session takes its place)
+        self.assertFalse(self.table.add('a', 'start', 111.0) is session)
+
+    def test_peek(self):
+        session = self.table.add('a', 'start', 100.0)
+        self.assertTrue(self.table.peek('a', 105.0) is session)
+        self.assertEqual(session.last, 100.0) # (not made active)
+        self.assertEqual(self.table.peek('a', 111.0), None)
+        self.assertEqual(self.expired, [session])
+        self.assertEqual(len(self.table), 0)
+
+    def test_evict(self):
+        a = self.table.add('a', 'start', 100.0)
+        self.table.add('b', 'start', 105.0)
+        self.assertEqual(self.table.evict(112.0), ['a'])
+        self.assertEqual(self.expired, [a])
+        self.assertEqual([s.id for s in self.table], ['b'])
+
+    def test_no_timeout(self):
+        self.table.timeout = 0.0
+        session = self.table.add('a', 'start', 100.0)
+        self.assertTrue(self.table.get('a', 1e9) is session)
+        self.assertEqual(self.table.evict(1e9), [])
+        self.assertEqual(self.expired, [])
+
+    def test_remove(self):
+        session = self.table.add('a', 'start', 100.0)
+        self.assertTrue(self.table.remove('a') is session)
+        self.assertEqual(self.table.remove('a'), None)
+        self.assertEqual(self.expired, []) # (removed, not expired)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the executor of the shell actions
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import time
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.shellexec import ShellExecutor, TIMEOUT_STATUS
+
+class ShellExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.executors = []
+
+    def tearDown(self):
+        for executor in self.executors:
+            executor.terminate()
+
+    def executor(self, *args, **kwargs):
+        executor = ShellExecutor(*args, **kwargs)
+        self.executors.append(executor)
+        return executor
+
+    def test_status_and_output(self):
+        executor = self.executor(1)
+        self.assertEqual(executor.execute('echo hello', 5.0), (0, 'hello\n'))
+        self.assertEqual(executor.execute('exit 3', 5.0), (3, ''))
+
+    def test_callback(self):
+        executor = self.executor(2)
+        done = threading.Event()
+        results = []
+        def callback(status, output):
+            results.append((status, output, threading.currentThread().getName()))
+            done.set()
+        self.assertTrue(executor.submit('echo hello', callback))
+        done.wait(5.0)
+        self.assertEqual([r[:2] for r in results], [(0, 'hello\n')])
+        self.assertTrue(results[0][2].startswith('shell'))
+
+    def test_timeout_kills_the_children(self):
+        executor = self.executor(1)
+        t = time.time()
+        # (the background sleep keeps the output open, only killing the group ends it)
+        status, output = executor.execute('sleep 30 & echo started; wait', 0.5)
+        self.assertEqual(status, TIMEOUT_STATUS)
+        self.assertEqual(output, 'started\n')
+        self.assertTrue(time.time() - t < 10.0)
+
+    def test_full_queue(self):
+        # (no worker takes the commands off the queue)
+        executor = self.executor(0, maxqueue=2)
+        self.assertTrue(executor.submit('true'))
+        self.assertTrue(executor.submit('true'))
+        self.assertFalse(executor.submit('true'))
+
+if __name__ == '__main__':
+    unittest.main()
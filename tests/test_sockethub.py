@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the framing, the send queues and the listeners of the socket agents
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import struct
+import random
+import socket
+import threading
+import time
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.sockethub import Framer, SocketHub, Connection, agentof, LINE, LENGTH, MAXFRAME, COALESCE, RECVSIZE
+from seatsat.dialogloop import DROP_OLDEST, DROP_NEWEST
+from seatsat.seatstats import Stats
+
+MESSAGES = ['hello', 'a', 'x' * 5000, u'こんにちは'.encode('utf-8'), 'with\rcarriage return', 'end']
+
+def chunks(data, rand):
+    '''split the data at random places, as the socket may give it'''
+    ret = []
+    i = 0
+    while i < len(data):
+        n = rand.randint(1, 64)
+        ret.append(data[i:i + n])
+        i += n
+    return ret
+
+class FramerTest(unittest.TestCase):
+
+    def roundtrip(self, framing, messages):
+        rand = random.Random(6)
+        sender = Framer(framing)
+        data = ''.join([sender.encode(m) for m in messages])
+        for trial in range(20):
+            receiver = Framer(framing)
+            got = []
+            for chunk in chunks(data, rand):
+                got.extend(receiver.feed(chunk))
+            self.assertEqual(got, messages)
+
+    def test_line(self):
+        self.roundtrip(LINE, MESSAGES)
+        framer = Framer(LINE)
+        self.assertEqual(framer.feed('a\r\n\nb\r\nc'), ['a', 'b'])
+        self.assertEqual(framer.feed('\n'), ['c'])
+        self.assertEqual(framer.encode(u'é'), '\xc3\xa9\n')
+
+    def test_length(self):
+        self.roundtrip(LENGTH, MESSAGES + ['', 'line\nbreaks\n'])
+        framer = Framer(LENGTH)
+        self.assertEqual(framer.feed(framer.encode('abc')[:-1]), [])
+        self.assertEqual(framer.feed('c'), ['abc'])
+
+    def test_too_long(self):
+        # (a 4 byte length in network order in front of every message)
+        self.assertEqual(Framer(LENGTH).encode('abc'), struct.pack('!I', 3) + 'abc')
+        self.assertRaises(ValueError, Framer(LENGTH).feed, struct.pack('!I', MAXFRAME + 1))
+        framer = Framer(LINE)
+        self.assertEqual(framer.feed('x' * MAXFRAME), [])
+        self.assertRaises(ValueError, framer.feed, 'x')
+        self.assertRaises(ValueError, Framer(LINE).feed, 'x' * (MAXFRAME + 1) + '\nshort\n')
+
+    def test_long_message_in_small_reads(self):
+        # (the pending data is not copied again on every read)
+        for framing in (LINE, LENGTH):
+            msg = 'x' * (4 * 1024 * 1024)
+            data = Framer(framing).encode(msg)
+            framer = Framer(framing)
+            got = []
+            for i in range(0, len(data), 1024):
+                got.extend(framer.feed(data[i:i + 1024]))
+            self.assertEqual(got, [msg])
+
+    def test_reset(self):
+        framer = Framer(LINE)
+        framer.feed('half')
+        framer.reset()
+        self.assertEqual(framer.feed('line\n'), ['line'])
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, Framer, 'xml')
+
+class ShortSocket:
+    '''a connected socket taking at most n bytes per send'''
+
+    def __init__(self, sock, n):
+        self.sock = sock
+        self.n = n
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def send(self, data):
+        return self.sock.send(data[:self.n])
+
+    def close(self):
+        self.sock.close()
+
+class SendQueueTest(unittest.TestCase):
+    '''the queue of a connection, written by the test instead of the hub thread'''
+
+    def setUp(self):
+        self.stats = Stats()
+        self.hub = SocketHub(stats=self.stats)
+        self.peer = None
+
+    def tearDown(self):
+        if self.peer is not None:
+            self.peer.close()
+        self.hub.abandon()
+
+    def connection(self, queuelength, policy=DROP_OLDEST, n=1024 * 1024):
+        conn = Connection(self.hub, 'out', '127.0.0.1', 1, LINE, None, queuelength, policy)
+        sock, self.peer = socket.socketpair()
+        conn.sock = ShortSocket(sock, n)
+        conn.connected = True
+        self.hub._poller.register(sock.fileno())
+        return conn
+
+    def test_drop_oldest(self):
+        conn = self.connection(3)
+        self.assertEqual([conn.send('out', 'm%i' % (i,)) for i in range(5)], [True, True, True, False, False])
+        self.assertEqual(list(conn.queue), ['m2\n', 'm3\n', 'm4\n'])
+        self.assertEqual(conn.queued, 9)
+        self.assertEqual(conn.dropped, 2)
+        self.assertEqual(self.stats.counters['socket.out.dropped'], 2)
+
+    def test_drop_newest(self):
+        conn = self.connection(3, DROP_NEWEST)
+        self.assertEqual([conn.send('out', 'm%i' % (i,)) for i in range(5)], [True, True, True, False, False])
+        self.assertEqual(list(conn.queue), ['m0\n', 'm1\n', 'm2\n'])
+        self.assertEqual(conn.dropped, 2)
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, Connection, self.hub, 'out', '127.0.0.1', 1, LINE, None, 3, 'block')
+
+    def test_closed(self):
+        conn = self.connection(3)
+        conn.closed = True
+        self.assertFalse(conn.send('out', 'late'))
+        self.assertEqual(list(conn.queue), [])
+
+    def test_coalesced(self):
+        conn = self.connection(0)
+        msgs = ['%04i' % (i,) + 'x' * 995 for i in range(100)]
+        for m in msgs:
+            conn.send('out', m)
+        self.hub._write(conn)
+        # (as many messages as fit in COALESCE bytes, and one more, in one write)
+        self.assertEqual(conn.writes, 1)
+        self.assertEqual(conn.sent, (COALESCE // 1000 + 1) * 1000)
+        self.hub._write(conn)
+        self.assertEqual(conn.writes, 2)
+        self.assertFalse(conn.pending())
+        self.assertEqual(conn.queued, 0)
+        data = ''
+        while len(data) < 100 * 1000:
+            data += self.peer.recv(RECVSIZE)
+        self.assertEqual(data.split('\n')[:-1], msgs)
+
+    def test_partial_write_dropped(self):
+        conn = self.connection(10, n=7)
+        for m in ('aaaa', 'bbbb', 'cccc'):
+            conn.send('out', m)
+        self.hub._write(conn)
+        self.assertEqual(conn.partial, 'bb\ncccc\n')
+        self.assertEqual(conn.ends, [3, 8])
+        conn.send('out', 'dddd')
+        self.hub._failed(conn, 'test')
+        # (the messages begun but not written are dropped, the queued one is kept)
+        self.assertEqual(conn.dropped, 2)
+        self.assertEqual(self.stats.counters['socket.out.dropped'], 2)
+        self.assertEqual((conn.partial, conn.ends), ('', []))
+        self.assertEqual(list(conn.queue), ['dddd\n'])
+        self.assertEqual(self.peer.recv(100), 'aaaa\nbb')
+
+def waitfor(cond, timeout=5.0):
+    end = time.time() + timeout
+    while not cond() and time.time() < end:
+        time.sleep(0.01)
+    return cond()
+
+class ListenerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.received = []
+        self.closed = []
+        self.cond = threading.Condition()
+        self.hub = SocketHub()
+        self.hub.start()
+        self.listener = self.hub.listen('srv', '127.0.0.1', 0, receive=self.receive, closed=self.closed.append)
+        self.assertTrue(waitfor(lambda: self.listener.sock is not None))
+        self.port = self.listener.sock.getsockname()[1]
+        self.socks = []
+
+    def tearDown(self):
+        for sock in self.socks:
+            sock.close()
+        self.hub.stop()
+
+    def receive(self, name, data):
+        self.received.append((name, data))
+
+    def client(self):
+        sock = socket.create_connection(('127.0.0.1', self.port))
+        sock.settimeout(5.0)
+        self.socks.append(sock)
+        n = len(self.socks)
+        self.assertTrue(waitfor(lambda: len(self.listener.clients) == n))
+        return sock
+
+    def test_agentof(self):
+        listeners = set(['srv', 'a#b'])
+        self.assertEqual(agentof('srv#12', listeners), 'srv')
+        self.assertEqual(agentof('a#b#3', listeners), 'a#b')
+        self.assertEqual(agentof('a#b', listeners), 'a#b')
+        self.assertEqual(agentof('srv', listeners), 'srv')
+        # (not a client of a listener)
+        self.assertEqual(agentof('other#1', listeners), 'other#1')
+        self.assertEqual(agentof('srv#x', listeners), 'srv#x')
+        self.assertEqual(agentof('srv#', listeners), 'srv#')
+
+    def test_client_names(self):
+        first = self.client()
+        second = self.client()
+        self.assertEqual(sorted(self.listener.clients), ['srv#1', 'srv#2'])
+        second.sendall('from second\n')
+        first.sendall('from first\n')
+        self.assertTrue(waitfor(lambda: len(self.received) == 2))
+        self.assertEqual(sorted(self.received), [('srv#1', u'from first'), ('srv#2', u'from second')])
+        for name, data in self.received:
+            self.assertEqual(agentof(name, ['srv']), 'srv')
+
+    def test_send_to_one_or_all(self):
+        first = self.client()
+        second = self.client()
+        self.assertTrue(self.listener.send('srv#2', 'to second'))
+        self.assertTrue(self.listener.send('srv', 'to all'))
+        self.assertEqual(first.recv(100), 'to all\n')
+        data = ''
+        while data.count('\n') < 2:
+            data += second.recv(100)
+        self.assertEqual(data, 'to second\nto all\n')
+        self.assertFalse(self.listener.send('srv#3', 'nobody'))
+
+    def test_closed(self):
+        self.client()
+        second = self.client()
+        second.close()
+        self.socks.remove(second)
+        self.assertTrue(waitfor(lambda: self.closed == ['srv#2']))
+        self.assertEqual(list(self.listener.clients), ['srv#1'])
+        # (numbers are not reused)
+        self.client()
+        self.assertEqual(sorted(self.listener.clients), ['srv#1', 'srv#3'])
+
+if __name__ == '__main__':
+    unittest.main()
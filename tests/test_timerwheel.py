@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the timer wheel against a plain list of the timers
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import random
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.timerwheel import TimerWheel, TICK, SLOTS, LEVELS
+
+# a tick exact in binary, so that the deadlines in ticks are exact
+T = 1.0 / 64
+
+# as far as the last wheel reaches in ticks
+REACH = 1 << (6 * LEVELS)
+
+class TimerWheelTest(unittest.TestCase):
+
+    def test_same_as_list(self):
+        rand = random.Random(7)
+        for trial in range(20):
+            # (the times are in the middle of a tick, the deadlines on the ticks)
+            tick = rand.randint(0, 100000)
+            now = (tick + 0.5) * T
+            wheel = TimerWheel(T, now)
+            timers = []
+            for step in range(300):
+                op = rand.random()
+                if op < 0.5:
+                    # (the next tick, within the wheels and beyond them)
+                    delay = rand.choice([1, rand.randint(1, SLOTS), rand.randint(1, SLOTS ** 3),
+                                         rand.randint(REACH, 2 * REACH)])
+                    timers.append(wheel.add((tick + delay) * T, None, step))
+                elif op < 0.6 and timers:
+                    timer = rand.choice(timers)
+                    wheel.cancel(timer)
+                    timers.remove(timer)
+                else:
+                    tick += rand.choice([0, 1, SLOTS, SLOTS ** 2 + 1, REACH])
+                    now = (tick + 0.5) * T
+                    due = [t for t in timers if t.deadline <= now]
+                    expired = wheel.expire(now)
+                    # (in order of deadline, timers of the same deadline in any order)
+                    self.assertEqual(set(expired), set(due))
+                    self.assertEqual([t.deadline for t in expired], sorted([t.deadline for t in due]))
+                    for t in due:
+                        self.assertFalse(t.pending())
+                        timers.remove(t)
+                self.assertEqual(len(wheel), len(timers))
+                if timers:
+                    # (never later than the tick of the next deadline)
+                    first = min([t.deadline for t in timers])
+                    self.assertTrue(wheel.timeout(now) <= max(first - now, 0.0) + T)
+
+    def test_cascade(self):
+        wheel = TimerWheel(now=0.0)
+        timers = [wheel.add(TICK * n, None, n) for n in (1, SLOTS - 1, SLOTS, SLOTS + 1, SLOTS * SLOTS + 3)]
+        self.assertEqual(wheel.expire(TICK * SLOTS * SLOTS * 2), timers)
+        self.assertEqual(len(wheel), 0)
+        self.assertEqual(wheel.timeout(0.0), None)
+
+    def test_cancel(self):
+        wheel = TimerWheel(now=0.0)
+        timer = wheel.add(1.0, None)
+        self.assertTrue(timer.pending())
+        wheel.cancel(timer)
+        wheel.cancel(timer)
+        self.assertFalse(timer.pending())
+        self.assertEqual(len(wheel), 0)
+        self.assertEqual(wheel.expire(2.0), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the trace of the dialog turns
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.tracer import Tracer
+
+class TracerTest(unittest.TestCase):
+
+    def spans(self, tracer):
+        return [e for e in tracer.events() if e['ph'] != 'M']
+
+    def test_span(self):
+        tracer = Tracer()
+        tracer.span('turn', 10.0, 10.5, args={'state': 'start'})
+        self.assertEqual(self.spans(tracer), [{'ph': 'X', 'name': 'turn', 'cat': 'seat', 'pid': os.getpid(),
+                                               'tid': threading.currentThread().ident,
+                                               'ts': 10.0 * 1e6, 'dur': 0.5 * 1e6,
+                                               'args': {'state': 'start'}}])
+
+    def test_threads(self):
+        tracer = Tracer()
+        tracer.span('main', 1.0, 2.0)
+        t = threading.Thread(target=tracer.span, args=('other', 1.5, 3.0), name='other thread')
+        t.start()
+        t.join()
+        names = [e['args']['name'] for e in tracer.events() if e['ph'] == 'M']
+        self.assertEqual(names, [threading.currentThread().getName(), 'other thread'])
+        spans = self.spans(tracer)
+        self.assertEqual([e['name'] for e in spans], ['main', 'other'])
+        self.assertNotEqual(spans[0]['tid'], spans[1]['tid'])
+
+    def test_latest_spans(self):
+        tracer = Tracer(3)
+        for i in range(10):
+            tracer.span('s%i' % (i,), i, i + 1)
+        self.assertEqual([e['name'] for e in self.spans(tracer)], ['s7', 's8', 's9'])
+        tracer.clear()
+        self.assertEqual(self.spans(tracer), [])
+
+    def test_phases(self):
+        tracer = Tracer()
+        tracer.record('lookup', 0.25, 2.0)
+        tracer.record('queue', 1.0, 2.0)
+        tracer.record('nbest', 1.0, 2.0)
+        spans = self.spans(tracer)
+        self.assertEqual([(e['ph'], e['name'], e['ts']) for e in spans],
+                         [('X', 'lookup', 1.75 * 1e6), ('b', 'queue', 1e6), ('e', 'queue', 2e6)])
+        # (the waits are async events, paired by id)
+        self.assertEqual(spans[1]['id'], spans[2]['id'])
+
+    def test_dump(self):
+        tracer = Tracer()
+        tracer.span('turn', 1.0, 2.0)
+        d = tempfile.mkdtemp()
+        try:
+            path = os.path.join(d, 'seat.trace')
+            tracer.dump(path)
+            self.assertEqual(os.listdir(d), ['seat.trace'])
+            fp = open(path, 'rb')
+            try:
+                trace = json.load(fp)
+            finally:
+                fp.close()
+            self.assertEqual(trace['displayTimeUnit'], 'ms')
+            self.assertEqual(trace['traceEvents'], json.loads(json.dumps(tracer.events())))
+        finally:
+            shutil.rmtree(d)
+
+if __name__ == '__main__':
+    unittest.main()
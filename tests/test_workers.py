@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''tests of the routing and the messages of the worker processes
+
+  $ python -m unittest discover -s tests
+'''
+
+import sys
+import os
+import socket
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from seatsat.workers import HashRing, sendmsg, recvmsg, closeinherited
+
+class HashRingTest(unittest.TestCase):
+
+    KEYS = [u'robot%i' % (i,) for i in range(4000)]
+
+    def assign(self, ring):
+        return dict([(k, ring.node(k)) for k in self.KEYS])
+
+    def test_spread(self):
+        owners = self.assign(HashRing(range(4))).values()
+        for n in range(4):
+            self.assertTrue(600 < owners.count(n) < 1400, owners.count(n))
+
+    def test_stable(self):
+        self.assertEqual(self.assign(HashRing(range(4))), self.assign(HashRing(range(4))))
+        self.assertEqual(HashRing([0, 1]).node(u'é'), HashRing([0, 1]).node(u'é'.encode('utf-8')))
+        # (inputs without a session go to one worker)
+        self.assertEqual(HashRing(range(4)).node(None), HashRing(range(4)).node(''))
+
+    def test_removed_node(self):
+        before = self.assign(HashRing(range(4)))
+        after = self.assign(HashRing([0, 1, 3]))
+        # (only the keys of the removed node move)
+        for k in self.KEYS:
+            if before[k] != 2:
+                self.assertEqual(after[k], before[k])
+            else:
+                self.assertNotEqual(after[k], 2)
+
+class MessageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+        self.b.settimeout(5.0)
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def test_roundtrip(self):
+        msgs = [('r', 'in', u'こんにちは'), ('v', 'in', range(10)), ('s', None, 'x' * 100000)]
+        for msg in msgs:
+            sendmsg(self.a, msg)
+        self.assertEqual([recvmsg(self.b) for m in msgs], msgs)
+
+    def test_end_of_stream(self):
+        sendmsg(self.a, ('d', 'srv#1', None))
+        self.a.shutdown(socket.SHUT_WR)
+        self.assertEqual(recvmsg(self.b), ('d', 'srv#1', None))
+        self.assertEqual(recvmsg(self.b), None)
+
+    def test_torn_message(self):
+        sendmsg(self.a, 'complete')
+        self.a.sendall('\0\0\0\x10abc')
+        self.a.shutdown(socket.SHUT_WR)
+        self.assertEqual(recvmsg(self.b), 'complete')
+        self.assertEqual(recvmsg(self.b), None)
+
+class CloseInheritedTest(unittest.TestCase):
+
+    def test_close_inherited(self):
+        keep, report = socket.socketpair()
+        other, peer = socket.socketpair()
+        r, w = os.pipe()
+        fp = tempfile.TemporaryFile()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                closeinherited([keep.fileno()])
+                def isopen(fd):
+                    try:
+                        os.fstat(fd)
+                        return True
+                    except OSError:
+                        return False
+                sendmsg(keep, [isopen(fd) for fd in (keep.fileno(), other.fileno(), r, w, fp.fileno())])
+            finally:
+                os._exit(0)
+        try:
+            report.settimeout(5.0)
+            # (the sockets and the pipes but the one to keep are closed, the files stay)
+            self.assertEqual(recvmsg(report), [True, False, False, False, True])
+        finally:
+            os.waitpid(pid, 0)
+            for s in (keep, report, other, peer):
+                s.close()
+            os.close(r)
+            os.close(w)
+            fp.close()
+
+if __name__ == '__main__':
+    unittest.main()